@@ -1,16 +1,61 @@
+import logging
+
 from django.contrib import admin
-from .models import Client, Category, Product, Cart, Order
+from django.core.exceptions import PermissionDenied
+from django.db import OperationalError
+from django.db.models import Max, Min, Q, Sum
+from django.http import JsonResponse, StreamingHttpResponse
+from django.shortcuts import get_object_or_404
+from django.urls import path, reverse
+from django.utils import timezone
+from .models import Client, Category, Product, Cart, Order, OrderItem, ArchivedOrder, DailySales, SalesRollup
 from django.utils.html import format_html
+from .services import search
+from .services.archive import restore_orders
+from .services.export import iter_export
+from .utils.admin import MAX_ID, CachedCountPaginator, IndexedSearchMixin, name_variants, phone_variants, username_variants
+
+CART_PREVIEW_LINES = 3
+
+logger = logging.getLogger(__name__)
+
+
+def refresh_search_index():
+    # Триггеры только ставят изменения в очередь; перед поиском переносим их в индекс.
+    # Если база занята, ищем по уже проиндексированному — остальное заберёт задача reindex_search
+    try:
+        search.reindex()
+    except OperationalError as e:
+        logger.warning(f"Поисковый индекс не обновлён перед поиском: {e}")
+
+
+class LargeTableAdminMixin(IndexedSearchMixin):
+    """Списки больших таблиц: счётчик из кэша или статистики, поиск по индексам, без второго COUNT(*)."""
+    paginator = CachedCountPaginator
+    show_full_result_count = False
 
 
 @admin.register(Client)
-class ClientAdmin(admin.ModelAdmin):
+class ClientAdmin(LargeTableAdminMixin, admin.ModelAdmin):
     list_display = ('name', 'telegram_id', 'telegram_username', 'phone_number', 'city', 'preferred_language')
-    search_fields = ('name', 'telegram_id', 'telegram_username', 'phone_number')
+    search_fields = ('name', '=telegram_id', 'telegram_username', 'phone_number')
+    search_variants = {'name': name_variants, 'telegram_username': username_variants, 'phone_number': phone_variants}
     list_filter = ('preferred_language', 'city')
     ordering = ('name',)
     readonly_fields = ('telegram_id', 'telegram_username')
 
+    def get_search_results(self, request, queryset, search_term):
+        # Полнотекстовый индекс находит и слово из середины имени; без него — префиксный поиск
+        term = search_term.strip()
+        client_ids = search.client_ids(term) if term else None
+        if client_ids is None:
+            return super().get_search_results(request, queryset, search_term)
+        refresh_search_index()
+        condition = Q(id__in=client_ids)
+        if term.isdigit():
+            condition |= Q(telegram_id=int(term))
+        return queryset.filter(condition), False
+
 
 @admin.register(Category)
 class CategoryAdmin(admin.ModelAdmin):
@@ -38,33 +83,209 @@ class ProductAdmin(admin.ModelAdmin):
 
 
 @admin.register(Cart)
-class CartAdmin(admin.ModelAdmin):
+class CartAdmin(LargeTableAdminMixin, admin.ModelAdmin):
     list_display = (
         'client', 'product', 'quantity',
         'is_small', 'is_big', 'is_hot', 'is_cold', 'created_at'
     )
+    list_select_related = ('client', 'product')
     search_fields = ('client__name', 'product__title_ru', 'product__title_uz')
+    search_variants = {'client__name': name_variants, 'product__title_ru': name_variants, 'product__title_uz': name_variants}
     list_filter = ('is_small', 'is_big', 'is_hot', 'is_cold', 'created_at')
-    ordering = ('-created_at',)
+    # Порядок по первичному ключу совпадает с порядком создания и не требует сортировки
+    ordering = ('-id',)
+
+
+class OrderItemInline(admin.TabularInline):
+    model = OrderItem
+    extra = 0
+    can_delete = False
+    fields = ('product', 'quantity', 'unit_price', 'is_small', 'is_big', 'is_hot', 'is_cold')
+    readonly_fields = fields
+
+    def has_add_permission(self, request, obj=None):
+        return False
 
 
 @admin.register(Order)
-class OrderAdmin(admin.ModelAdmin):
+class OrderAdmin(LargeTableAdminMixin, admin.ModelAdmin):
     list_display = (
         'id', 'client', 'total_price', 'status',
         'delivery_address', 'courier_name', 'car_number', 'car_model', 'created_at'
     )
+    list_select_related = ('client',)
     search_fields = (
-        'client__name', 'client__phone_number',
-        'courier_name', 'car_number', 'car_model'
+        '=id', 'client__name', 'client__phone_number', 'client__telegram_username', 'car_number'
     )
+    search_variants = {
+        'client__name': name_variants,
+        'client__phone_number': phone_variants,
+        'client__telegram_username': username_variants,
+        'car_number': lambda term: [term.upper().replace(' ', '')],
+    }
     list_filter = ('status', 'created_at')
+    ordering = ('-id',)
+    exclude = ('cart_data_json',)
+    readonly_fields = ('cart_preview', 'created_at')
+    inlines = (OrderItemInline,)
+    actions = ('export_csv', 'export_jsonl')
+
+    def get_search_results(self, request, queryset, search_term):
+        # Клиент по имени, username и телефону, заказ по курьеру и номеру машины — через
+        # полнотекстовый индекс; без него остаётся префиксный поиск по search_fields
+        term = search_term.strip()
+        client_ids = search.client_ids(term) if term else None
+        if client_ids is None:
+            return super().get_search_results(request, queryset, search_term)
+        refresh_search_index()
+        condition = Q(client_id__in=client_ids) | Q(id__in=search.order_ids(term))
+        if term.isdigit() and int(term) <= MAX_ID:
+            condition |= Q(id=int(term))
+        return queryset.filter(condition), False
+
+    @admin.action(description='Выгрузить в CSV')
+    def export_csv(self, request, queryset):
+        return self.export(queryset, 'csv', 'text/csv')
+
+    @admin.action(description='Выгрузить в JSONL')
+    def export_jsonl(self, request, queryset):
+        return self.export(queryset, 'jsonl', 'application/x-ndjson')
+
+    @staticmethod
+    def export(queryset, export_format, content_type):
+        # Ответ отдаётся по мере чтения заказов, как в команде export_orders
+        response = StreamingHttpResponse(
+            iter_export(queryset, export_format), content_type=f'{content_type}; charset=utf-8'
+        )
+        filename = f"orders-{timezone.localdate():%Y%m%d}.{export_format}"
+        response['Content-Disposition'] = f'attachment; filename="{filename}"'
+        return response
+
+    def get_queryset(self, request):
+        # Снимок корзины в списке не показывается — не читаем его для каждой строки
+        return super().get_queryset(request).defer('cart_data_json')
+
+    def get_urls(self):
+        return [
+            path(
+                '<int:order_id>/cart-data/',
+                self.admin_site.admin_view(self.cart_data_view),
+                name='bot_order_cart_data'
+            ),
+        ] + super().get_urls()
+
+    @admin.display(description='Состав заказа')
+    def cart_preview(self, obj):
+        lines = obj.cart_data_json or []
+        if not lines:
+            return '—'
+        preview = ', '.join(
+            f"{line.get('product_title_ru')} × {line.get('quantity')}" for line in lines[:CART_PREVIEW_LINES]
+        )
+        if len(lines) > CART_PREVIEW_LINES:
+            preview += f" и ещё {len(lines) - CART_PREVIEW_LINES}"
+        return format_html(
+            '{} <a href="{}" target="_blank">JSON</a>', preview, reverse('admin:bot_order_cart_data', args=[obj.pk])
+        )
+
+    def cart_data_view(self, request, order_id):
+        """Полный cart_data_json по ссылке из превью: на странице заказа он не отрисовывается."""
+        order = get_object_or_404(Order.objects.only('id', 'cart_data_json'), id=order_id)
+        if not self.has_view_permission(request, order):
+            raise PermissionDenied
+        return JsonResponse(
+            order.cart_data_json or [], safe=False, json_dumps_params={'ensure_ascii': False, 'indent': 2}
+        )
+
+
+@admin.register(ArchivedOrder)
+class ArchivedOrderAdmin(LargeTableAdminMixin, admin.ModelAdmin):
+    """Архив смотрят отдельно: список заказов в OrderAdmin его не затрагивает."""
+    list_display = ('id', 'client', 'total_price', 'status', 'created_at', 'archived_at')
+    list_select_related = ('client',)
+    search_fields = ('=id', '=client__telegram_id', 'client__phone_number')
+    search_variants = {'client__phone_number': phone_variants}
+    list_filter = ('status',)
+    date_hierarchy = 'created_at'
     ordering = ('-created_at',)
-    readonly_fields = ('cart_data_json', 'created_at')
-
-    # Дополнительно можно отформатировать cart_data_json для удобства чтения
-    def formfield_for_dbfield(self, db_field, request, **kwargs):
-        field = super().formfield_for_dbfield(db_field, request, **kwargs)
-        if db_field.name == 'cart_data_json':
-            field.widget.attrs['style'] = 'height: 200px;'
-        return field
+    fields = ('id', 'client', 'status', 'total_price', 'created_at', 'archived_at', 'cart_data')
+    readonly_fields = fields
+    actions = ('restore',)
+
+    def get_queryset(self, request):
+        return super().get_queryset(request).defer('payload')
+
+    @admin.display(description='Состав заказа')
+    def cart_data(self, obj):
+        return obj.to_order().cart_data_json
+
+    @admin.action(description='Вернуть из архива', permissions=['delete'])
+    def restore(self, request, queryset):
+        restored = restore_orders(queryset)
+        self.message_user(request, f"Восстановлено заказов: {restored}.")
+
+    def has_add_permission(self, request):
+        return False
+
+    def has_change_permission(self, request, obj=None):
+        return False
+
+
+class ReadOnlyAdminMixin:
+    """Агрегаты пишет только задача roll_up_sales."""
+
+    def has_add_permission(self, request):
+        return False
+
+    def has_change_permission(self, request, obj=None):
+        return False
+
+    def has_delete_permission(self, request, obj=None):
+        return False
+
+
+@admin.register(DailySales)
+class DailySalesAdmin(ReadOnlyAdminMixin, admin.ModelAdmin):
+    """Отчёт по продажам: читает только агрегаты, поэтому время ответа не растёт с историей заказов."""
+    change_list_template = 'admin/bot/dailysales/change_list.html'
+    list_display = ('day', 'order_count', 'revenue', 'average_basket', 'delivery_revenue')
+    date_hierarchy = 'day'
+    ordering = ('-day',)
+    top_products_limit = 10
+
+    @admin.display(description='Средний чек')
+    def average_basket(self, obj):
+        return obj.average_basket
+
+    def changelist_view(self, request, extra_context=None):
+        response = super().changelist_view(request, extra_context)
+        changelist = getattr(response, 'context_data', {}).get('cl')
+        if changelist is None:
+            return response
+
+        # Итоги и топ товаров — за период, выбранный в date_hierarchy
+        summary = changelist.queryset.aggregate(
+            first_day=Min('day'), last_day=Max('day'),
+            order_count=Sum('order_count'), revenue=Sum('revenue'),
+        )
+        if summary['order_count']:
+            summary['average_basket'] = round(summary['revenue'] / summary['order_count'])
+        top_products = []
+        if summary['first_day']:
+            top_products = (
+                SalesRollup.objects.filter(day__range=(summary['first_day'], summary['last_day']))
+                .values('product_id', 'product__title_ru')
+                .annotate(quantity=Sum('quantity'), revenue=Sum('revenue'))
+                .order_by('-revenue')[:self.top_products_limit]
+            )
+        response.context_data.update(summary=summary, top_products=top_products)
+        return response
+
+
+@admin.register(SalesRollup)
+class SalesRollupAdmin(ReadOnlyAdminMixin, admin.ModelAdmin):
+    list_display = ('day', 'product', 'is_small', 'is_big', 'is_hot', 'is_cold', 'quantity', 'revenue')
+    list_filter = ('is_small', 'is_big', 'is_hot', 'is_cold')
+    list_select_related = ('product',)
+    date_hierarchy = 'day'
+    ordering = ('-day', '-revenue')
@@ -0,0 +1,12 @@
+from django.apps import AppConfig
+
+
+class BotConfig(AppConfig):
+    default_auto_field = 'django.db.models.BigAutoField'
+    name = 'apps.bot'
+
+    def ready(self):
+        from apps.bot import signals  # noqa: F401
+        from apps.bot.middlewares.profiling import install_signal_handler
+
+        install_signal_handler()
@@ -0,0 +1,236 @@
+import logging
+from concurrent.futures import ThreadPoolExecutor
+from contextvars import ContextVar
+
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.db import close_old_connections
+from telebot import util
+from telebot.async_telebot import AsyncTeleBot, ExceptionHandler
+
+from apps.bot.bot_initializer import get_telegram_bot
+from apps.bot.keyboards import inline as inline_keyboards
+from apps.bot.keyboards.reply import main_menu_keyboard
+from apps.bot.models import Client, Cart, Order
+from apps.bot.services.catalog import aget_categories, aget_products
+from apps.bot.services.navigation import AsyncScreenNavigator
+from apps.bot.services.order_service import CART_VARIANT_FIELDS, apply_default_variants
+from apps.bot.utils.formatting import format_cart_text
+
+logger = logging.getLogger(__name__)
+
+_handler_errors = ContextVar('handler_errors', default=None)
+
+
+class HandlerErrors(ExceptionHandler):
+    """
+    AsyncTeleBot перехватывает исключения обработчиков и только пишет их в лог.
+    Здесь они собираются для текущего process_update, чтобы вебхук ответил 500.
+    """
+
+    async def handle(self, exception):
+        errors = _handler_errors.get()
+        if errors is None:
+            return False
+        errors.append(exception)
+        return True
+
+
+class AsyncTelegramBot:
+    """
+    Обработчики для ASGI-режима (BOT_ASYNC_MODE). Режим частичный: на асинхронном ORM
+    и общей сессии aiohttp работают только навигация по меню и корзина. Остальные
+    обновления (товары, оформление заказа, локация, оплата, заказы) выполняет синхронный
+    TelegramBot в собственном пуле из BOT_ASYNC_SYNC_WORKERS потоков, так что поведение
+    бота в обоих режимах одинаковое.
+    """
+
+    def __init__(self, token):
+        self.bot = AsyncTeleBot(token, exception_handler=HandlerErrors())
+        self.navigator = AsyncScreenNavigator(self.bot)
+        # Не пул цикла событий по умолчанию (min(32, CPU + 4) потоков): он же обслуживает
+        # прочие sync_to_async, и при одном-двух ядрах ограничивает число одновременных обновлений
+        self.executor = ThreadPoolExecutor(
+            max_workers=settings.BOT_ASYNC_SYNC_WORKERS, thread_name_prefix='bot-sync'
+        )
+        self.register_handlers()
+        self.register_fallback_handlers()
+
+    async def process_update(self, update):
+        # Обработчику-заглушке нужно исходное обновление, чтобы передать его синхронному боту
+        for update_type in util.update_types:
+            update_object = getattr(update, update_type, None)
+            if update_object is not None:
+                update_object._update = update
+        errors = []
+        token = _handler_errors.set(errors)
+        try:
+            await self.bot.process_new_updates([update])
+        finally:
+            _handler_errors.reset(token)
+        if errors:
+            raise errors[0]
+
+    def register_handlers(self):
+        @self.bot.message_handler(func=lambda message: message.text in ["🍽️ Меню", "🍽️ Menu"])
+        async def handle_menu(message):
+            chat_id = message.chat.id
+            try:
+                client = await Client.objects.aget(telegram_id=chat_id)
+                await self.send_categories(chat_id, client.preferred_language)
+            except Client.DoesNotExist:
+                await self.bot.send_message(chat_id=chat_id, text="Пожалуйста, начните с команды /start.")
+
+        @self.bot.message_handler(func=lambda message: message.text in ["🛒 Корзина", "🛒 Savat"])
+        async def handle_cart(message):
+            chat_id = message.chat.id
+            try:
+                client = await Client.objects.aget(telegram_id=chat_id)
+                await self.show_cart(chat_id, client)
+            except Client.DoesNotExist:
+                await self.bot.send_message(chat_id=chat_id, text="Пожалуйста, начните с команды /start.")
+
+        @self.bot.callback_query_handler(func=lambda call: call.data.startswith("category_"))
+        async def handle_category_selection(call):
+            chat_id = call.message.chat.id
+            client = await Client.objects.aget(telegram_id=chat_id)
+            category_id = call.data.split("_")[1]
+            await self.send_products(chat_id, category_id, client.preferred_language, message=call.message)
+            await self.bot.answer_callback_query(call.id)
+
+        @self.bot.callback_query_handler(func=lambda call: call.data == "quantity_do_nothing")
+        async def quantity_do_nothing(call):
+            await self.bot.answer_callback_query(call.id)
+
+        @self.bot.callback_query_handler(func=lambda call: call.data == "view_cart")
+        async def view_cart(call):
+            chat_id = call.message.chat.id
+            try:
+                client = await Client.objects.aget(telegram_id=chat_id)
+            except Client.DoesNotExist:
+                await self.bot.answer_callback_query(call.id, text="Клиент не найден", show_alert=True)
+                return
+
+            await self.show_cart(chat_id, client, message=call.message)
+            await self.bot.answer_callback_query(call.id)
+
+        @self.bot.callback_query_handler(func=lambda call: call.data.startswith("back_to_products_"))
+        async def handle_back_to_products(call):
+            chat_id = call.message.chat.id
+            language_code = 'ru'
+            try:
+                category_id = int(call.data.split("_")[3])
+                client = await Client.objects.aget(telegram_id=chat_id)
+                language_code = client.preferred_language or 'ru'
+
+                await self.send_products(chat_id, category_id, language_code, message=call.message)
+                await self.bot.answer_callback_query(call.id)
+            except Client.DoesNotExist:
+                await self.bot.answer_callback_query(call.id, text="Клиент не найден.", show_alert=True)
+            except Exception as e:
+                logger.error(f"Error in handle_back_to_products: {e}")
+                await self.bot.answer_callback_query(
+                    call.id,
+                    text="Произошла ошибка." if language_code == 'ru' else "Xatolik yuz berdi.",
+                    show_alert=True
+                )
+
+        @self.bot.callback_query_handler(func=lambda call: call.data == "back_to_categories")
+        async def handle_back_to_categories(call):
+            chat_id = call.message.chat.id
+            client = await Client.objects.aget(telegram_id=chat_id)
+            await self.send_categories(chat_id, client.preferred_language, message=call.message)
+            await self.bot.answer_callback_query(call.id)
+
+        @self.bot.callback_query_handler(func=lambda call: call.data == "back_to_main")
+        async def handle_back_to_main(call):
+            chat_id = call.message.chat.id
+            client = await Client.objects.aget(telegram_id=chat_id)
+            await self.send_main_menu(chat_id, client.preferred_language, message=call.message)
+            await self.bot.answer_callback_query(call.id)
+
+    def register_fallback_handlers(self):
+        """Регистрируются последними: всё, что не обработано выше, уходит синхронному боту."""
+        delegate = sync_to_async(self.delegate, thread_sensitive=False, executor=self.executor)
+
+        async def fallback(update_object):
+            await delegate(update_object._update)
+
+        self.bot.register_message_handler(
+            fallback, content_types=util.content_type_media + util.content_type_service
+        )
+        self.bot.register_callback_query_handler(fallback, func=lambda call: True)
+        self.bot.register_pre_checkout_query_handler(fallback, func=lambda query: True)
+
+    @staticmethod
+    def delegate(update):
+        # Как в runbot: потоки пула живут долго, протухшие соединения с БД не держим
+        close_old_connections()
+        try:
+            get_telegram_bot().bot.process_new_updates([update])
+        finally:
+            close_old_connections()
+
+    async def send_main_menu(self, chat_id, language_code, message=None):
+        order = await Order.objects.filter(client__telegram_id=chat_id).order_by('-id').only('status').afirst()
+        await self.navigator.show_menu(
+            chat_id,
+            "Asosiy menyu" if language_code == 'uz' else "Главное меню",
+            main_menu_keyboard(language_code, order.status if order else None),
+            message=message
+        )
+
+    async def send_categories(self, chat_id, language_code, message=None):
+        categories = await aget_categories()
+        if not categories:
+            await self.navigator.show(
+                chat_id,
+                "Menu mavjud emas." if language_code == 'uz' else "Меню отсутствуют.",
+                message=message
+            )
+            return
+
+        telegraph_url = "https://telegra.ph/DRAGON-TEA-MENU-12-06"
+        await self.navigator.show(
+            chat_id,
+            f"📰 <a href='{telegraph_url}'>MENU</a>",
+            reply_markup=inline_keyboards.catalog_keyboard(categories, "category_", "back_to_main", language_code),
+            parse_mode="HTML",
+            message=message
+        )
+
+    async def send_products(self, chat_id, category_id, language_code, message=None):
+        products = await aget_products(category_id)
+        if not products:
+            await self.navigator.show(
+                chat_id,
+                "Mahsulotlar mavjud emas." if language_code == 'uz' else "Товары отсутствуют.",
+                message=message
+            )
+            return
+
+        await self.navigator.show(
+            chat_id,
+            "Mahsulotni tanlang:" if language_code == 'uz' else "Выберите продукт:",
+            reply_markup=inline_keyboards.catalog_keyboard(products, "product_", "back_to_categories", language_code),
+            message=message
+        )
+
+    async def show_cart(self, chat_id, client, message=None):
+        cart_items = [item async for item in Cart.objects.filter(client=client, quantity__gt=0).select_related('product')]
+        language_code = client.preferred_language
+
+        if not cart_items:
+            await self.navigator.show(chat_id, "Корзина пуста" if language_code == 'ru' else "Savat bo'sh", message=message)
+            return
+
+        changed_items = apply_default_variants(cart_items)
+        if changed_items:
+            await Cart.objects.abulk_update(changed_items, CART_VARIANT_FIELDS)
+
+        await self.navigator.show(
+            chat_id,
+            format_cart_text(cart_items, language_code),
+            reply_markup=inline_keyboards.cart_keyboard(language_code),
+            message=message
+        )
@@ -0,0 +1,56 @@
+import os
+import tempfile
+from contextlib import contextmanager
+
+from django.conf import settings
+from django.db import connection
+from django.test.utils import setup_test_environment, teardown_test_environment
+from telebot import apihelper
+
+from apps.bot.benchmarks.fake_bot_api import FakeBotAPI
+
+
+@contextmanager
+def fake_telegram(**api_options):
+    """Направляет запросы telebot (и AsyncTeleBot в асинхронном режиме) на локальный FakeBotAPI."""
+    api = FakeBotAPI(**api_options).start()
+    previous_url = apihelper.API_URL
+    apihelper.API_URL = api.api_url
+    if settings.BOT_ASYNC_MODE:
+        from telebot import asyncio_helper
+
+        previous_async_url = asyncio_helper.API_URL
+        asyncio_helper.API_URL = api.api_url
+    os.environ.setdefault('TELEGRAM_BOT_TOKEN', '123456:benchmark')
+    os.environ.setdefault('GROUP_CHAT_ID', '-1000000000001')
+    try:
+        yield api
+    finally:
+        apihelper.API_URL = previous_url
+        if settings.BOT_ASYNC_MODE:
+            asyncio_helper.API_URL = previous_async_url
+        api.stop()
+
+
+@contextmanager
+def temporary_database():
+    """Временная БД с применёнными миграциями; для SQLite — файл, чтобы её видели все потоки."""
+    old_name = connection.settings_dict['NAME']
+    with tempfile.TemporaryDirectory(prefix='bot-benchmark-') as temp_dir:
+        if connection.vendor == 'sqlite':
+            connection.settings_dict['TEST']['NAME'] = os.path.join(temp_dir, 'benchmark.sqlite3')
+        setup_test_environment()
+        connection.creation.create_test_db(verbosity=0, autoclobber=True)
+        try:
+            yield
+        finally:
+            connection.creation.destroy_test_db(old_name, verbosity=0)
+            teardown_test_environment()
+
+
+def run_inline(bot):
+    """Обработчики и задачи Celery выполняются в вызывающем потоке."""
+    from dragontea.celery import app
+
+    bot.threaded = False
+    app.conf.task_always_eager = True
@@ -0,0 +1,116 @@
+import itertools
+import json
+import random
+import threading
+import time
+from collections import Counter
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs, urlparse
+
+# Методы, на которые сервер отвечает отправленным сообщением; остальные получают True
+MESSAGE_METHODS = {
+    'sendMessage', 'sendPhoto', 'sendInvoice',
+    'editMessageText', 'editMessageCaption', 'editMessageMedia', 'editMessageReplyMarkup',
+}
+
+
+class FakeBotAPI:
+    """
+    Локальная замена Bot API для нагрузочных прогонов. Принимает запросы telebot,
+    отвечает правдоподобными объектами и умеет добавлять задержку, ошибки 5xx и 429.
+    """
+
+    def __init__(self, host='127.0.0.1', port=0, latency=(0.0, 0.0), error_rate=0.0, rate_limit_rate=0.0):
+        self.latency = latency
+        self.error_rate = error_rate
+        self.rate_limit_rate = rate_limit_rate
+        self.calls = Counter()
+        self.injected = Counter()
+        self._message_ids = itertools.count(1)
+        self._lock = threading.Lock()
+        self._server = ThreadingHTTPServer((host, port), self._handler_class())
+        self._server.daemon_threads = True
+        self._thread = None
+
+    @property
+    def api_url(self):
+        host, port = self._server.server_address[:2]
+        return f'http://{host}:{port}/bot{{0}}/{{1}}'
+
+    def start(self):
+        self._thread = threading.Thread(target=self._server.serve_forever, name='fake-bot-api', daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self):
+        self._server.shutdown()
+        self._server.server_close()
+
+    def respond(self, api_method, params):
+        with self._lock:
+            self.calls[api_method] += 1
+        low, high = self.latency
+        if high > 0:
+            time.sleep(random.uniform(low, high))
+
+        chance = random.random()
+        if chance < self.rate_limit_rate:
+            with self._lock:
+                self.injected['429'] += 1
+            return 429, {
+                'ok': False, 'error_code': 429,
+                'description': 'Too Many Requests: retry after 1',
+                'parameters': {'retry_after': 1},
+            }
+        if chance < self.rate_limit_rate + self.error_rate:
+            with self._lock:
+                self.injected['500'] += 1
+            return 500, {'ok': False, 'error_code': 500, 'description': 'Internal Server Error'}
+
+        if api_method in MESSAGE_METHODS:
+            return 200, {'ok': True, 'result': self._message(params)}
+        if api_method == 'getMe':
+            return 200, {'ok': True, 'result': {'id': 1, 'is_bot': True, 'first_name': 'DragonTea', 'username': 'fake_bot'}}
+        return 200, {'ok': True, 'result': True}
+
+    def _message(self, params):
+        chat_id = params.get('chat_id', '0')
+        message = {
+            'message_id': int(params.get('message_id') or next(self._message_ids)),
+            'date': int(time.time()),
+            'chat': {'id': int(chat_id) if chat_id.lstrip('-').isdigit() else 0, 'type': 'private'},
+        }
+        if 'text' in params:
+            message['text'] = params['text']
+        if 'caption' in params or 'photo' in params or 'media' in params:
+            message['caption'] = params.get('caption', '')
+            message['photo'] = [{'file_id': f'fake-photo-{message["message_id"]}', 'file_unique_id': 'fake', 'width': 1, 'height': 1}]
+        return message
+
+    def _handler_class(self):
+        api = self
+
+        class Handler(BaseHTTPRequestHandler):
+            def _handle(self):
+                url = urlparse(self.path)
+                params = {key: values[0] for key, values in parse_qs(url.query).items()}
+                length = int(self.headers.get('Content-Length') or 0)
+                body = self.rfile.read(length) if length else b''
+                if body and self.headers.get('Content-Type', '').startswith('application/x-www-form-urlencoded'):
+                    params.update({key: values[0] for key, values in parse_qs(body.decode()).items()})
+
+                status, payload = api.respond(url.path.rsplit('/', 1)[-1], params)
+                data = json.dumps(payload).encode()
+                self.send_response(status)
+                self.send_header('Content-Type', 'application/json')
+                self.send_header('Content-Length', str(len(data)))
+                self.end_headers()
+                self.wfile.write(data)
+
+            do_GET = _handle
+            do_POST = _handle
+
+            def log_message(self, format, *args):
+                pass
+
+        return Handler
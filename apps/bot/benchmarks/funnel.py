@@ -0,0 +1,105 @@
+import itertools
+import time
+
+from apps.bot.models import Cart, Category, Order, Product
+from apps.bot.services.order_service import invoice_amount
+
+_update_ids = itertools.count(int(time.time()) * 1000)
+_message_ids = itertools.count(1)
+
+
+def seed_catalog(categories=3, products_per_category=8):
+    """Каталог для прогона: у всех товаров есть размеры и температура, как у напитков."""
+    product = None
+    for category_number in range(categories):
+        category = Category.objects.create(
+            title_ru=f'Категория {category_number}', title_uz=f'Kategoriya {category_number}'
+        )
+        for product_number in range(products_per_category):
+            product = Product.objects.create(
+                category=category,
+                title_ru=f'Чай {category_number}-{product_number}',
+                title_uz=f'Choy {category_number}-{product_number}',
+                price=20000, small_price=20000, big_price=28000,
+                small_volume=300, big_volume=500,
+                is_small=True, is_big=True, is_hot=True, is_cold=True,
+            )
+    return product
+
+
+def next_update_id():
+    return next(_update_ids)
+
+
+def _user(chat_id):
+    return {'id': chat_id, 'is_bot': False, 'first_name': f'User {chat_id}', 'language_code': 'ru'}
+
+
+def _chat(chat_id):
+    return {'id': chat_id, 'type': 'private'}
+
+
+def message_update(chat_id, **content):
+    return {
+        'update_id': next(_update_ids),
+        'message': {
+            'message_id': next(_message_ids),
+            'date': int(time.time()),
+            'chat': _chat(chat_id),
+            'from': _user(chat_id),
+            **content,
+        },
+    }
+
+
+def callback_update(chat_id, data):
+    return {
+        'update_id': next(_update_ids),
+        'callback_query': {
+            'id': str(next(_update_ids)),
+            'from': _user(chat_id),
+            'chat_instance': str(chat_id),
+            'data': data,
+            'message': {
+                'message_id': next(_message_ids),
+                'date': int(time.time()),
+                'chat': _chat(chat_id),
+                'text': '...',
+            },
+        },
+    }
+
+
+def funnel(chat_id, product):
+    """
+    Путь покупателя от /start до оплаты: пары (шаг, обновление). Генератор ленивый —
+    идентификаторы позиции корзины и заказа берутся из БД после предыдущих шагов.
+    """
+    yield 'start', message_update(chat_id, text='/start', entities=[{'type': 'bot_command', 'offset': 0, 'length': 6}])
+    yield 'language', callback_update(chat_id, 'language_ru')
+    yield 'contact', message_update(chat_id, contact={'phone_number': f'+998{chat_id % 10 ** 9:09d}', 'first_name': 'User', 'user_id': chat_id})
+    yield 'menu', message_update(chat_id, text='🍽️ Меню')
+    yield 'category', callback_update(chat_id, f'category_{product.category_id}')
+    yield 'product', callback_update(chat_id, f'product_{product.id}')
+    yield 'size', callback_update(chat_id, f'size_small_{product.id}')
+    yield 'temp', callback_update(chat_id, f'temp_hot_{product.id}')
+
+    cart_item_id = Cart.objects.filter(client__telegram_id=chat_id).order_by('-id').values_list('id', flat=True).first()
+    yield 'increase', callback_update(chat_id, f'increase_{cart_item_id}')
+    yield 'cart', message_update(chat_id, text='🛒 Корзина')
+    yield 'checkout', callback_update(chat_id, 'checkout')
+    yield 'location', message_update(chat_id, location={'latitude': 41.311081, 'longitude': 69.279737})
+
+    order = Order.objects.filter(client__telegram_id=chat_id, status='pending').order_by('-id').first()
+    if order is None:
+        return
+    payment = {'currency': 'UZS', 'total_amount': invoice_amount(order), 'invoice_payload': f'order_{order.id}'}
+    yield 'pre_checkout', {
+        'update_id': next(_update_ids),
+        'pre_checkout_query': {'id': str(next(_update_ids)), 'from': _user(chat_id), **payment},
+    }
+    yield 'payment', message_update(chat_id, successful_payment={
+        **payment,
+        'telegram_payment_charge_id': f'fake-charge-{order.id}',
+        'provider_payment_charge_id': f'fake-provider-{order.id}',
+    })
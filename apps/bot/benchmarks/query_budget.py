@@ -0,0 +1,113 @@
+from apps.bot.benchmarks.funnel import callback_update, message_update, next_update_id
+from apps.bot.models import ArchivedOrder, Cart, Category, Client, Order, Product
+from apps.bot.services.order_service import invoice_amount
+
+CHAT_ID = 100
+ADMIN_ID = 200
+
+
+class Fixture:
+    """Клиент с корзиной и заказами заданного размера — размер меняется, а число запросов не должно."""
+
+    def __init__(self, size, order_status):
+        self.category = Category.objects.create(title_ru='Чай', title_uz='Choy')
+        self.products = [
+            Product.objects.create(
+                category=self.category, title_ru=f'Чай {number}', title_uz=f'Choy {number}',
+                price=20000, small_price=20000, big_price=28000, small_volume=300, big_volume=500,
+                is_small=True, is_big=True, is_hot=True, is_cold=True,
+            )
+            for number in range(size)
+        ]
+        self.product = self.products[0]
+        self.client = Client.objects.create(
+            telegram_id=CHAT_ID, name='Покупатель', preferred_language='ru', phone_number='+998901234567'
+        )
+        self.cart_items = [
+            Cart.objects.create(client=self.client, product=product, quantity=2, is_small=True, is_hot=True)
+            for product in self.products
+        ]
+        cart_data = [
+            {
+                'product_id': product.id, 'product_title_ru': product.title_ru, 'product_title_uz': product.title_uz,
+                'quantity': 2, 'price': product.small_price, 'is_small': True, 'is_big': False,
+                'is_hot': True, 'is_cold': False, 'small_volume': product.small_volume, 'big_volume': product.big_volume,
+            }
+            for product in self.products
+        ]
+        orders = [
+            Order.objects.create(
+                client=self.client, status=status, total_price=40000 * size + 15000, delivery_cost=15000,
+                delivery_address='41.311081, 69.279737', cart_data_json=cart_data,
+            )
+            for status in ['completed'] * size + [order_status] * size
+        ]
+        # Более ранние заказы клиента уже в архиве
+        ArchivedOrder.objects.bulk_create([ArchivedOrder.from_order(order) for order in orders[:size]])
+        Order.objects.filter(id__in=[order.id for order in orders[:size]]).delete()
+        self.order = orders[-1]
+
+
+class Scenario:
+    def __init__(self, handler, build, order_status='pending', prelude=None):
+        self.handler = handler
+        self.build = build
+        self.order_status = order_status
+        # Обновления, которые готовят состояние бота и не входят в замер
+        self.prelude = prelude
+
+
+def _payment(fixture):
+    return {'currency': 'UZS', 'total_amount': invoice_amount(fixture.order), 'invoice_payload': f'order_{fixture.order.id}'}
+
+
+def _courier_reply(fixture, telegram_bot):
+    waiting = telegram_bot.admin_data[ADMIN_ID]
+    return message_update(
+        ADMIN_ID, text='Иван Иванов, 01A123AA, Toyota Corolla',
+        reply_to_message={'message_id': waiting['message_id'], 'date': 1, 'chat': {'id': ADMIN_ID, 'type': 'private'}, 'text': '...'},
+    )
+
+
+SCENARIOS = [
+    Scenario('start', lambda f, b: message_update(CHAT_ID, text='/start')),
+    Scenario('handle_language_selection', lambda f, b: callback_update(CHAT_ID, 'language_ru')),
+    Scenario('handle_contact', lambda f, b: message_update(CHAT_ID, contact={'phone_number': '+998901234567', 'first_name': 'A', 'user_id': CHAT_ID})),
+    Scenario('handle_menu', lambda f, b: message_update(CHAT_ID, text='🍽️ Меню')),
+    Scenario('handle_category_selection', lambda f, b: callback_update(CHAT_ID, f'category_{f.category.id}')),
+    Scenario('handle_product_selection', lambda f, b: callback_update(CHAT_ID, f'product_{f.product.id}')),
+    Scenario('handle_size_selection', lambda f, b: callback_update(CHAT_ID, f'size_small_{f.product.id}')),
+    Scenario(
+        'handle_temp_selection', lambda f, b: callback_update(CHAT_ID, f'temp_hot_{f.product.id}'),
+        prelude=lambda f, b: [callback_update(CHAT_ID, f'size_small_{f.product.id}')],
+    ),
+    Scenario('update_quantity', lambda f, b: callback_update(CHAT_ID, f'increase_{f.cart_items[0].id}')),
+    Scenario('quantity_do_nothing', lambda f, b: callback_update(CHAT_ID, 'quantity_do_nothing')),
+    Scenario('handle_cart', lambda f, b: message_update(CHAT_ID, text='🛒 Корзина')),
+    Scenario('view_cart', lambda f, b: callback_update(CHAT_ID, 'view_cart')),
+    Scenario('clear_cart', lambda f, b: callback_update(CHAT_ID, 'clear_cart')),
+    Scenario('checkout', lambda f, b: callback_update(CHAT_ID, 'checkout')),
+    Scenario('handle_location', lambda f, b: message_update(CHAT_ID, location={'latitude': 41.311081, 'longitude': 69.279737})),
+    Scenario('checkout_handler', lambda f, b: {
+        'update_id': next_update_id(),
+        'pre_checkout_query': {'id': '1', 'from': {'id': CHAT_ID, 'is_bot': False, 'first_name': 'A'}, **_payment(f)},
+    }),
+    Scenario('got_payment', lambda f, b: message_update(CHAT_ID, successful_payment={
+        **_payment(f), 'telegram_payment_charge_id': 'charge', 'provider_payment_charge_id': 'provider',
+    })),
+    Scenario('handle_settings', lambda f, b: message_update(CHAT_ID, text='⚙️ Настройки')),
+    Scenario('change_language', lambda f, b: callback_update(CHAT_ID, 'settings_language')),
+    Scenario('change_phone_number', lambda f, b: callback_update(CHAT_ID, 'settings_phone')),
+    Scenario('handle_my_orders', lambda f, b: message_update(CHAT_ID, text='🎁 Мои заказы'), order_status='in_progress'),
+    Scenario('handle_archived_orders', lambda f, b: callback_update(CHAT_ID, 'archived_orders')),
+    Scenario('handle_current_order_status', lambda f, b: message_update(CHAT_ID, text='🚚 Ваш заказ: В обработке'), order_status='in_progress'),
+    Scenario('handle_back_to_products', lambda f, b: callback_update(CHAT_ID, f'back_to_products_{f.category.id}')),
+    Scenario('handle_back_to_categories', lambda f, b: callback_update(CHAT_ID, 'back_to_categories')),
+    Scenario('handle_back_to_main', lambda f, b: callback_update(CHAT_ID, 'back_to_main'), order_status='in_progress'),
+    Scenario('handle_assign_courier', lambda f, b: callback_update(ADMIN_ID, f'assign_courier_{f.order.id}'), order_status='in_progress'),
+    Scenario(
+        'handle_courier_data', _courier_reply, order_status='in_progress',
+        prelude=lambda f, b: [callback_update(ADMIN_ID, f'assign_courier_{f.order.id}')],
+    ),
+    Scenario('handle_close_order', lambda f, b: callback_update(ADMIN_ID, f'close_order_{f.order.id}'), order_status='delivering'),
+]
@@ -0,0 +1,71 @@
+from apps.bot.keyboards.inline import cart_keyboard, catalog_keyboard, product_details_keyboard
+from apps.bot.models import Cart, Client, Order, Product
+from apps.bot.utils.formatting import build_invoice, format_cart_text, format_order_text, format_product_caption
+
+# Размеры синтетических корзин и заказов
+SIZES = (1, 10, 50)
+
+
+def make_product(number):
+    # Несохранённые экземпляры: форматирование не должно обращаться к БД
+    return Product(
+        id=number, category_id=1,
+        title_ru=f'Молочный улун {number}', title_uz=f'Sutli ulun {number}',
+        price=25000, small_price=25000, big_price=32000,
+        small_volume=300, big_volume=500,
+        is_small=True, is_big=True, is_hot=True, is_cold=True,
+    )
+
+
+def make_cart(size):
+    return [
+        Cart(id=number, product=make_product(number), quantity=number % 5 + 1,
+             is_small=number % 2 == 0, is_big=number % 2 == 1, is_hot=number % 3 != 0, is_cold=number % 3 == 0)
+        for number in range(size)
+    ]
+
+
+def make_cart_data(size):
+    return [
+        {
+            'product_id': item.product.id,
+            'product_title_ru': item.product.title_ru,
+            'product_title_uz': item.product.title_uz,
+            'quantity': item.quantity,
+            'price': item.product.get_price(is_small=item.is_small, is_big=item.is_big),
+            'is_small': item.is_small,
+            'is_big': item.is_big,
+            'is_hot': item.is_hot,
+            'is_cold': item.is_cold,
+            'small_volume': item.product.small_volume,
+            'big_volume': item.product.big_volume,
+        }
+        for item in make_cart(size)
+    ]
+
+
+def make_order(cart_data):
+    client = Client(id=1, telegram_id='100', name='Бенчмарк', telegram_username='bench', phone_number='+998901234567')
+    products_cost = sum(item['price'] * item['quantity'] for item in cart_data)
+    return Order(
+        id=1, client=client, status='in_progress', delivery_cost=15000,
+        total_price=products_cost + 15000, delivery_address='41.311081, 69.279737', cart_data_json=cart_data,
+    )
+
+
+def cases():
+    """Пары (имя, функция без аргументов) для замера."""
+    product = make_product(1)
+    catalog = [{'id': number, 'title_ru': f'Товар {number}', 'title_uz': f'Mahsulot {number}'} for number in range(24)]
+    yield 'product_caption', lambda: format_product_caption(product, 'ru', 3, True, False, True, False)
+    yield 'product_details_keyboard', lambda: product_details_keyboard(1, 3, 1, 'ru').to_json()
+    yield 'catalog_keyboard[24]', lambda: catalog_keyboard(catalog, 'product_', 'back_to_categories', 'ru').to_json()
+    yield 'cart_keyboard', lambda: cart_keyboard('ru').to_json()
+
+    for size in SIZES:
+        cart = make_cart(size)
+        cart_data = make_cart_data(size)
+        order = make_order(cart_data)
+        yield f'cart_text[{size}]', lambda cart=cart: format_cart_text(cart, 'ru')
+        yield f'order_text[{size}]', lambda order=order, cart_data=cart_data: format_order_text(order, 'ru', cart_data, is_admin=True)
+        yield f'invoice[{size}]', lambda order=order, cart_data=cart_data: build_invoice(order, 'uz', cart_data)
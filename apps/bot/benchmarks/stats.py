@@ -0,0 +1,18 @@
+def percentile(values, percent):
+    """Перцентиль по ближайшему рангу; для пустого списка — 0."""
+    if not values:
+        return 0.0
+    ordered = sorted(values)
+    index = min(len(ordered) - 1, max(0, round(len(ordered) * percent / 100) - 1))
+    return ordered[index]
+
+
+class QueryCounter:
+    """execute_wrapper соединения Django, считающий запросы."""
+
+    def __init__(self):
+        self.count = 0
+
+    def __call__(self, execute, sql, params, many, context):
+        self.count += 1
+        return execute(sql, params, many, context)
@@ -0,0 +1,51 @@
+import os
+import threading
+
+from dotenv import load_dotenv
+from telebot import TeleBot
+
+_bot = None
+_telegram_bot = None
+_lock = threading.RLock()
+
+
+def get_bot():
+    """Общий экземпляр TeleBot процесса. Создание не выполняет сетевых запросов."""
+    global _bot
+    if _bot is None:
+        with _lock:
+            if _bot is None:
+                load_dotenv()
+                _bot = TeleBot(os.getenv('TELEGRAM_BOT_TOKEN'))
+    return _bot
+
+
+def get_telegram_bot():
+    """
+    TelegramBot с зарегистрированными обработчиками, создаётся при первом обновлении.
+    Вебхук здесь не трогаем — его регистрирует команда set_webhook.
+    """
+    global _telegram_bot
+    if _telegram_bot is None:
+        from apps.bot.views import TelegramBot
+
+        with _lock:
+            if _telegram_bot is None:
+                _telegram_bot = TelegramBot()
+    return _telegram_bot
+
+
+_async_telegram_bot = None
+
+
+def get_async_telegram_bot():
+    """AsyncTelegramBot для ASGI-режима; синхронный бот создаётся отдельно, при первой передаче ему обновления."""
+    global _async_telegram_bot
+    if _async_telegram_bot is None:
+        from apps.bot.async_views import AsyncTelegramBot
+
+        with _lock:
+            if _async_telegram_bot is None:
+                load_dotenv()
+                _async_telegram_bot = AsyncTelegramBot(os.getenv('TELEGRAM_BOT_TOKEN'))
+    return _async_telegram_bot
@@ -15,3 +15,74 @@ class LanguageHandler:
             button = InlineKeyboardButton(text=lang_name, callback_data=f"language_{lang_code}")
             markup.add(button)
         return markup
+
+
+def catalog_keyboard(entries, callback_prefix, back_callback, language_code):
+    """Кнопки категорий или товаров из кэша каталога и кнопка «Назад»."""
+    keyboard = InlineKeyboardMarkup(row_width=2)
+    keyboard.add(*[
+        InlineKeyboardButton(
+            text=entry['title_uz'] if language_code == 'uz' else entry['title_ru'],
+            callback_data=f"{callback_prefix}{entry['id']}"
+        )
+        for entry in entries
+    ])
+    keyboard.add(
+        InlineKeyboardButton(
+            "🔙 Orqaga" if language_code == 'uz' else "🔙 Назад",
+            callback_data=back_callback
+        )
+    )
+    return keyboard
+
+
+def cart_keyboard(language_code):
+    keyboard = InlineKeyboardMarkup(row_width=2)
+    keyboard.add(
+        InlineKeyboardButton(
+            "✅ Оформить заказ" if language_code == 'ru' else "✅ Buyurtma berish",
+            callback_data="checkout"
+        ),
+        InlineKeyboardButton(
+            "🗑️ Очистить корзину" if language_code == 'ru' else "🗑️ Savatni tozalash",
+            callback_data="clear_cart"
+        )
+    )
+    keyboard.add(
+        InlineKeyboardButton(
+            "🔙 Назад" if language_code == 'ru' else "🔙 Orqaga",
+            callback_data="back_to_main"
+        )
+    )
+    return keyboard
+
+
+def archived_orders_keyboard(language_code):
+    keyboard = InlineKeyboardMarkup()
+    keyboard.add(
+        InlineKeyboardButton(
+            "📦 Показать архив" if language_code == 'ru' else "📦 Arxivni ko'rsatish",
+            callback_data="archived_orders"
+        )
+    )
+    return keyboard
+
+
+def product_details_keyboard(cart_item_id, quantity, category_id, language_code):
+    keyboard = InlineKeyboardMarkup(row_width=3)
+    keyboard.add(
+        InlineKeyboardButton("➖", callback_data=f"decrease_{cart_item_id}"),
+        InlineKeyboardButton(f"{quantity}", callback_data="quantity_do_nothing"),
+        InlineKeyboardButton("➕", callback_data=f"increase_{cart_item_id}")
+    )
+    keyboard.add(
+        InlineKeyboardButton(
+            "🛒 Корзина" if language_code == 'ru' else "🛒 Savat",
+            callback_data="view_cart"
+        ),
+        InlineKeyboardButton(
+            "🔙 Назад" if language_code == 'ru' else "🔙 Orqaga",
+            callback_data=f"back_to_products_{category_id}"
+        )
+    )
+    return keyboard
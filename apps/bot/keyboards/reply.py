@@ -32,3 +32,37 @@ class MainMenuKeyboard:
 
         keyboard.add(*buttons)
         return keyboard
+
+
+ORDER_STATUS_BUTTONS = {
+    'ru': {'in_progress': "В обработке", 'delivering': "Доставляется"},
+    'uz': {'in_progress': "Qayta ishlanmoqda", 'delivering': "Yetkazilmoqda"},
+}
+
+
+def main_menu_keyboard(language_code, order_status=None):
+    """Главное меню; для заказа в работе добавляется кнопка с его статусом."""
+    keyboard = ReplyKeyboardMarkup(resize_keyboard=True, row_width=2)
+
+    if language_code == 'ru':
+        keyboard.add(
+            KeyboardButton("🍽️ Меню"),
+            KeyboardButton("🎁 Мои заказы"),
+            KeyboardButton("🛒 Корзина"),
+            KeyboardButton("⚙️ Настройки")
+        )
+    elif language_code == 'uz':
+        keyboard.add(
+            KeyboardButton("🍽️ Menu"),
+            KeyboardButton("🎁 Buyurtmalarim"),
+            KeyboardButton("🛒 Savat"),
+            KeyboardButton("⚙️ Sozlamalar")
+        )
+
+    if order_status in ('in_progress', 'delivering'):
+        if language_code == 'ru':
+            keyboard.add(KeyboardButton(f"🚚 Ваш заказ: {ORDER_STATUS_BUTTONS['ru'][order_status]}"))
+        elif language_code == 'uz':
+            keyboard.add(KeyboardButton(f"🚚 Buyurtma: {ORDER_STATUS_BUTTONS['uz'][order_status]}"))
+
+    return keyboard
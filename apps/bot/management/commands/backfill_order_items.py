@@ -0,0 +1,51 @@
+from django.core.management.base import BaseCommand
+
+from apps.bot.models import Order, OrderItem, Product
+from apps.bot.services.order_service import build_order_items
+
+
+class Command(BaseCommand):
+    help = (
+        "Заполняет OrderItem для заказов, оформленных до появления таблицы, из их cart_data_json. "
+        "Читает заказы пачками по id; заказы, у которых позиции уже есть, пропускает — команду можно перезапускать"
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, default=500)
+
+    def handle(self, *args, **options):
+        # Старые снимки хранят только название товара
+        product_ids_by_title = dict(Product.objects.values_list('title_ru', 'id'))
+
+        last_id = 0
+        orders_filled = items_created = 0
+        while True:
+            # Пагинация по ключу: каждая пачка — один быстрый запрос по первичному ключу
+            orders = list(
+                Order.objects.filter(id__gt=last_id)
+                .order_by('id')
+                .only('id', 'created_at', 'cart_data_json')[:options['batch_size']]
+            )
+            if not orders:
+                break
+            last_id = orders[-1].id
+
+            filled = set(
+                OrderItem.objects.filter(order_id__in=[order.id for order in orders])
+                .values_list('order_id', flat=True)
+                .distinct()
+            )
+            items = []
+            for order in orders:
+                if order.id not in filled:
+                    order_items = build_order_items(order, order.cart_data_json, product_ids_by_title)
+                    orders_filled += bool(order_items)
+                    items.extend(order_items)
+
+            OrderItem.objects.bulk_create(items)
+            items_created += len(items)
+            self.stdout.write(f"До заказа {last_id}: создано позиций {items_created}")
+
+        self.stdout.write(self.style.SUCCESS(
+            f"Готово: заполнено заказов {orders_filled}, создано позиций {items_created}."
+        ))
@@ -0,0 +1,32 @@
+from django.conf import settings
+from django.core.management.base import BaseCommand
+
+from apps.bot.services.analytics import reset_sales_rollups, roll_up_sales
+
+
+class Command(BaseCommand):
+    help = (
+        "Заполняет агрегаты продаж (DailySales, SalesRollup) по истории заказов. Продолжает с водяного "
+        "знака, как задача roll_up_sales; --rebuild пересчитывает всё заново. Перед первым запуском "
+        "нужен backfill_order_items. Архивные заказы при пересборке не учитываются — "
+        "их сначала нужно вернуть restore_orders"
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, default=settings.BOT_SALES_ROLLUP_BATCH_SIZE)
+        parser.add_argument('--rebuild', action='store_true', help="Очистить агрегаты и пересчитать с первого заказа")
+
+    def handle(self, *args, **options):
+        if options['rebuild']:
+            reset_sales_rollups()
+            self.stdout.write("Агрегаты очищены.")
+
+        total = 0
+        while True:
+            processed = roll_up_sales(options['batch_size'], max_batches=1)
+            if not processed:
+                break
+            total += processed
+            self.stdout.write(f"Учтено заказов: {total}")
+
+        self.stdout.write(self.style.SUCCESS(f"Готово: учтено заказов {total}."))
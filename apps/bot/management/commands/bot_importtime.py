@@ -0,0 +1,73 @@
+import os
+import re
+import subprocess
+import sys
+from collections import defaultdict
+from pathlib import Path
+
+from django.conf import settings
+from django.core.management.base import BaseCommand
+
+PROFILE_PATH = Path(__file__).resolve().parents[2] / 'benchmarks' / 'importtime.txt'
+
+# Что загружает процесс на разных этапах запуска
+STAGES = {
+    'setup': [],
+    'urls': ['apps.bot.urls'],
+    'first_update': ['apps.bot.urls', 'apps.bot.views'],
+    'celery_worker': ['apps.bot.tasks'],
+}
+
+SCRIPT = '''
+import time
+started_at = time.perf_counter()
+import django
+django.setup()
+for module in {modules!r}:
+    __import__(module)
+print('wall_ms', (time.perf_counter() - started_at) * 1000)
+'''
+
+LINE_PATTERN = re.compile(r'^import time:\s+(\d+) \|\s+\d+ \| *(\S+)$')
+
+
+def profile_stage(modules):
+    """Запускает чистый интерпретатор с -X importtime и возвращает собственное время импорта по пакетам."""
+    result = subprocess.run(
+        [sys.executable, '-X', 'importtime', '-c', SCRIPT.format(modules=modules)],
+        capture_output=True, text=True, cwd=settings.BASE_DIR,
+        env={**os.environ, 'DJANGO_SETTINGS_MODULE': os.environ.get('DJANGO_SETTINGS_MODULE', 'dragontea.settings')},
+    )
+    packages = defaultdict(int)
+    for line in result.stderr.splitlines():
+        match = LINE_PATTERN.match(line)
+        if match:
+            packages[match.group(2).split('.')[0]] += int(match.group(1))
+    wall_ms = next(
+        (float(line.split()[1]) for line in result.stdout.splitlines() if line.startswith('wall_ms')), 0.0
+    )
+    return wall_ms, packages
+
+
+class Command(BaseCommand):
+    help = "Профиль импорта при старте (python -X importtime): django.setup(), загрузка urls и первого обновления"
+
+    def add_arguments(self, parser):
+        parser.add_argument('--runs', type=int, default=5, help="Запусков на этап, берётся медиана")
+        parser.add_argument('--top', type=int, default=12)
+        parser.add_argument('--save', action='store_true', help=f"Записать профиль в {PROFILE_PATH.name}")
+
+    def handle(self, *args, **options):
+        lines = []
+        for stage, modules in STAGES.items():
+            runs = sorted((profile_stage(modules) for _ in range(options['runs'])), key=lambda run: run[0])
+            wall_ms, packages = runs[len(runs) // 2]
+            lines.append(f"== {stage}: {wall_ms:.1f} мс (медиана из {options['runs']})")
+            for package, microseconds in sorted(packages.items(), key=lambda item: item[1], reverse=True)[:options['top']]:
+                lines.append(f"   {package:<24} {microseconds / 1000:>8.1f} мс")
+
+        for line in lines:
+            self.stdout.write(line)
+        if options['save']:
+            PROFILE_PATH.write_text('\n'.join(lines) + '\n', encoding='utf-8')
+            self.stdout.write(f"Профиль сохранён в {PROFILE_PATH}")
@@ -0,0 +1,155 @@
+import asyncio
+import json
+import threading
+import time
+from collections import defaultdict
+from concurrent.futures import ThreadPoolExecutor
+
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.core.management.base import BaseCommand
+from django.db import connection
+from django.test import AsyncClient, Client as HttpClient
+
+from apps.bot.benchmarks.environment import fake_telegram, run_inline, temporary_database
+from apps.bot.benchmarks.stats import QueryCounter, percentile
+
+
+class Command(BaseCommand):
+    help = (
+        "Нагрузочный прогон: воронка покупателей от /start до оплаты через webhook/ "
+        "на временной БД и локальном фейковом Bot API. С BOT_ASYNC_MODE=1 нагружается асинхронный вебхук"
+    )
+    def add_arguments(self, parser):
+        parser.add_argument('--users', type=int, default=50, help="Количество покупателей")
+        parser.add_argument('--concurrency', type=int, default=4, help="Покупателей, обрабатываемых одновременно")
+        parser.add_argument('--latency-ms', default='20,80', help="Задержка фейкового Bot API: мин,макс в мс")
+        parser.add_argument('--error-rate', type=float, default=0.0, help="Доля ответов 500")
+        parser.add_argument('--rate-limit-rate', type=float, default=0.0, help="Доля ответов 429")
+
+    def handle(self, *args, **options):
+        low, _, high = options['latency_ms'].partition(',')
+        api_options = {
+            'latency': (float(low) / 1000, float(high or low) / 1000),
+            'error_rate': options['error_rate'],
+            'rate_limit_rate': options['rate_limit_rate'],
+        }
+        run_funnels = self.run_async_funnels if settings.BOT_ASYNC_MODE else self.run_funnels
+        with fake_telegram(**api_options) as api, temporary_database():
+            results, elapsed = run_funnels(options['users'], options['concurrency'])
+
+        self.report(results, elapsed, api)
+
+    def run_funnels(self, users, concurrency):
+        from apps.bot.benchmarks.funnel import funnel, seed_catalog
+        from apps.bot.bot_initializer import get_telegram_bot
+
+        # Обработчики и задачи выполняются в потоке запроса — задержка включает всю обработку
+        run_inline(get_telegram_bot().bot)
+        product = seed_catalog()
+
+        results = []
+        results_lock = threading.Lock()
+
+        def run_user(number):
+            http = HttpClient()
+            user_results = []
+            try:
+                for step, update in funnel(9_000_000_000 + number, product):
+                    queries = QueryCounter()
+                    started_at = time.perf_counter()
+                    with connection.execute_wrapper(queries):
+                        response = http.post('/webhook/', data=json.dumps(update), content_type='application/json')
+                    user_results.append((step, time.perf_counter() - started_at, queries.count, response.status_code))
+            finally:
+                connection.close()
+                with results_lock:
+                    results.extend(user_results)
+
+        started_at = time.perf_counter()
+        with ThreadPoolExecutor(max_workers=concurrency) as executor:
+            for future in [executor.submit(run_user, number) for number in range(users)]:
+                future.result()
+        return results, time.perf_counter() - started_at
+
+    def run_async_funnels(self, users, concurrency):
+        """
+        Покупатели — задачи одного цикла событий. Запросы к БД выполняются в потоках
+        asgiref и к обновлению не привязываются, поэтому SQL на обновление не считается.
+        """
+        from apps.bot.benchmarks.funnel import funnel, seed_catalog
+        from apps.bot.bot_initializer import get_async_telegram_bot, get_telegram_bot
+
+        # Синхронный бот обрабатывает переданные ему обновления в потоке вызова
+        run_inline(get_telegram_bot().bot)
+        async_bot = get_async_telegram_bot().bot
+        product = seed_catalog()
+
+        async def run_all():
+            semaphore = asyncio.Semaphore(concurrency)
+            http = AsyncClient()
+
+            async def run_user(number):
+                user_results = []
+                # Генератор воронки читает БД синхронно — берём шаги через sync_to_async
+                steps = funnel(9_000_000_000 + number, product)
+                async with semaphore:
+                    while (item := await sync_to_async(next)(steps, None)) is not None:
+                        step, update = item
+                        started_at = time.perf_counter()
+                        response = await http.post('/webhook/', data=json.dumps(update), content_type='application/json')
+                        user_results.append((step, time.perf_counter() - started_at, None, response.status_code))
+                return user_results
+
+            try:
+                user_results = await asyncio.gather(*(run_user(number) for number in range(users)))
+            finally:
+                await async_bot.close_session()
+            return [result for results in user_results for result in results]
+
+        started_at = time.perf_counter()
+        results = asyncio.run(run_all())
+        return results, time.perf_counter() - started_at
+
+    def report(self, results, elapsed, api):
+        if not results:
+            self.stdout.write("Обновления не отправлены.")
+            return
+
+        by_step = defaultdict(list)
+        for step, duration, queries, status in results:
+            by_step[step].append((duration, queries, status))
+
+        def average_queries(rows):
+            counts = [queries for queries in rows if queries is not None]
+            return f'{sum(counts) / len(counts):.1f}' if counts else '—'
+
+        durations = [duration * 1000 for _, duration, _, _ in results]
+        errors = sum(1 for *_, status in results if status != 200)
+        self.stdout.write(
+            f"Режим: {'асинхронный (ASGI)' if settings.BOT_ASYNC_MODE else 'синхронный (WSGI)'}. "
+            f"Обновлений: {len(results)} за {elapsed:.2f} с, {len(results) / elapsed:.1f} обновл./с, ошибок: {errors}"
+        )
+        self.stdout.write(
+            f"Задержка, мс: p50 {percentile(durations, 50):.1f}, p95 {percentile(durations, 95):.1f}, "
+            f"p99 {percentile(durations, 99):.1f}; запросов к БД на обновление: "
+            f"{average_queries(queries for _, _, queries, _ in results)}"
+        )
+        self.stdout.write(
+            f"{'Шаг':<14} {'Кол-во':>7} {'p50, мс':>9} {'p95, мс':>9} {'p99, мс':>9} {'SQL':>6} {'Ошибки':>7}"
+        )
+        for step, rows in by_step.items():
+            step_durations = [duration * 1000 for duration, _, _ in rows]
+            self.stdout.write(
+                f"{step:<14} {len(rows):>7} {percentile(step_durations, 50):>9.1f} "
+                f"{percentile(step_durations, 95):>9.1f} {percentile(step_durations, 99):>9.1f} "
+                f"{average_queries(queries for _, queries, _ in rows):>6} "
+                f"{sum(1 for *_, status in rows if status != 200):>7}"
+            )
+        self.stdout.write(
+            "Bot API: " + ', '.join(f'{method} {count}' for method, count in api.calls.most_common())
+        )
+        if api.injected:
+            self.stdout.write(
+                "Внедрённые ошибки: " + ', '.join(f'{status} {count}' for status, count in api.injected.items())
+            )
@@ -0,0 +1,105 @@
+import json
+import statistics
+import timeit
+from pathlib import Path
+
+from django.core.management.base import BaseCommand, CommandError
+
+from apps.bot.benchmarks.rendering import cases
+
+BASELINE_PATH = Path(__file__).resolve().parents[2] / 'benchmarks' / 'baseline.json'
+# Эталонная нагрузка, не зависящая от кода бота: участвует в оценке скорости машины наравне со случаями
+REFERENCE = 'reference'
+
+
+def reference_workload():
+    return ''.join(f'{number:,} сум\n' for number in range(200))
+
+
+def measure_rounds(functions, rounds, repeat):
+    """
+    Для каждой функции — список времён в мкс по раундам. Раунд проходит все функции подряд,
+    поэтому кратковременная нагрузка на машину задевает один раунд, а не все замеры одного случая.
+    """
+    timers = {name: timeit.Timer(function) for name, function in functions}
+    numbers = {name: timer.autorange()[0] for name, timer in timers.items()}
+    times = {name: [] for name in timers}
+    for _ in range(rounds):
+        for name, timer in timers.items():
+            best = min(timer.repeat(repeat=repeat, number=numbers[name]))
+            times[name].append(best / numbers[name] * 1_000_000)
+    return times
+
+
+def summarize(times):
+    """
+    Минимум по раундам меньше всего зависит от фоновой нагрузки. Шумовая полоса — насколько
+    второй по скорости раунд отстал от лучшего: у стабильного случая она близка к нулю.
+    """
+    summary = {}
+    for name, values in times.items():
+        best, second = sorted(values)[:2]
+        summary[name] = {'microseconds': round(best, 3), 'noise': round(second / best - 1, 3)}
+    return summary
+
+
+def machine_speed(results, baseline):
+    # Медиана отношений по всем случаям: одна медленная функция (регрессия или выброс)
+    # не сдвигает оценку, как сдвигал её единственный эталон
+    ratios = [
+        result['microseconds'] / baseline[name]['microseconds']
+        for name, result in results.items() if name in baseline
+    ]
+    return statistics.median(ratios) if ratios else 1.0
+
+
+class Command(BaseCommand):
+    help = (
+        "Замеряет форматирование текстов и клавиатур на синтетических заказах и корзинах "
+        "и сравнивает с сохранённым базовым уровнем"
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--baseline', default=str(BASELINE_PATH))
+        parser.add_argument('--save-baseline', action='store_true', help="Записать результаты как новый базовый уровень")
+        parser.add_argument(
+            '--threshold', type=float, default=0.25,
+            help="Допустимое замедление сверх шумовой полосы случая, доля (0.25 = 25%%)"
+        )
+        parser.add_argument('--rounds', type=int, default=5, help="Раундов замера; сравнивается лучший раунд")
+        parser.add_argument('--repeat', type=int, default=3, help="Повторов в раунде")
+
+    def handle(self, *args, **options):
+        functions = [(REFERENCE, reference_workload), *cases()]
+        results = summarize(measure_rounds(functions, options['rounds'], options['repeat']))
+
+        baseline_path = Path(options['baseline'])
+        if options['save_baseline']:
+            baseline_path.write_text(json.dumps(results, ensure_ascii=False, indent=2) + '\n', encoding='utf-8')
+            self.stdout.write(f"Базовый уровень сохранён в {baseline_path}")
+
+        baseline = json.loads(baseline_path.read_text(encoding='utf-8')) if baseline_path.exists() else {}
+        speed = machine_speed(results, baseline)
+        self.stdout.write(f"Скорость машины относительно базового уровня: {speed:.2f}")
+
+        regressions = []
+        self.stdout.write(f"{'Функция':<28} {'мкс':>10} {'База, мкс':>10} {'Изменение':>10} {'Допуск':>8}")
+        for name, result in results.items():
+            if name == REFERENCE:
+                continue
+            base = baseline.get(name)
+            if not base:
+                self.stdout.write(f"{name:<28} {result['microseconds']:>10.1f} {'—':>10}")
+                continue
+            expected = base['microseconds'] * speed
+            change = result['microseconds'] / expected - 1
+            # Порог отсчитывается от шума случая: больший из разбросов базового и текущего замеров
+            allowed = options['threshold'] + max(base['noise'], result['noise'])
+            if change > allowed:
+                regressions.append(name)
+            self.stdout.write(
+                f"{name:<28} {result['microseconds']:>10.1f} {expected:>10.1f} {change:>+10.1%} {allowed:>8.0%}"
+            )
+
+        if regressions:
+            raise CommandError(f"Замедление больше допуска: {', '.join(regressions)}")
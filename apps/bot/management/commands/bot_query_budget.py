@@ -0,0 +1,129 @@
+import functools
+import json
+from pathlib import Path
+
+from django.core.cache import cache
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection, transaction
+from django.test import override_settings
+from telebot.types import Update
+
+from apps.bot.benchmarks.environment import fake_telegram, run_inline, temporary_database
+from apps.bot.benchmarks.stats import QueryCounter
+from apps.bot.middlewares.instrumentation import HANDLER_ATTRIBUTES
+
+BUDGET_PATH = Path(__file__).resolve().parents[2] / 'benchmarks' / 'query_budget.json'
+# Сценарии очищают кэш перед каждым прогоном — только свой, а не настроенный Redis с ключами
+# дедупликации, снимками заказов и версиями каталога работающего бота
+BUDGET_CACHES = {
+    'default': {'BACKEND': 'django.core.cache.backends.locmem.LocMemCache', 'LOCATION': 'bot-query-budget'},
+}
+
+
+class Command(BaseCommand):
+    help = (
+        "Передаёт каждому обработчику бота синтетическое обновление и сверяет число "
+        "запросов к БД с бюджетом; запросы на каждую позицию корзины считаются ошибкой"
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--budget', default=str(BUDGET_PATH))
+        parser.add_argument('--update', action='store_true', help="Записать текущие значения как бюджет")
+        parser.add_argument('--sizes', default='1,5', help="Размеры корзины и истории заказов, через запятую")
+
+    def handle(self, *args, **options):
+        sizes = [int(size) for size in options['sizes'].split(',')]
+        with override_settings(CACHES=BUDGET_CACHES), fake_telegram(), temporary_database():
+            results, unexercised = self.run_scenarios(sizes)
+
+        budget_path = Path(options['budget'])
+        if options['update']:
+            budget = {handler: max(counts.values()) for handler, (counts, _) in results.items()}
+            budget_path.write_text(json.dumps(budget, ensure_ascii=False, indent=2) + '\n', encoding='utf-8')
+            self.stdout.write(f"Бюджет сохранён в {budget_path}")
+        budget = json.loads(budget_path.read_text(encoding='utf-8')) if budget_path.exists() else {}
+
+        failures = []
+        self.stdout.write(
+            f"{'Обработчик':<30} " + ' '.join(f"{f'N={size}':>6}" for size in sizes) + f" {'Бюджет':>7}  Результат"
+        )
+        for handler, (counts, error) in results.items():
+            expected = budget.get(handler)
+            if error:
+                status = f"ошибка: {error}"
+            elif len(set(counts.values())) > 1:
+                status = "растёт с размером корзины"
+            elif expected is None:
+                status = "нет в бюджете"
+            elif counts[sizes[0]] != expected:
+                status = "превышен" if counts[sizes[0]] > expected else "меньше бюджета, обновите --update"
+            else:
+                status = "ok"
+            if status != "ok":
+                failures.append(handler)
+            self.stdout.write(
+                f"{handler:<30} " + ' '.join(f"{counts.get(size, '—'):>6}" for size in sizes)
+                + f" {'—' if expected is None else expected:>7}  {status}"
+            )
+
+        if unexercised:
+            self.stdout.write(f"Нет сценария для обработчиков: {', '.join(sorted(unexercised))}")
+        if failures:
+            raise CommandError(f"Бюджет запросов нарушен: {', '.join(failures)}")
+
+    def run_scenarios(self, sizes):
+        from apps.bot.benchmarks.query_budget import SCENARIOS, Fixture
+        from apps.bot.bot_initializer import get_telegram_bot
+
+        telegram_bot = get_telegram_bot()
+        run_inline(telegram_bot.bot)
+
+        called = []
+        registered = set()
+        for attribute in HANDLER_ATTRIBUTES:
+            for handler in getattr(telegram_bot.bot, attribute, []):
+                registered.add(handler['function'].__name__)
+                handler['function'] = self.record_calls(handler['function'], called)
+
+        def process(update):
+            telegram_bot.bot.process_new_updates([Update.de_json(update)])
+
+        results = {}
+        for scenario in SCENARIOS:
+            counts = {}
+            error = None
+            for size in sizes:
+                cache.clear()
+                telegram_bot.user_data.clear()
+                telegram_bot.admin_data.clear()
+                queries = QueryCounter()
+                try:
+                    # Каждый сценарий начинается с одних и тех же данных
+                    with transaction.atomic():
+                        fixture = Fixture(size, scenario.order_status)
+                        for update in scenario.prelude(fixture, telegram_bot) if scenario.prelude else []:
+                            process(update)
+                        update = scenario.build(fixture, telegram_bot)
+                        called.clear()
+                        with connection.execute_wrapper(queries):
+                            process(update)
+                        transaction.set_rollback(True)
+                except Exception as e:
+                    error = repr(e)
+                    break
+                if scenario.handler not in called:
+                    error = f"вызван {', '.join(called) or 'ни один обработчик'}"
+                    break
+                counts[size] = queries.count
+            results[scenario.handler] = (counts, error)
+
+        return results, registered - {scenario.handler for scenario in SCENARIOS}
+
+    @staticmethod
+    def record_calls(function, called):
+        @functools.wraps(function)
+        def wrapper(*args, **kwargs):
+            called.append(function.__name__)
+            return function(*args, **kwargs)
+
+        return wrapper
@@ -0,0 +1,113 @@
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+from django.db import OperationalError, connection
+from django.test import override_settings
+
+from apps.bot.benchmarks.environment import temporary_database
+from apps.bot.benchmarks.stats import percentile
+
+# Настройки SQLite до профиля: журнал отката, полная синхронизация, таймаут по умолчанию
+PROFILES = {
+    'default': {'pragmas': {'journal_mode': 'DELETE', 'synchronous': 'FULL'}, 'timeout': 5, 'queue': False},
+    'tuned': {'pragmas': None, 'timeout': None, 'queue': False},
+    'tuned+queue': {'pragmas': None, 'timeout': None, 'queue': True},
+}
+
+
+class Command(BaseCommand):
+    help = (
+        "Пропускная способность записи в SQLite: потоки изменяют количество в корзине и статус "
+        "заказа, как обработчики бота. Сравнивает настройки по умолчанию, профиль PRAGMA и поток-писатель"
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--threads', type=int, default=8, help="Параллельных потоков-обработчиков")
+        parser.add_argument('--writes', type=int, default=300, help="Записей на поток")
+        parser.add_argument('--profiles', default=','.join(PROFILES), help="Профили через запятую")
+
+    def handle(self, *args, **options):
+        if connection.vendor != 'sqlite':
+            raise CommandError("Замер предназначен для SQLite.")
+        profiles = [name.strip() for name in options['profiles'].split(',') if name.strip()]
+        unknown = set(profiles) - set(PROFILES)
+        if unknown:
+            raise CommandError(f"Неизвестные профили: {', '.join(sorted(unknown))}")
+
+        with temporary_database():
+            rows = self.seed(options['threads'])
+            self.stdout.write(
+                f"{'Профиль':<12} {'Записей/с':>10} {'p50, мс':>9} {'p99, мс':>9} {'Ошибки':>7}"
+            )
+            for name in profiles:
+                throughput, durations, errors = self.run_profile(PROFILES[name], rows, options['writes'])
+                self.stdout.write(
+                    f"{name:<12} {throughput:>10.0f} {percentile(durations, 50):>9.2f} "
+                    f"{percentile(durations, 99):>9.2f} {errors:>7}"
+                )
+
+    def seed(self, threads):
+        from apps.bot.benchmarks.funnel import seed_catalog
+        from apps.bot.models import Cart, Client, Order
+
+        product = seed_catalog(categories=1, products_per_category=1)
+        rows = []
+        for number in range(threads):
+            client = Client.objects.create(telegram_id=str(8_000_000_000 + number), name=f'Writer {number}')
+            cart_item = Cart.objects.create(client=client, product=product, quantity=1)
+            order = Order.objects.create(client=client, total_price=20000, status='in_progress')
+            rows.append((cart_item.id, order.id))
+        return rows
+
+    def run_profile(self, profile, rows, writes):
+        from apps.bot.models import Cart, Order
+        from apps.bot.services.write_queue import run_write
+
+        options = connection.settings_dict['OPTIONS']
+        previous_timeout = options.get('timeout')
+        options['timeout'] = profile['timeout'] or previous_timeout
+        overrides = {
+            'BOT_SQLITE_PRAGMAS': profile['pragmas'] or settings.BOT_SQLITE_PRAGMAS,
+            'BOT_SQLITE_WRITE_QUEUE': profile['queue'],
+        }
+
+        def run_writer(cart_item_id, order_id):
+            durations = []
+            errors = 0
+            try:
+                cart_item = Cart.objects.get(id=cart_item_id)
+                order = Order.objects.get(id=order_id)
+                for number in range(writes):
+                    started_at = time.perf_counter()
+                    try:
+                        # Как в update_quantity и при смене статуса заказа
+                        if number % 4:
+                            cart_item.quantity += 1
+                            run_write(cart_item.save, update_fields=['quantity'])
+                        else:
+                            order.status = 'delivering' if order.status == 'in_progress' else 'in_progress'
+                            run_write(order.save, update_fields=['status'])
+                    except OperationalError:
+                        errors += 1
+                    durations.append((time.perf_counter() - started_at) * 1000)
+            finally:
+                connection.close()
+            return durations, errors
+
+        # Новые PRAGMA применяются к новым соединениям
+        connection.close()
+        try:
+            with override_settings(**overrides):
+                started_at = time.perf_counter()
+                with ThreadPoolExecutor(max_workers=len(rows)) as executor:
+                    results = [future.result() for future in [executor.submit(run_writer, *row) for row in rows]]
+                elapsed = time.perf_counter() - started_at
+        finally:
+            options['timeout'] = previous_timeout
+            connection.close()
+
+        durations = [duration for thread_durations, _ in results for duration in thread_durations]
+        errors = sum(thread_errors for _, thread_errors in results)
+        return (len(durations) - errors) / elapsed, durations, errors
@@ -0,0 +1,52 @@
+import gzip
+import sys
+
+from django.core.management.base import BaseCommand, CommandError
+
+from apps.bot.models import Order
+from apps.bot.services.export import EXPORT_FORMATS, date_argument, filter_orders, iter_export
+
+
+class Command(BaseCommand):
+    help = (
+        "Выгружает заказы для бухгалтерии в CSV или JSONL: строка на позицию корзины с полями заказа "
+        "и клиента. Заказы читаются пачками и сразу пишутся в файл, так что память не растёт с объёмом"
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--format', choices=EXPORT_FORMATS, default='csv')
+        parser.add_argument('--output', default='-', help="Файл; '-' — стандартный вывод")
+        parser.add_argument('--gzip', action='store_true', help="Сжать выгрузку (включается и по расширению .gz)")
+        parser.add_argument('--since', type=date_argument, help="С даты, ГГГГ-ММ-ДД (по времени Ташкента)")
+        parser.add_argument('--until', type=date_argument, help="По дату включительно, ГГГГ-ММ-ДД")
+        parser.add_argument(
+            '--status', action='append', choices=[status for status, _ in Order.STATUS_CHOICES],
+            help="Статус заказа; можно указать несколько раз"
+        )
+        parser.add_argument('--chunk-size', type=int, default=2000)
+
+    def handle(self, *args, **options):
+        queryset = filter_orders(Order.objects.all(), options['since'], options['until'], options['status'])
+        chunks = iter_export(queryset, options['format'], options['chunk_size'])
+        output = options['output']
+        compress = options['gzip'] or output.endswith('.gz')
+
+        if output == '-':
+            stream = gzip.open(sys.stdout.buffer, 'wt', encoding='utf-8', newline='') if compress else self.stdout
+        else:
+            opener = gzip.open if compress else open
+            stream = opener(output, 'wt', encoding='utf-8', newline='')
+
+        rows = 0
+        try:
+            for chunk in chunks:
+                stream.write(chunk)
+                rows += 1
+        finally:
+            if stream is not self.stdout:
+                stream.close()
+
+        if output != '-':
+            # Заголовок CSV — тоже кусок выгрузки
+            rows -= options['format'] == 'csv'
+            self.stdout.write(self.style.SUCCESS(f"Выгружено строк: {rows} в {output}."))
@@ -0,0 +1,95 @@
+from pathlib import Path
+
+from django.apps import apps
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+from django.core.management.color import no_style
+from django.db import connections, transaction
+
+SOURCE = 'sqlite_source'
+
+
+class Command(BaseCommand):
+    help = (
+        "Переносит данные бота и учётные записи админки из файла SQLite в текущую базу "
+        "(обычно PostgreSQL из DATABASE_URL). Схему в целевой базе создаёт migrate"
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--source', default=str(settings.BASE_DIR / 'db.sqlite3'), help="Файл SQLite")
+        parser.add_argument('--batch-size', type=int, default=1000)
+        parser.add_argument('--truncate', action='store_true', help="Очистить целевые таблицы перед переносом")
+
+    def handle(self, *args, **options):
+        source = Path(options['source'])
+        if not source.exists():
+            raise CommandError(f"Файл {source} не найден.")
+        if connections['default'].vendor == 'sqlite' and Path(connections['default'].settings_dict['NAME']) == source:
+            raise CommandError("Источник совпадает с текущей базой: задайте DATABASE_URL целевой базы.")
+
+        # Второе подключение добавляем на лету: в settings.DATABASES его нет
+        connections.settings[SOURCE] = connections.configure_settings({
+            'default': connections.settings['default'],
+            SOURCE: {'ENGINE': 'django.db.backends.sqlite3', 'NAME': str(source)},
+        })[SOURCE]
+
+        # Права и группы пользователей не переносим: их идентификаторы в новой базе другие.
+        # Внешние ключи Django создаёт отложенными, так что порядок моделей внутри транзакции не важен
+        models = [*apps.get_app_config('bot').get_models(), apps.get_model('auth', 'User')]
+
+        try:
+            with transaction.atomic():
+                self.prepare_target(models, options['truncate'])
+                for model in models:
+                    copied = self.copy(model, options['batch_size'])
+                    self.stdout.write(f"{model._meta.label}: {copied}")
+                self.reset_sequences(models)
+        finally:
+            connections[SOURCE].close()
+        self.stdout.write(self.style.SUCCESS("Перенос завершён."))
+
+    def prepare_target(self, models, truncate):
+        not_empty = [model._meta.label for model in models if model._default_manager.exists()]
+        if not not_empty:
+            return
+        if not truncate:
+            raise CommandError(f"В целевой базе уже есть данные ({', '.join(not_empty)}). Используйте --truncate.")
+        for model in reversed(models):
+            model._default_manager.all().delete()
+
+    def copy(self, model, batch_size):
+        batch = []
+        copied = 0
+        # Объекты из источника приходят с первичными ключами — внешние ключи остаются верными
+        for obj in model._default_manager.using(SOURCE).order_by('pk').iterator(chunk_size=batch_size):
+            batch.append(obj)
+            if len(batch) >= batch_size:
+                copied += self.insert(model, batch)
+                batch = []
+        if batch:
+            copied += self.insert(model, batch)
+        return copied
+
+    @staticmethod
+    def insert(model, batch):
+        # auto_now и auto_now_add при вставке подменяют даты текущими — возвращаем исходные
+        auto_fields = [
+            field.attname for field in model._meta.concrete_fields
+            if getattr(field, 'auto_now', False) or getattr(field, 'auto_now_add', False)
+        ]
+        original = [[getattr(obj, name) for name in auto_fields] for obj in batch]
+        model._default_manager.bulk_create(batch)
+        if auto_fields:
+            for obj, values in zip(batch, original):
+                for name, value in zip(auto_fields, values):
+                    setattr(obj, name, value)
+            model._default_manager.bulk_update(batch, auto_fields)
+        return len(batch)
+
+    def reset_sequences(self, models):
+        """После вставки с явными id счётчики автоинкремента PostgreSQL надо сдвинуть вручную."""
+        connection = connections['default']
+        statements = connection.ops.sequence_reset_sql(no_style(), models)
+        with connection.cursor() as cursor:
+            for sql in statements:
+                cursor.execute(sql)
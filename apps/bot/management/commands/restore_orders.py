@@ -0,0 +1,30 @@
+from django.core.management.base import BaseCommand, CommandError
+
+from apps.bot.models import ArchivedOrder
+from apps.bot.services.archive import restore_orders
+from apps.bot.services.export import date_argument, filter_orders
+
+
+class Command(BaseCommand):
+    help = "Возвращает заказы из архива (ArchivedOrder) в Order с прежними id и позициями"
+
+    def add_arguments(self, parser):
+        parser.add_argument('--order-id', type=int, action='append', help="id заказа; можно указать несколько раз")
+        parser.add_argument('--client', help="Telegram ID клиента")
+        parser.add_argument('--since', type=date_argument, help="С даты, ГГГГ-ММ-ДД")
+        parser.add_argument('--until', type=date_argument, help="По дату включительно, ГГГГ-ММ-ДД")
+        parser.add_argument('--all', action='store_true', help="Восстановить весь архив")
+        parser.add_argument('--batch-size', type=int, default=500)
+
+    def handle(self, *args, **options):
+        if not (options['order_id'] or options['client'] or options['since'] or options['until'] or options['all']):
+            raise CommandError("Укажите --order-id, --client, --since/--until или --all.")
+
+        archived_orders = filter_orders(ArchivedOrder.objects.all(), options['since'], options['until'])
+        if options['order_id']:
+            archived_orders = archived_orders.filter(id__in=options['order_id'])
+        if options['client']:
+            archived_orders = archived_orders.filter(client__telegram_id=options['client'])
+
+        restored = restore_orders(archived_orders, options['batch_size'])
+        self.stdout.write(self.style.SUCCESS(f"Восстановлено заказов: {restored}."))
@@ -0,0 +1,151 @@
+import functools
+import logging
+import os
+import queue
+import signal
+import threading
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db import close_old_connections
+from dotenv import load_dotenv
+from requests.exceptions import RequestException
+from telebot.apihelper import ApiException
+
+from apps.bot.middlewares.instrumentation import get_update_type
+from apps.bot.middlewares.logger import get_chat_id
+
+logger = logging.getLogger(__name__)
+
+
+class ChatOrderedPool:
+    """
+    Пул потоков, в котором у каждого потока своя очередь. Обновления одного чата
+    всегда попадают в одну очередь, поэтому обрабатываются строго по порядку,
+    а разные чаты — параллельно.
+    """
+
+    def __init__(self, workers, process):
+        self.process = process
+        self.queues = [queue.Queue() for _ in range(workers)]
+        self.threads = [
+            threading.Thread(target=self._run, args=(updates,), name=f'runbot-worker-{number}', daemon=True)
+            for number, updates in enumerate(self.queues)
+        ]
+        for thread in self.threads:
+            thread.start()
+
+    def submit(self, update):
+        chat_id = get_chat_id(getattr(update, get_update_type(update), None))
+        key = chat_id if chat_id is not None else update.update_id
+        self.queues[key % len(self.queues)].put(update)
+
+    def join(self):
+        """Ждёт, пока будут обработаны все отправленные обновления."""
+        for updates in self.queues:
+            updates.join()
+
+    def shutdown(self):
+        for updates in self.queues:
+            updates.put(None)
+        for thread in self.threads:
+            thread.join()
+
+    def _run(self, updates):
+        while True:
+            update = updates.get()
+            try:
+                if update is None:
+                    return
+                # Как в цикле запрос-ответ Django: не держим протухшие соединения с БД
+                close_old_connections()
+                try:
+                    self.process(update)
+                except Exception as e:
+                    logger.exception("Ошибка при обработке обновления %s: %s", update.update_id, e)
+                finally:
+                    close_old_connections()
+            finally:
+                updates.task_done()
+
+
+class Command(BaseCommand):
+    help = (
+        "Получает обновления long polling (getUpdates) вместо вебхука и обрабатывает их "
+        "теми же обработчиками в пуле потоков с сохранением порядка внутри чата"
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--workers', type=int, default=8, help="Количество потоков-обработчиков")
+        parser.add_argument('--limit', type=int, default=100, help="Обновлений за один запрос getUpdates (1–100)")
+        parser.add_argument('--timeout', type=int, default=25, help="Таймаут long polling, с")
+        parser.add_argument('--drop-pending-updates', action='store_true', help="Сбросить накопленные обновления при старте")
+
+    def handle(self, *args, **options):
+        load_dotenv()
+        if not os.getenv('TELEGRAM_BOT_TOKEN'):
+            raise CommandError("Не задан TELEGRAM_BOT_TOKEN.")
+
+        from apps.bot.bot_initializer import get_telegram_bot
+        from apps.bot.webhook.webhook_conf import process_update
+
+        # Обработчики выполняются в потоках пула, а не во внутреннем пуле telebot
+        # (TelegramBot выключает его): иначе порядок внутри чата и ожидание обработки
+        # перед подтверждением теряются
+        bot = get_telegram_bot().bot
+
+        # getUpdates не работает, пока установлен вебхук
+        bot.delete_webhook(drop_pending_updates=options['drop_pending_updates'] or None)
+
+        stop = threading.Event()
+
+        def request_stop(signum, frame):
+            if stop.is_set():
+                raise SystemExit(1)
+            logger.warning("Получен сигнал %s: дорабатываем полученные обновления и выходим.", signum)
+            stop.set()
+
+        signal.signal(signal.SIGINT, request_stop)
+        signal.signal(signal.SIGTERM, request_stop)
+
+        # Единственный получатель getUpdates: повтором считается только завершённое обновление,
+        # а начатое до падения процесса обрабатывается заново
+        pool = ChatOrderedPool(options['workers'], functools.partial(process_update, claim=False))
+        self.stdout.write(f"Long polling запущен: потоков {options['workers']}, Ctrl+C для остановки.")
+        offset = self.poll(bot, pool, stop, options['limit'], options['timeout'])
+        # Сюда попадаем только после штатной остановки; повторный сигнал завершает процесс сразу
+        pool.shutdown()
+        if offset is not None:
+            self.confirm(bot, offset)
+        self.stdout.write("Long polling остановлен.")
+
+    def poll(self, bot, pool, stop, limit, timeout):
+        offset = None
+        backoff = 1
+        while not stop.is_set():
+            try:
+                updates = bot.get_updates(
+                    offset=offset, limit=limit, timeout=timeout + 10, long_polling_timeout=timeout
+                )
+            except (ApiException, RequestException) as e:
+                logger.error("Ошибка getUpdates: %s. Повтор через %s с.", e, backoff)
+                stop.wait(backoff)
+                backoff = min(backoff * 2, 60)
+                continue
+            backoff = 1
+
+            for update in updates:
+                pool.submit(update)
+            # Смещение сдвигается только после обработки всей пачки: при падении
+            # процесса необработанные обновления будут получены повторно
+            pool.join()
+            if updates:
+                offset = updates[-1].update_id + 1
+        return offset
+
+    @staticmethod
+    def confirm(bot, offset):
+        """Подтверждает обработанные обновления, иначе Telegram отдаст их снова после перезапуска."""
+        try:
+            bot.get_updates(offset=offset, limit=1, timeout=10, long_polling_timeout=0)
+        except (ApiException, RequestException) as e:
+            logger.error("Не удалось подтвердить обновления до %s: %s", offset, e)
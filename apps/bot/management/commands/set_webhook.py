@@ -0,0 +1,34 @@
+import os
+
+from django.core.management.base import BaseCommand, CommandError
+from dotenv import load_dotenv
+
+from apps.bot.bot_initializer import get_bot
+
+
+class Command(BaseCommand):
+    help = "Регистрирует вебхук бота в Telegram (или удаляет его с --delete). Выполняется при деплое, а не при старте процесса"
+
+    def add_arguments(self, parser):
+        parser.add_argument('--url', help="Адрес вебхука, по умолчанию WEBHOOK_URL из окружения")
+        parser.add_argument('--delete', action='store_true', help="Удалить вебхук, например перед запуском long polling")
+        parser.add_argument('--drop-pending-updates', action='store_true', help="Сбросить накопленные обновления")
+
+    def handle(self, *args, **options):
+        load_dotenv()
+        if not os.getenv('TELEGRAM_BOT_TOKEN'):
+            raise CommandError("Не задан TELEGRAM_BOT_TOKEN.")
+        bot = get_bot()
+
+        if options['delete']:
+            bot.delete_webhook(drop_pending_updates=options['drop_pending_updates'] or None)
+            self.stdout.write("Webhook удалён.")
+            return
+
+        url = options['url'] or os.getenv('WEBHOOK_URL')
+        if not url:
+            raise CommandError("Не указан адрес вебхука: передайте --url или задайте WEBHOOK_URL.")
+
+        if not bot.set_webhook(url=url, drop_pending_updates=options['drop_pending_updates'] or None):
+            raise CommandError("Не удалось установить Webhook: Telegram не подтвердил установку.")
+        self.stdout.write(f"Webhook успешно установлен по адресу: {url}")
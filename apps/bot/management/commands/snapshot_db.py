@@ -0,0 +1,24 @@
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+
+from apps.bot.services.snapshot import SnapshotError, snapshot_database
+
+
+class Command(BaseCommand):
+    help = (
+        "Снимок db.sqlite3 без остановки бота: online backup API SQLite шагами с паузами, "
+        "проверка integrity_check, сжатие gzip и удаление старых снимков"
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--dir', default=str(settings.BOT_DB_SNAPSHOT_DIR), help="Каталог снимков")
+        parser.add_argument('--pages', type=int, default=settings.BOT_DB_SNAPSHOT_PAGES, help="Страниц за шаг")
+        parser.add_argument('--sleep', type=float, default=settings.BOT_DB_SNAPSHOT_STEP_SLEEP, help="Пауза между шагами, с")
+        parser.add_argument('--keep', type=int, default=settings.BOT_DB_SNAPSHOT_KEEP, help="Сколько снимков хранить; 0 — все")
+
+    def handle(self, *args, **options):
+        try:
+            path = snapshot_database(options['dir'], options['pages'], options['sleep'], options['keep'])
+        except SnapshotError as e:
+            raise CommandError(str(e))
+        self.stdout.write(self.style.SUCCESS(f"Снимок сохранён: {path} ({path.stat().st_size} байт)."))
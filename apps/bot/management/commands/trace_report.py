@@ -0,0 +1,80 @@
+import json
+from collections import defaultdict
+
+from django.conf import settings
+from django.core.management.base import BaseCommand
+
+
+def span_group(name):
+    # Отдельные запросы к БД складываем в одну строку
+    return 'db' if name.startswith('db.') else name
+
+
+def self_times(spans):
+    """
+    Собственное время каждого участка, мс: длительность минус время прямых потомков внутри его
+    интервала. Задача Celery может закончиться позже породившего её обработчика — считается только
+    перекрытие.
+    """
+    children = defaultdict(list)
+    for span in spans:
+        if span.get('parent_span_id'):
+            children[span['parent_span_id']].append(span)
+
+    result = {}
+    for span in spans:
+        nested = 0
+        for child in children[span['span_id']]:
+            overlap = min(span['end_time'], child['end_time']) - max(span['start_time'], child['start_time'])
+            nested += max(0, overlap)
+        result[span['span_id']] = max(0.0, span['duration_ms'] - nested / 1_000_000)
+    return result
+
+
+class Command(BaseCommand):
+    help = "Показывает, какие участки трассы занимают время в самых медленных обновлениях"
+
+    def add_arguments(self, parser):
+        parser.add_argument('--path', default=str(settings.BOT_TRACING_JSONL_PATH))
+        parser.add_argument('--percentile', type=float, default=95.0)
+
+    def handle(self, *args, **options):
+        traces = defaultdict(list)
+        with open(options['path'], encoding='utf-8') as f:
+            for line in f:
+                span = json.loads(line)
+                traces[span['trace_id']].append(span)
+
+        durations = {}
+        for trace_id, spans in traces.items():
+            start = min(span['start_time'] for span in spans)
+            end = max(span['end_time'] for span in spans)
+            durations[trace_id] = (end - start) / 1_000_000
+
+        if not durations:
+            self.stdout.write("Трассы не найдены.")
+            return
+
+        ordered = sorted(durations.values())
+        threshold = ordered[min(len(ordered) - 1, int(len(ordered) * options['percentile'] / 100))]
+        slow_traces = [trace_id for trace_id, duration in durations.items() if duration >= threshold]
+
+        # webhook и обработчики включают в себя всех потомков, поэтому ранжируем по собственному времени
+        own = defaultdict(float)
+        inclusive = defaultdict(float)
+        for trace_id in slow_traces:
+            spans = traces[trace_id]
+            span_self_times = self_times(spans)
+            for span in spans:
+                own[span_group(span['name'])] += span_self_times[span['span_id']]
+                inclusive[span_group(span['name'])] += span['duration_ms']
+
+        self.stdout.write(
+            f"Трасс: {len(durations)}, p{options['percentile']:g} = {threshold:.1f} мс, "
+            f"медленных: {len(slow_traces)}"
+        )
+        self.stdout.write(f"{'Участок':<50} {'Собственное, мс':>16} {'С вложенными, мс':>17}")
+        for name, total in sorted(own.items(), key=lambda item: item[1], reverse=True):
+            self.stdout.write(
+                f"{name:<50} {total / len(slow_traces):>16.1f} {inclusive[name] / len(slow_traces):>17.1f}"
+            )
@@ -0,0 +1,109 @@
+import logging
+import threading
+from collections import deque
+
+from django.conf import settings
+from django.core.cache import cache
+
+from apps.bot.utils.metrics import counter
+
+logger = logging.getLogger(__name__)
+
+duplicate_updates = counter('bot_duplicate_updates_total', 'Повторно доставленные обновления, отброшенные до обработки')
+unique_updates = counter('bot_unique_updates_total', 'Обновления, переданные на обработку')
+
+PROCESSING = 'processing'
+DONE = 'done'
+
+
+class UpdateDeduplicator:
+    """
+    Отбрасывает повторные доставки обновлений по update_id.
+    Кольцо фиксированного размера в памяти процесса отвечает за быстрый путь,
+    общее хранилище (кэш Django: Redis или БД) — за повторы, пришедшие в другой процесс.
+    """
+
+    def __init__(self, ring_size=None, shared=None, ttl=None, claim_ttl=None):
+        self.ring_size = ring_size or settings.BOT_UPDATE_DEDUP_RING_SIZE
+        self.shared = settings.BOT_UPDATE_DEDUP_SHARED if shared is None else shared
+        self.ttl = ttl or settings.BOT_UPDATE_DEDUP_TTL
+        self.claim_ttl = claim_ttl or settings.BOT_UPDATE_DEDUP_CLAIM_TTL
+        self._ring = deque()
+        self._seen = set()
+        self._lock = threading.Lock()
+
+    def _seen_locally(self, update_id):
+        with self._lock:
+            if update_id in self._seen:
+                return True
+            if len(self._ring) >= self.ring_size:
+                self._seen.discard(self._ring.popleft())
+            self._ring.append(update_id)
+            self._seen.add(update_id)
+        return False
+
+    def is_duplicate(self, update_id, claim=True):
+        """
+        Отмечает update_id как обрабатываемый и возвращает True, если он уже встречался.
+        В общем хранилище отметка «в обработке» живёт только claim_ttl: если процесс упал
+        посреди обработки, повторная доставка после этого срока будет обработана.
+        claim=False — только проверка завершённых обновлений (runbot: getUpdates читает один
+        процесс, и после его перезапуска незавершённые обновления нужно обработать заново).
+        """
+        if self._seen_locally(update_id) or (self.shared and self._seen_shared(update_id, claim)):
+            duplicate_updates.inc()
+            return True
+
+        unique_updates.inc()
+        return False
+
+    def _seen_shared(self, update_id, claim):
+        key = self._key(update_id)
+        if claim:
+            # cache.add атомарен: ключ записывается, только если его ещё нет
+            return not cache.add(key, PROCESSING, self.claim_ttl)
+        return cache.get(key) == DONE
+
+    def done(self, update_id):
+        """Обработка завершилась: повтор отбрасывается весь срок ttl."""
+        if self.shared:
+            cache.set(self._key(update_id), DONE, self.ttl)
+
+    def forget(self, update_id):
+        """
+        Снимает отметку с update_id, если обработка упала: Telegram повторит доставку
+        после ответа 500, и повтор должен дойти до обработчиков.
+        """
+        self._forget_locally(update_id)
+        if self.shared:
+            cache.delete(self._key(update_id))
+
+    def _forget_locally(self, update_id):
+        with self._lock:
+            if update_id in self._seen:
+                self._seen.discard(update_id)
+                self._ring.remove(update_id)
+
+    @staticmethod
+    def _key(update_id):
+        return f'bot:update:{update_id}'
+
+    async def ais_duplicate(self, update_id):
+        """То же для асинхронного вебхука."""
+        if self._seen_locally(update_id) or (
+            self.shared and not await cache.aadd(self._key(update_id), PROCESSING, self.claim_ttl)
+        ):
+            duplicate_updates.inc()
+            return True
+
+        unique_updates.inc()
+        return False
+
+    async def adone(self, update_id):
+        if self.shared:
+            await cache.aset(self._key(update_id), DONE, self.ttl)
+
+    async def aforget(self, update_id):
+        self._forget_locally(update_id)
+        if self.shared:
+            await cache.adelete(self._key(update_id))
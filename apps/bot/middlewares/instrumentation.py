@@ -0,0 +1,156 @@
+import functools
+import threading
+import time
+
+from django.conf import settings
+from django.db import connection
+from telebot import apihelper
+
+from apps.bot.utils.metrics import COUNT_BUCKETS, counter, histogram
+from apps.bot.utils.tracing import span, trace_handler
+
+UPDATE_TYPES = (
+    'message', 'edited_message', 'callback_query', 'pre_checkout_query', 'shipping_query',
+    'inline_query', 'chosen_inline_result', 'channel_post', 'edited_channel_post',
+    'my_chat_member', 'chat_member', 'chat_join_request', 'poll', 'poll_answer',
+)
+
+HANDLER_ATTRIBUTES = (
+    'message_handlers', 'edited_message_handlers', 'callback_query_handlers',
+    'pre_checkout_query_handlers', 'shipping_query_handlers', 'inline_handlers',
+    'chosen_inline_handlers', 'channel_post_handlers', 'edited_channel_post_handlers',
+    'my_chat_member_handlers', 'chat_member_handlers', 'chat_join_request_handlers',
+    'poll_handlers', 'poll_answer_handlers',
+)
+
+updates_total = counter('bot_updates_total', 'Полученные обновления по типам', ['update_type'])
+handler_duration = histogram('bot_handler_duration_seconds', 'Время работы обработчика', ['handler'])
+handler_errors = counter('bot_handler_errors_total', 'Исключения в обработчиках', ['handler'])
+handler_db_queries = histogram('bot_handler_db_queries', 'Запросов к БД за вызов обработчика', ['handler'], COUNT_BUCKETS)
+handler_db_duration = histogram('bot_handler_db_duration_seconds', 'Время запросов к БД за вызов обработчика', ['handler'])
+handler_api_calls = histogram('bot_handler_telegram_calls', 'Запросов к Bot API за вызов обработчика', ['handler'], COUNT_BUCKETS)
+handler_api_duration = histogram('bot_handler_telegram_duration_seconds', 'Время запросов к Bot API за вызов обработчика', ['handler'])
+telegram_requests = counter('bot_telegram_requests_total', 'Запросы к Bot API', ['method', 'status'])
+telegram_duration = histogram('bot_telegram_request_duration_seconds', 'Время запроса к Bot API', ['method'])
+
+_local = threading.local()
+
+
+class HandlerStats:
+    """Счётчики одного вызова обработчика. Доступны из того же потока через current_stats()."""
+
+    def __init__(self, handler):
+        self.handler = handler
+        self.db_queries = 0
+        self.db_duration = 0.0
+        self.api_calls = 0
+        self.api_duration = 0.0
+        # Список для подробного журнала запросов к Bot API, если его запросил профилировщик
+        self.api_log = None
+
+    def __call__(self, execute, sql, params, many, context):
+        # Используется как execute_wrapper соединения Django
+        started_at = time.perf_counter()
+        try:
+            return execute(sql, params, many, context)
+        finally:
+            self.db_queries += 1
+            self.db_duration += time.perf_counter() - started_at
+
+
+def current_stats():
+    return getattr(_local, 'stats', None)
+
+
+def get_update_type(update):
+    for update_type in UPDATE_TYPES:
+        if getattr(update, update_type, None) is not None:
+            return update_type
+    return 'unknown'
+
+
+def record_update(update):
+    updates_total.inc(update_type=get_update_type(update))
+
+
+def instrument_handler(function):
+    name = function.__name__
+
+    @functools.wraps(function)
+    def wrapper(*args, **kwargs):
+        stats = HandlerStats(name)
+        previous_stats = current_stats()
+        _local.stats = stats
+        started_at = time.perf_counter()
+        try:
+            with connection.execute_wrapper(stats):
+                return function(*args, **kwargs)
+        except Exception:
+            handler_errors.inc(handler=name)
+            raise
+        finally:
+            _local.stats = previous_stats
+            handler_duration.observe(time.perf_counter() - started_at, handler=name)
+            handler_db_queries.observe(stats.db_queries, handler=name)
+            handler_db_duration.observe(stats.db_duration, handler=name)
+            handler_api_calls.observe(stats.api_calls, handler=name)
+            handler_api_duration.observe(stats.api_duration, handler=name)
+
+    return wrapper
+
+
+def telegram_request_sender(method, request_url, **kwargs):
+    """Отправляет запрос к Bot API как и сам telebot, дополнительно замеряя его."""
+    api_method = request_url.rsplit('/', 1)[-1]
+    status = 'error'
+    started_at = time.perf_counter()
+    try:
+        with span(f'telegram.{api_method}') as api_span:
+            response = apihelper._get_req_session().request(method, request_url, **kwargs)
+            status = str(response.status_code)
+            if api_span is not None:
+                api_span.attributes['http.status_code'] = response.status_code
+        return response
+    finally:
+        duration = time.perf_counter() - started_at
+        telegram_requests.inc(method=api_method, status=status)
+        telegram_duration.observe(duration, method=api_method)
+        stats = current_stats()
+        if stats is not None:
+            stats.api_calls += 1
+            stats.api_duration += duration
+            if stats.api_log is not None:
+                stats.api_log.append({'method': api_method, 'status': status, 'duration': duration})
+
+
+def instrument_bot(bot):
+    """
+    Оборачивает все зарегистрированные обработчики бота и запросы к Bot API.
+    Метрики и трассировка включаются каждая своей настройкой; контекст логов ставится всегда,
+    профилировщик тоже — его включают BOT_PROFILING_ENABLED или SIGUSR2.
+    """
+    from apps.bot.middlewares.logger import log_context_handler
+    from apps.bot.middlewares.profiling import profile_handler
+
+    for attribute in HANDLER_ATTRIBUTES:
+        for handler in getattr(bot, attribute, []):
+            function = handler['function']
+            if getattr(function, '__wrapped__', None):
+                continue
+            function = profile_handler(function)
+            if settings.BOT_TRACING_ENABLED:
+                function = trace_handler(function)
+            function = log_context_handler(function)
+            if settings.BOT_METRICS_ENABLED:
+                function = instrument_handler(function)
+            handler['function'] = function
+
+    install_request_sender()
+
+
+def install_request_sender():
+    """Замер запросов к Bot API для метрик и спанов telegram.*; вызывается и при запуске воркера Celery."""
+    if not (settings.BOT_METRICS_ENABLED or settings.BOT_TRACING_ENABLED):
+        return
+    if apihelper.CUSTOM_REQUEST_SENDER is None:
+        apihelper.CUSTOM_REQUEST_SENDER = telegram_request_sender
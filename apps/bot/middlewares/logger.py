@@ -0,0 +1,60 @@
+import functools
+import logging
+import threading
+from contextlib import contextmanager
+
+from apps.bot.utils.tracing import current_span
+
+_local = threading.local()
+
+
+class UpdateContextFilter(logging.Filter):
+    """
+    Добавляет к записи update_id, chat_id, обработчик и trace_id текущего потока.
+    Подключается к обработчику логов, поэтому выполняется в потоке, который пишет запись.
+    """
+
+    def filter(self, record):
+        context = getattr(_local, 'context', None) or {}
+        record.update_id = context.get('update_id')
+        record.chat_id = context.get('chat_id')
+        record.handler = context.get('handler')
+        span = current_span()
+        record.trace_id = span.trace_id if span is not None else None
+        return True
+
+
+@contextmanager
+def log_context(**fields):
+    previous = getattr(_local, 'context', None)
+    _local.context = {**(previous or {}), **fields}
+    try:
+        yield
+    finally:
+        _local.context = previous
+
+
+def attach_update_id(obj, update_id):
+    """Прикрепляет update_id к объекту обновления, который попадёт в обработчик."""
+    if obj is not None:
+        obj._update_id = update_id
+
+
+def get_chat_id(obj):
+    chat = getattr(obj, 'chat', None) or getattr(getattr(obj, 'message', None), 'chat', None)
+    if chat is not None:
+        return chat.id
+    user = getattr(obj, 'from_user', None)
+    return user.id if user is not None else None
+
+
+def log_context_handler(function):
+    name = function.__name__
+
+    @functools.wraps(function)
+    def wrapper(*args, **kwargs):
+        obj = args[0] if args else None
+        with log_context(update_id=getattr(obj, '_update_id', None), chat_id=get_chat_id(obj), handler=name):
+            return function(*args, **kwargs)
+
+    return wrapper
@@ -0,0 +1,175 @@
+import functools
+import itertools
+import json
+import logging
+import signal
+import sys
+import threading
+import time
+from collections import defaultdict
+from pathlib import Path
+
+from django.conf import settings
+from django.db import connection
+
+logger = logging.getLogger(__name__)
+
+
+class StackCollector:
+    """
+    Собирает собственное время каждой цепочки вызовов через sys.setprofile.
+    Результат — строки в формате «folded stacks» (a;b;c микросекунды), их понимают
+    flamegraph.pl, speedscope и inferno.
+    """
+
+    def __init__(self):
+        self.stacks = defaultdict(int)
+        self._frames = []
+
+    def __enter__(self):
+        sys.setprofile(self._callback)
+        return self
+
+    def __exit__(self, *exc_info):
+        sys.setprofile(None)
+        now = time.perf_counter()
+        while self._frames:
+            self._close_frame(now)
+
+    @staticmethod
+    def _frame_name(frame, event, arg):
+        if event.startswith('c_'):
+            return f"{getattr(arg, '__module__', None) or 'builtins'}.{getattr(arg, '__qualname__', repr(arg))}"
+        code = frame.f_code
+        return f"{frame.f_globals.get('__name__', '?')}.{getattr(code, 'co_qualname', code.co_name)}"
+
+    def _callback(self, frame, event, arg):
+        now = time.perf_counter()
+        if event in ('call', 'c_call'):
+            parent = self._frames[-1][0] if self._frames else ''
+            name = self._frame_name(frame, event, arg)
+            self._frames.append([f'{parent};{name}' if parent else name, now, 0.0])
+        elif self._frames:
+            self._close_frame(now)
+
+    def _close_frame(self, now):
+        path, started_at, children = self._frames.pop()
+        elapsed = now - started_at
+        self.stacks[path] += int((elapsed - children) * 1_000_000)
+        if self._frames:
+            self._frames[-1][2] += elapsed
+
+    def folded(self):
+        return [f'{path} {microseconds}' for path, microseconds in self.stacks.items() if microseconds > 0]
+
+
+class UpdateProfiler:
+    """Профилирует каждое N-е обновление, прошедшее через обработчики бота."""
+
+    def __init__(self, sample_rate=None, directory=None, max_files=None, enabled=None):
+        self.sample_rate = max(1, sample_rate or settings.BOT_PROFILING_SAMPLE_RATE)
+        self.directory = Path(directory or settings.BOT_PROFILING_DIR)
+        self.max_files = max_files or settings.BOT_PROFILING_MAX_FILES
+        self.enabled = settings.BOT_PROFILING_ENABLED if enabled is None else enabled
+        self._counter = itertools.count()
+        self._aggregate = defaultdict(int)
+        self._lock = threading.Lock()
+
+    def toggle(self, *args):
+        self.enabled = not self.enabled
+        logger.warning(f"Профилирование обновлений {'включено' if self.enabled else 'выключено'}")
+
+    def should_sample(self):
+        return self.enabled and next(self._counter) % self.sample_rate == 0
+
+    def profile(self, handler, function, *args, **kwargs):
+        # Модуль загружается в BotConfig.ready, поэтому telebot (через instrumentation) — только здесь
+        from apps.bot.middlewares.instrumentation import current_stats
+
+        queries = []
+        api_calls = []
+        stats = current_stats()
+        if stats is not None:
+            stats.api_log = api_calls
+
+        def log_query(execute, sql, params, many, context):
+            started_at = time.perf_counter()
+            try:
+                return execute(sql, params, many, context)
+            finally:
+                queries.append({'sql': sql, 'duration': time.perf_counter() - started_at})
+
+        collector = StackCollector()
+        started_at = time.perf_counter()
+        try:
+            with connection.execute_wrapper(log_query), collector:
+                return function(*args, **kwargs)
+        finally:
+            duration = time.perf_counter() - started_at
+            if stats is not None:
+                stats.api_log = None
+            try:
+                self._write(handler, duration, collector, queries, api_calls)
+            except OSError as e:
+                logger.error(f"Не удалось сохранить профиль обработчика {handler}: {e}")
+
+    def _write(self, handler, duration, collector, queries, api_calls):
+        folded = collector.folded()
+        self.directory.mkdir(parents=True, exist_ok=True)
+        profile_path = self.directory / f"{time.time_ns()}-{handler}.json"
+        profile_path.write_text(json.dumps({
+            'handler': handler,
+            'duration': duration,
+            'db_queries': queries,
+            'api_calls': api_calls,
+            'stacks': folded,
+        }, ensure_ascii=False, indent=2), encoding='utf-8')
+
+        with self._lock:
+            for path, microseconds in collector.stacks.items():
+                self._aggregate[f'{handler};{path}'] += microseconds
+            aggregate = [f'{path} {microseconds}' for path, microseconds in self._aggregate.items() if microseconds > 0]
+            (self.directory / 'aggregate.folded').write_text('\n'.join(aggregate) + '\n', encoding='utf-8')
+
+            # Храним только последние max_files профилей
+            profiles = sorted(self.directory.glob('*.json'))
+            for old_profile in profiles[:-self.max_files]:
+                old_profile.unlink(missing_ok=True)
+
+
+profiler = None
+
+
+def get_profiler():
+    global profiler
+    if profiler is None:
+        profiler = UpdateProfiler()
+    return profiler
+
+
+def install_signal_handler():
+    """
+    Ставит переключатель профилирования на SIGUSR2. Обработчик сигнала можно установить
+    только из главного потока, а бот создаётся лениво в потоке запроса — поэтому вызывается
+    при запуске, из BotConfig.ready.
+    """
+    if not hasattr(signal, 'SIGUSR2'):
+        return
+    try:
+        signal.signal(signal.SIGUSR2, get_profiler().toggle)
+    except ValueError as e:
+        logger.warning(f"Переключатель профилирования по SIGUSR2 не установлен: {e}")
+
+
+def profile_handler(function):
+    name = function.__name__
+    update_profiler = get_profiler()
+
+    @functools.wraps(function)
+    def wrapper(*args, **kwargs):
+        if not update_profiler.should_sample():
+            return function(*args, **kwargs)
+        return update_profiler.profile(name, function, *args, **kwargs)
+
+    return wrapper
+
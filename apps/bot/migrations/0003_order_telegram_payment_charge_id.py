@@ -0,0 +1,18 @@
+# Generated by Django 4.2.30 on 2026-10-19 15:54
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('bot', '0002_product_prices_order_status_created_idx'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='order',
+            name='telegram_payment_charge_id',
+            field=models.CharField(blank=True, editable=False, max_length=255, null=True, unique=True),
+        ),
+    ]
@@ -0,0 +1,34 @@
+# Generated by Django 4.2.30 on 2026-10-19 16:34
+
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('bot', '0003_order_telegram_payment_charge_id'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='OrderItem',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('quantity', models.PositiveIntegerField(verbose_name='Quantity')),
+                ('unit_price', models.PositiveIntegerField(verbose_name='Unit price')),
+                ('is_small', models.BooleanField(default=False, verbose_name='Маленький размер')),
+                ('is_big', models.BooleanField(default=False, verbose_name='Большой размер')),
+                ('is_hot', models.BooleanField(default=False, verbose_name='Горячий')),
+                ('is_cold', models.BooleanField(default=False, verbose_name='Холодный')),
+                ('created_at', models.DateTimeField(db_index=True)),
+                ('order', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='items', to='bot.order', verbose_name='Order')),
+                ('product', models.ForeignKey(null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='order_items', to='bot.product', verbose_name='Product')),
+            ],
+            options={
+                'verbose_name': 'Order item',
+                'verbose_name_plural': 'Order items',
+                'indexes': [models.Index(fields=['product', 'created_at'], name='orderitem_product_created_idx')],
+            },
+        ),
+    ]
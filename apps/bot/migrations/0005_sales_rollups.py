@@ -0,0 +1,58 @@
+# Generated by Django 4.2.30 on 2026-10-19 16:38
+
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('bot', '0004_order_item'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='DailySales',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('day', models.DateField(unique=True, verbose_name='День')),
+                ('order_count', models.PositiveIntegerField(default=0, verbose_name='Заказов')),
+                ('revenue', models.BigIntegerField(default=0, verbose_name='Выручка')),
+                ('delivery_revenue', models.BigIntegerField(default=0, verbose_name='В том числе доставка')),
+            ],
+            options={
+                'verbose_name': 'Продажи за день',
+                'verbose_name_plural': 'Продажи по дням',
+            },
+        ),
+        migrations.CreateModel(
+            name='RollupWatermark',
+            fields=[
+                ('name', models.CharField(max_length=50, primary_key=True, serialize=False)),
+                ('last_order_id', models.BigIntegerField(default=0)),
+                ('updated_at', models.DateTimeField(auto_now=True)),
+            ],
+        ),
+        migrations.CreateModel(
+            name='SalesRollup',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('day', models.DateField(verbose_name='День')),
+                ('is_small', models.BooleanField(default=False, verbose_name='Маленький размер')),
+                ('is_big', models.BooleanField(default=False, verbose_name='Большой размер')),
+                ('is_hot', models.BooleanField(default=False, verbose_name='Горячий')),
+                ('is_cold', models.BooleanField(default=False, verbose_name='Холодный')),
+                ('quantity', models.PositiveIntegerField(default=0, verbose_name='Quantity')),
+                ('revenue', models.BigIntegerField(default=0, verbose_name='Выручка')),
+                ('product', models.ForeignKey(null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='sales_rollups', to='bot.product', verbose_name='Product')),
+            ],
+            options={
+                'verbose_name': 'Продажи товара за день',
+                'verbose_name_plural': 'Продажи товаров по дням',
+            },
+        ),
+        migrations.AddConstraint(
+            model_name='salesrollup',
+            constraint=models.UniqueConstraint(fields=('day', 'product', 'is_small', 'is_big', 'is_hot', 'is_cold'), name='salesrollup_unique_key'),
+        ),
+    ]
@@ -0,0 +1,31 @@
+# Generated by Django 4.2.30 on 2026-10-19 16:43
+
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('bot', '0005_sales_rollups'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ArchivedOrder',
+            fields=[
+                ('id', models.BigIntegerField(primary_key=True, serialize=False)),
+                ('status', models.CharField(choices=[('pending', 'Pending'), ('in_progress', 'In Progress'), ('delivering', 'Delivering'), ('completed', 'Completed'), ('canceled', 'Canceled'), ('closed', 'Closed')], max_length=50)),
+                ('total_price', models.FloatField()),
+                ('created_at', models.DateTimeField(db_index=True)),
+                ('archived_at', models.DateTimeField(auto_now_add=True)),
+                ('payload', models.BinaryField()),
+                ('client', models.ForeignKey(null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='archived_orders', to='bot.client', verbose_name='Client')),
+            ],
+            options={
+                'verbose_name': 'Архивный заказ',
+                'verbose_name_plural': 'Архив заказов',
+                'indexes': [models.Index(fields=['client', 'created_at'], name='archivedorder_client_idx')],
+            },
+        ),
+    ]
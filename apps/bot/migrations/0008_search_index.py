@@ -0,0 +1,151 @@
+from django.db import migrations
+
+TOKENIZE = "tokenize='unicode61 remove_diacritics 2', prefix='2 3'"
+
+
+def _sqlite_digits(column):
+    expression = f"coalesce({column}, '')"
+    for char in ('+', ' ', '-', '(', ')'):
+        expression = f"replace({expression}, '{char}', '')"
+    return expression
+
+
+def _sqlite_phone(row):
+    # Полный номер и местные 9 цифр: оператор может набрать любой из вариантов
+    digits = _sqlite_digits(f'{row}phone_number')
+    return f"{digits} || ' ' || substr({digits}, -9)"
+
+
+def _sqlite_car_number(row):
+    return f"upper(replace({row}car_number, ' ', ''))"
+
+
+def _client_values(row):
+    return f"{row}id, {row}name, {row}telegram_username, {_sqlite_phone(row)}"
+
+
+def _order_values(row):
+    return f"{row}id, {row}courier_name, {_sqlite_car_number(row)}"
+
+
+ORDER_INDEXED = "({row}courier_name IS NOT NULL OR {row}car_number IS NOT NULL)"
+
+SQLITE_FORWARD = [
+    f"CREATE VIRTUAL TABLE bot_client_search USING fts5(name, username, phone, {TOKENIZE})",
+    f"CREATE VIRTUAL TABLE bot_order_search USING fts5(courier_name, car_number, {TOKENIZE})",
+    f"""
+    CREATE TRIGGER bot_client_search_insert AFTER INSERT ON bot_client BEGIN
+        INSERT INTO bot_client_search(rowid, name, username, phone) VALUES ({_client_values('NEW.')});
+    END
+    """,
+    f"""
+    CREATE TRIGGER bot_client_search_update AFTER UPDATE OF name, telegram_username, phone_number ON bot_client BEGIN
+        DELETE FROM bot_client_search WHERE rowid = OLD.id;
+        INSERT INTO bot_client_search(rowid, name, username, phone) VALUES ({_client_values('NEW.')});
+    END
+    """,
+    """
+    CREATE TRIGGER bot_client_search_delete AFTER DELETE ON bot_client BEGIN
+        DELETE FROM bot_client_search WHERE rowid = OLD.id;
+    END
+    """,
+    # Заказы без курьера в индекс не попадают; смена статуса триггер не вызывает
+    f"""
+    CREATE TRIGGER bot_order_search_insert AFTER INSERT ON bot_order
+    WHEN {ORDER_INDEXED.format(row='NEW.')} BEGIN
+        INSERT INTO bot_order_search(rowid, courier_name, car_number) VALUES ({_order_values('NEW.')});
+    END
+    """,
+    f"""
+    CREATE TRIGGER bot_order_search_update AFTER UPDATE OF courier_name, car_number ON bot_order BEGIN
+        DELETE FROM bot_order_search WHERE rowid = OLD.id;
+        INSERT INTO bot_order_search(rowid, courier_name, car_number)
+        SELECT {_order_values('NEW.')} WHERE {ORDER_INDEXED.format(row='NEW.')};
+    END
+    """,
+    """
+    CREATE TRIGGER bot_order_search_delete AFTER DELETE ON bot_order BEGIN
+        DELETE FROM bot_order_search WHERE rowid = OLD.id;
+    END
+    """,
+    f"""
+    INSERT INTO bot_client_search(rowid, name, username, phone)
+    SELECT {_client_values('')} FROM bot_client
+    """,
+    f"""
+    INSERT INTO bot_order_search(rowid, courier_name, car_number)
+    SELECT {_order_values('')} FROM bot_order WHERE {ORDER_INDEXED.format(row='')}
+    """,
+]
+
+SQLITE_BACKWARD = [
+    "DROP TRIGGER IF EXISTS bot_client_search_insert",
+    "DROP TRIGGER IF EXISTS bot_client_search_update",
+    "DROP TRIGGER IF EXISTS bot_client_search_delete",
+    "DROP TRIGGER IF EXISTS bot_order_search_insert",
+    "DROP TRIGGER IF EXISTS bot_order_search_update",
+    "DROP TRIGGER IF EXISTS bot_order_search_delete",
+    "DROP TABLE IF EXISTS bot_client_search",
+    "DROP TABLE IF EXISTS bot_order_search",
+]
+
+# Те же выражения, что в apps/bot/services/search.py. Индекс по выражению пересчитывается
+# самим PostgreSQL, так что синхронизировать ничего не нужно
+PG_FORWARD = [
+    r"""
+    CREATE INDEX bot_client_search_idx ON bot_client USING gin (
+        to_tsvector('simple', coalesce(name, '') || ' ' || coalesce(telegram_username, '') || ' ' ||
+        regexp_replace(coalesce(phone_number, ''), '\D', '', 'g') || ' ' ||
+        right(regexp_replace(coalesce(phone_number, ''), '\D', '', 'g'), 9))
+    )
+    """,
+    r"""
+    CREATE INDEX bot_order_search_idx ON bot_order USING gin (
+        to_tsvector('simple', coalesce(courier_name, '') || ' ' || upper(replace(coalesce(car_number, ''), ' ', '')))
+    ) WHERE (courier_name IS NOT NULL OR car_number IS NOT NULL)
+    """,
+]
+
+PG_BACKWARD = [
+    "DROP INDEX IF EXISTS bot_client_search_idx",
+    "DROP INDEX IF EXISTS bot_order_search_idx",
+]
+
+
+def _fts5_available(connection):
+    with connection.cursor() as cursor:
+        cursor.execute("PRAGMA compile_options")
+        return any(option == 'ENABLE_FTS5' for option, in cursor.fetchall())
+
+
+def _run(statements, schema_editor):
+    for sql in statements:
+        schema_editor.execute(sql)
+
+
+def forwards(apps, schema_editor):
+    connection = schema_editor.connection
+    if connection.vendor == 'sqlite' and _fts5_available(connection):
+        _run(SQLITE_FORWARD, schema_editor)
+    elif connection.vendor == 'postgresql':
+        _run(PG_FORWARD, schema_editor)
+    # Без FTS5 админка остаётся на префиксном поиске по B-tree индексам
+
+
+def backwards(apps, schema_editor):
+    connection = schema_editor.connection
+    if connection.vendor == 'sqlite':
+        _run(SQLITE_BACKWARD, schema_editor)
+    elif connection.vendor == 'postgresql':
+        _run(PG_BACKWARD, schema_editor)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('bot', '0007_admin_search_indexes'),
+    ]
+
+    operations = [
+        migrations.RunPython(forwards, backwards),
+    ]
@@ -0,0 +1,112 @@
+from importlib import import_module
+
+from django.db import migrations
+
+# Триггеры из 0008 писали в FTS5 прямо в транзакции запроса (и на каждый Client.save()):
+# под параллельной нагрузкой оформление заказа падало с «database is locked».
+# Теперь триггеры только ставят id в обычную таблицу-очередь, а FTS5 обновляет
+# services/search.reindex (задача reindex_search и поиск в админке)
+DROP_FTS_TRIGGERS = [
+    "DROP TRIGGER IF EXISTS bot_client_search_insert",
+    "DROP TRIGGER IF EXISTS bot_client_search_update",
+    "DROP TRIGGER IF EXISTS bot_client_search_delete",
+    "DROP TRIGGER IF EXISTS bot_order_search_insert",
+    "DROP TRIGGER IF EXISTS bot_order_search_update",
+    "DROP TRIGGER IF EXISTS bot_order_search_delete",
+]
+
+CLIENT_CHANGED = (
+    "OLD.name IS NOT NEW.name OR OLD.telegram_username IS NOT NEW.telegram_username "
+    "OR OLD.phone_number IS NOT NEW.phone_number"
+)
+ORDER_CHANGED = "OLD.courier_name IS NOT NEW.courier_name OR OLD.car_number IS NOT NEW.car_number"
+ORDER_INDEXED = "NEW.courier_name IS NOT NULL OR NEW.car_number IS NOT NULL"
+
+
+def _enqueue(table, row):
+    return f"INSERT INTO bot_search_queue(table_name, row_id) VALUES ('{table}', {row}.id);"
+
+
+QUEUE_FORWARD = [
+    """
+    CREATE TABLE bot_search_queue (
+        id INTEGER PRIMARY KEY AUTOINCREMENT,
+        table_name TEXT NOT NULL,
+        row_id INTEGER NOT NULL
+    )
+    """,
+    f"""
+    CREATE TRIGGER bot_client_search_insert AFTER INSERT ON bot_client BEGIN
+        {_enqueue('bot_client', 'NEW')}
+    END
+    """,
+    # Client.save() переписывает все колонки: без WHEN триггер срабатывал бы на каждое сохранение
+    f"""
+    CREATE TRIGGER bot_client_search_update AFTER UPDATE OF name, telegram_username, phone_number ON bot_client
+    WHEN {CLIENT_CHANGED} BEGIN
+        {_enqueue('bot_client', 'NEW')}
+    END
+    """,
+    f"""
+    CREATE TRIGGER bot_client_search_delete AFTER DELETE ON bot_client BEGIN
+        {_enqueue('bot_client', 'OLD')}
+    END
+    """,
+    f"""
+    CREATE TRIGGER bot_order_search_insert AFTER INSERT ON bot_order WHEN {ORDER_INDEXED} BEGIN
+        {_enqueue('bot_order', 'NEW')}
+    END
+    """,
+    f"""
+    CREATE TRIGGER bot_order_search_update AFTER UPDATE OF courier_name, car_number ON bot_order
+    WHEN {ORDER_CHANGED} BEGIN
+        {_enqueue('bot_order', 'NEW')}
+    END
+    """,
+    # Удаление неоплаченных и архивация идут пачками; заказы без курьера в индексе не было
+    f"""
+    CREATE TRIGGER bot_order_search_delete AFTER DELETE ON bot_order
+    WHEN OLD.courier_name IS NOT NULL OR OLD.car_number IS NOT NULL BEGIN
+        {_enqueue('bot_order', 'OLD')}
+    END
+    """,
+]
+
+
+def _has_fts_tables(connection):
+    return 'bot_client_search' in connection.introspection.table_names()
+
+
+def forwards(apps, schema_editor):
+    connection = schema_editor.connection
+    if connection.vendor != 'sqlite' or not _has_fts_tables(connection):
+        return
+    for sql in DROP_FTS_TRIGGERS + QUEUE_FORWARD:
+        schema_editor.execute(sql)
+
+
+def backwards(apps, schema_editor):
+    connection = schema_editor.connection
+    if connection.vendor != 'sqlite' or not _has_fts_tables(connection):
+        return
+    for sql in DROP_FTS_TRIGGERS + ["DROP TABLE IF EXISTS bot_search_queue"]:
+        schema_editor.execute(sql)
+    # Возвращаем триггеры 0008; индекс пересобирается, чтобы не потерять изменения из очереди
+    migration = import_module('apps.bot.migrations.0008_search_index')
+    for sql in migration.SQLITE_FORWARD[2:8]:
+        schema_editor.execute(sql)
+    for table in ('bot_client_search', 'bot_order_search'):
+        schema_editor.execute(f"DELETE FROM {table}")
+    for sql in migration.SQLITE_FORWARD[8:]:
+        schema_editor.execute(sql)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('bot', '0008_search_index'),
+    ]
+
+    operations = [
+        migrations.RunPython(forwards, backwards),
+    ]
@@ -0,0 +1,38 @@
+# Generated by Django 4.2.30 on 2026-10-19 18:00
+
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+def merge_orphan_rollups(apps, schema_editor):
+    # Строки, которые SET_NULL уже отвязал от товара, по товарам не разнести. Сводим их в одну
+    # на день и вариант: иначе roll_up_sales дописывает продажи в произвольную из них
+    SalesRollup = apps.get_model('bot', 'SalesRollup')
+    kept = {}
+    duplicate_ids = []
+    for rollup in SalesRollup.objects.filter(product__isnull=True).order_by('id'):
+        key = (rollup.day, rollup.is_small, rollup.is_big, rollup.is_hot, rollup.is_cold)
+        first = kept.setdefault(key, rollup)
+        if first is not rollup:
+            first.quantity += rollup.quantity
+            first.revenue += rollup.revenue
+            duplicate_ids.append(rollup.id)
+    if duplicate_ids:
+        SalesRollup.objects.bulk_update(list(kept.values()), ['quantity', 'revenue'])
+        SalesRollup.objects.filter(id__in=duplicate_ids).delete()
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('bot', '0009_search_queue'),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='salesrollup',
+            name='product',
+            field=models.ForeignKey(db_constraint=False, null=True, on_delete=django.db.models.deletion.DO_NOTHING, related_name='sales_rollups', to='bot.product', verbose_name='Product'),
+        ),
+        migrations.RunPython(merge_orphan_rollups, migrations.RunPython.noop),
+    ]
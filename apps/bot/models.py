@@ -1,4 +1,6 @@
+import zlib
 from datetime import datetime, timedelta
+from django.core import serializers
 from django.db import models
 from django.utils import timezone
 from django.utils.translation import gettext_lazy as _
@@ -61,6 +63,13 @@ class Client(models.Model):
     class Meta:
         verbose_name = _('Client')
         verbose_name_plural = _('Clients')
+        indexes = [
+            # По telegram_id клиента ищет каждый обработчик бота; остальные — для поиска в админке
+            models.Index(fields=['telegram_id'], name='client_telegram_id_idx'),
+            models.Index(fields=['phone_number'], name='client_phone_idx'),
+            models.Index(fields=['telegram_username'], name='client_username_idx'),
+            models.Index(fields=['name'], name='client_name_idx'),
+        ]
 
     def __str__(self):
         return self.name if self.name else _('Unnamed Client')
@@ -236,6 +245,13 @@ class Order(models.Model):
     ]
     status = models.CharField(max_length=50, choices=STATUS_CHOICES, default='pending')
     cart_data_json = models.JSONField(null=True, blank=True)
+    telegram_payment_charge_id = models.CharField(max_length=255, unique=True, null=True, blank=True, editable=False)
+
+    class Meta:
+        indexes = [
+            models.Index(fields=['status', 'created_at'], name='order_status_created_idx'),
+            models.Index(fields=['car_number'], name='order_car_number_idx'),
+        ]
 
     def save_cart_data(self, cart_data):
         self.cart_data_json = cart_data
@@ -244,6 +260,150 @@ class Order(models.Model):
     def get_cart_data(self):
         return self.cart_data_json
 
+
+class OrderItem(models.Model):
+    """
+    Позиция заказа для отчётов и агрегаций. Для показа заказа по-прежнему используется
+    снимок cart_data_json; created_at копируется из заказа, чтобы группировать по дате без JOIN.
+    """
+    order = models.ForeignKey(Order, on_delete=models.CASCADE, related_name='items', verbose_name=_('Order'))
+    product = models.ForeignKey(
+        Product,
+        on_delete=models.SET_NULL,
+        null=True,
+        related_name='order_items',
+        verbose_name=_('Product')
+    )
+    quantity = models.PositiveIntegerField(verbose_name=_('Quantity'))
+    unit_price = models.PositiveIntegerField(verbose_name=_('Unit price'))
+    is_small = models.BooleanField(default=False, verbose_name='Маленький размер')
+    is_big = models.BooleanField(default=False, verbose_name='Большой размер')
+    is_hot = models.BooleanField(default=False, verbose_name='Горячий')
+    is_cold = models.BooleanField(default=False, verbose_name='Холодный')
+    created_at = models.DateTimeField(db_index=True)
+
+    class Meta:
+        verbose_name = _('Order item')
+        verbose_name_plural = _('Order items')
+        indexes = [
+            models.Index(fields=['product', 'created_at'], name='orderitem_product_created_idx'),
+        ]
+
+    def __str__(self):
+        return f"{self.order_id}: {self.product_id} x {self.quantity}"
+
+
+class ArchivedOrder(models.Model):
+    """
+    Завершённый заказ, перенесённый из Order задачей archive_orders. В колонках — только то,
+    по чему ищут (клиент, дата, статус, сумма); заказ целиком хранится в payload как
+    сжатый JSON сериализатора Django и восстанавливается из него с тем же id.
+    """
+    id = models.BigIntegerField(primary_key=True)
+    client = models.ForeignKey(
+        Client,
+        on_delete=models.SET_NULL,
+        null=True,
+        related_name='archived_orders',
+        verbose_name=_('Client')
+    )
+    status = models.CharField(max_length=50, choices=Order.STATUS_CHOICES)
+    total_price = models.FloatField()
+    created_at = models.DateTimeField(db_index=True)
+    archived_at = models.DateTimeField(auto_now_add=True)
+    payload = models.BinaryField()
+
+    class Meta:
+        verbose_name = 'Архивный заказ'
+        verbose_name_plural = 'Архив заказов'
+        indexes = [
+            models.Index(fields=['client', 'created_at'], name='archivedorder_client_idx'),
+        ]
+
+    def __str__(self):
+        return f"Archived order #{self.id}"
+
+    @classmethod
+    def from_order(cls, order):
+        payload = serializers.serialize('json', [order])
+        return cls(
+            id=order.id,
+            client_id=order.client_id,
+            status=order.status,
+            total_price=order.total_price,
+            created_at=order.created_at,
+            payload=zlib.compress(payload.encode()),
+        )
+
+    def to_order(self):
+        """Несохранённый Order с исходным id; клиент — текущий, на случай если его удалили."""
+        order = next(serializers.deserialize('json', zlib.decompress(self.payload).decode())).object
+        order.client_id = self.client_id
+        return order
+
+
+class DailySales(models.Model):
+    """Итоги продаж за день (по времени Ташкента). Заполняется задачей roll_up_sales, не вручную."""
+    day = models.DateField(unique=True, verbose_name='День')
+    order_count = models.PositiveIntegerField(default=0, verbose_name='Заказов')
+    revenue = models.BigIntegerField(default=0, verbose_name='Выручка')
+    delivery_revenue = models.BigIntegerField(default=0, verbose_name='В том числе доставка')
+
+    class Meta:
+        verbose_name = 'Продажи за день'
+        verbose_name_plural = 'Продажи по дням'
+
+    def __str__(self):
+        return str(self.day)
+
+    @property
+    def average_basket(self):
+        return round(self.revenue / self.order_count) if self.order_count else 0
+
+
+class SalesRollup(models.Model):
+    """Продажи за день по товару и варианту — основа для топа товаров без обхода OrderItem."""
+    day = models.DateField(verbose_name='День')
+    # product_id остаётся и после удаления товара: с SET_NULL строки разных удалённых товаров
+    # за один день сливались бы в одну и продажи смешивались
+    product = models.ForeignKey(
+        Product,
+        on_delete=models.DO_NOTHING,
+        db_constraint=False,
+        null=True,
+        related_name='sales_rollups',
+        verbose_name=_('Product')
+    )
+    is_small = models.BooleanField(default=False, verbose_name='Маленький размер')
+    is_big = models.BooleanField(default=False, verbose_name='Большой размер')
+    is_hot = models.BooleanField(default=False, verbose_name='Горячий')
+    is_cold = models.BooleanField(default=False, verbose_name='Холодный')
+    quantity = models.PositiveIntegerField(default=0, verbose_name=_('Quantity'))
+    revenue = models.BigIntegerField(default=0, verbose_name='Выручка')
+
+    class Meta:
+        verbose_name = 'Продажи товара за день'
+        verbose_name_plural = 'Продажи товаров по дням'
+        constraints = [
+            models.UniqueConstraint(
+                fields=['day', 'product', 'is_small', 'is_big', 'is_hot', 'is_cold'],
+                name='salesrollup_unique_key'
+            ),
+        ]
+
+    def __str__(self):
+        return f"{self.day}: {self.product_id} x {self.quantity}"
+
+
+class RollupWatermark(models.Model):
+    """Последний заказ, учтённый в агрегатах: задача продолжает с него, а не пересчитывает всю историю."""
+    name = models.CharField(max_length=50, primary_key=True)
+    last_order_id = models.BigIntegerField(default=0)
+    updated_at = models.DateTimeField(auto_now=True)
+
+    def __str__(self):
+        return f"{self.name}: {self.last_order_id}"
+
 # class OrderHistory(models.Model):
 #     order = models.ForeignKey(
 #         Order,
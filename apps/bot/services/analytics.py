@@ -0,0 +1,136 @@
+from datetime import timedelta
+from zoneinfo import ZoneInfo
+
+from django.conf import settings
+from django.db import transaction
+from django.db.models import Count, F, Sum
+from django.db.models.functions import TruncDate
+from django.utils import timezone
+
+from apps.bot.models import DailySales, Order, OrderItem, RollupWatermark, SalesRollup
+
+# Оплаченные заказы. Заказ, отменённый уже после учёта, остаётся в агрегатах
+# до пересборки (backfill_sales_rollups --rebuild)
+SOLD_STATUSES = ('in_progress', 'delivering', 'completed', 'closed')
+
+SALES_WATERMARK = 'sales'
+
+VARIANT_FIELDS = ('is_small', 'is_big', 'is_hot', 'is_cold')
+
+
+def _sales_day(field):
+    return TruncDate(field, tzinfo=ZoneInfo(settings.BOT_SALES_TIME_ZONE))
+
+
+def _next_order_ids(last_order_id, batch_size):
+    """
+    Следующая пачка заказов, судьба которых уже решена. Граница не заходит за первый
+    неоплаченный заказ (его ещё могут оплатить или удалить) и за заказы моложе
+    BOT_SALES_ROLLUP_LAG: на PostgreSQL id выдаются до фиксации транзакции, и заказ
+    с меньшим id может стать видимым позже заказа с большим.
+    """
+    orders = Order.objects.filter(
+        id__gt=last_order_id,
+        created_at__lt=timezone.now() - timedelta(seconds=settings.BOT_SALES_ROLLUP_LAG),
+    )
+    first_pending = (
+        Order.objects.filter(status='pending', id__gt=last_order_id)
+        .order_by('id').values_list('id', flat=True).first()
+    )
+    if first_pending is not None:
+        orders = orders.filter(id__lt=first_pending)
+    return list(orders.order_by('id').values_list('id', flat=True)[:batch_size])
+
+
+def _merge_daily(rows):
+    existing = {sales.day: sales for sales in DailySales.objects.filter(day__in=[row['day'] for row in rows])}
+    created = []
+    for row in rows:
+        sales = existing.get(row['day'])
+        if sales is None:
+            sales = DailySales(day=row['day'])
+            created.append(sales)
+        sales.order_count += row['order_count']
+        sales.revenue += round(row['revenue'] or 0)
+        sales.delivery_revenue += row['delivery_revenue'] or 0
+    DailySales.objects.bulk_update(list(existing.values()), ['order_count', 'revenue', 'delivery_revenue'])
+    DailySales.objects.bulk_create(created)
+
+
+def _merge_products(rows):
+    key_fields = ('day', 'product_id', *VARIANT_FIELDS)
+    existing = {
+        tuple(getattr(rollup, field) for field in key_fields): rollup
+        for rollup in SalesRollup.objects.filter(day__in={row['day'] for row in rows})
+    }
+    created = []
+    updated = []
+    for row in rows:
+        key = tuple(row[field] for field in key_fields)
+        rollup = existing.get(key)
+        if rollup is None:
+            rollup = SalesRollup(**dict(zip(key_fields, key)))
+            created.append(rollup)
+        else:
+            updated.append(rollup)
+        rollup.quantity += row['sold_quantity']
+        rollup.revenue += row['sold_revenue'] or 0
+    # Строки за день, не затронутые пачкой, не перезаписываем
+    SalesRollup.objects.bulk_update(updated, ['quantity', 'revenue'])
+    SalesRollup.objects.bulk_create(created)
+
+
+def roll_up_sales(batch_size=None, max_batches=None):
+    """
+    Добавляет в DailySales и SalesRollup заказы после водяного знака, пачками по batch_size.
+    Каждая пачка и сдвиг знака — одна транзакция; знак сдвигается условным UPDATE, так что
+    два одновременных запуска не учтут одну пачку дважды: второй просто остановится.
+    Возвращает число просмотренных заказов.
+    """
+    batch_size = batch_size or settings.BOT_SALES_ROLLUP_BATCH_SIZE
+    RollupWatermark.objects.get_or_create(name=SALES_WATERMARK)
+    processed = batches = 0
+
+    while max_batches is None or batches < max_batches:
+        last_order_id = RollupWatermark.objects.values_list('last_order_id', flat=True).get(name=SALES_WATERMARK)
+        order_ids = _next_order_ids(last_order_id, batch_size)
+        if not order_ids:
+            break
+
+        with transaction.atomic():
+            moved = RollupWatermark.objects.filter(name=SALES_WATERMARK, last_order_id=last_order_id).update(
+                last_order_id=order_ids[-1], updated_at=timezone.now()
+            )
+            if not moved:
+                break
+
+            orders = Order.objects.filter(id__gt=last_order_id, id__lte=order_ids[-1], status__in=SOLD_STATUSES)
+            daily = list(
+                orders.annotate(day=_sales_day('created_at')).values('day').annotate(
+                    order_count=Count('id'),
+                    revenue=Sum('total_price'),
+                    delivery_revenue=Sum('delivery_cost'),
+                )
+            )
+            products = list(
+                OrderItem.objects.filter(order__in=orders)
+                .annotate(day=_sales_day('created_at'))
+                .values('day', 'product_id', *VARIANT_FIELDS)
+                .annotate(sold_quantity=Sum('quantity'), sold_revenue=Sum(F('quantity') * F('unit_price')))
+            )
+            _merge_daily(daily)
+            _merge_products(products)
+
+        processed += len(order_ids)
+        batches += 1
+        if len(order_ids) < batch_size:
+            break
+    return processed
+
+
+def reset_sales_rollups():
+    """Очищает агрегаты и водяной знак: следующий roll_up_sales пересчитает всю историю."""
+    with transaction.atomic():
+        RollupWatermark.objects.update_or_create(name=SALES_WATERMARK, defaults={'last_order_id': 0})
+        DailySales.objects.all().delete()
+        SalesRollup.objects.all().delete()
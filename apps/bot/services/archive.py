@@ -0,0 +1,86 @@
+from datetime import timedelta
+
+from django.conf import settings
+from django.db import transaction
+from django.utils import timezone
+
+from apps.bot.models import ArchivedOrder, Order, OrderItem, Product, RollupWatermark
+from apps.bot.services.analytics import SALES_WATERMARK
+from apps.bot.services.order_service import build_order_items, forget_order_snapshots
+
+ARCHIVABLE_STATUSES = ('completed', 'closed', 'canceled')
+
+
+def archive_orders(older_than_days=None, batch_size=None):
+    """
+    Переносит завершённые заказы старше older_than_days в ArchivedOrder пачками; каждая
+    пачка — одна транзакция. Позиции OrderItem удаляются каскадом, при восстановлении они
+    собираются заново из cart_data_json. Архивируются только заказы, уже учтённые в
+    агрегатах продаж: задача roll_up_sales читает их из Order. Возвращает число перенесённых.
+    """
+    if older_than_days is None:
+        older_than_days = settings.BOT_ORDER_ARCHIVE_AFTER_DAYS
+    batch_size = batch_size or settings.BOT_ORDER_ARCHIVE_BATCH_SIZE
+
+    rolled_up_to = RollupWatermark.objects.filter(name=SALES_WATERMARK).values_list('last_order_id', flat=True).first()
+    if not rolled_up_to:
+        return 0
+    cutoff = timezone.now() - timedelta(days=older_than_days)
+    archived = 0
+
+    while True:
+        with transaction.atomic():
+            # Диапазонный проход по индексу (status, created_at), как при удалении неоплаченных
+            orders = list(
+                Order.objects
+                .filter(status__in=ARCHIVABLE_STATUSES, created_at__lt=cutoff, id__lte=rolled_up_to)
+                .order_by('created_at')[:batch_size]
+            )
+            if not orders:
+                break
+            ArchivedOrder.objects.bulk_create([ArchivedOrder.from_order(order) for order in orders])
+            order_ids = [order.id for order in orders]
+            Order.objects.filter(id__in=order_ids).delete()
+            forget_order_snapshots(order_ids)
+            archived += len(orders)
+
+        if len(orders) < batch_size:
+            break
+    return archived
+
+
+def restore_orders(archived_orders, batch_size=500):
+    """Возвращает архивные заказы в Order с прежними id и позициями. Возвращает число восстановленных."""
+    product_ids_by_title = None
+    restored = 0
+    archived_orders = archived_orders.defer(None).order_by('id')
+
+    while True:
+        with transaction.atomic():
+            batch = list(archived_orders[:batch_size])
+            if not batch:
+                break
+            orders = [archived.to_order() for archived in batch]
+            created_at = [order.created_at for order in orders]
+            Order.objects.bulk_create(orders)
+            # auto_now_add при вставке подменяет дату заказа текущей — возвращаем исходную
+            for order, value in zip(orders, created_at):
+                order.created_at = value
+            Order.objects.bulk_update(orders, ['created_at'])
+
+            # Старые снимки без product_id сопоставляются по названию, как в backfill_order_items
+            if product_ids_by_title is None and any(
+                not line.get('product_id') for order in orders for line in order.cart_data_json or []
+            ):
+                product_ids_by_title = dict(Product.objects.values_list('title_ru', 'id'))
+            items = []
+            for order in orders:
+                items.extend(build_order_items(order, order.cart_data_json, product_ids_by_title))
+            OrderItem.objects.bulk_create(items)
+
+            ArchivedOrder.objects.filter(id__in=[order.id for order in orders]).delete()
+            restored += len(orders)
+
+        if len(batch) < batch_size:
+            break
+    return restored
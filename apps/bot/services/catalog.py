@@ -0,0 +1,82 @@
+import time
+
+from django.conf import settings
+from django.core.cache import cache
+
+from apps.bot.models import Category, Product
+
+CATALOG_VERSION_KEY = 'bot:catalog:version'
+
+
+def _timeout():
+    return getattr(settings, 'BOT_CATALOG_CACHE_TIMEOUT', 300)
+
+
+def _version():
+    return cache.get_or_set(CATALOG_VERSION_KEY, 1, None)
+
+
+def invalidate_catalog():
+    """Сбрасывает закэшированные категории и товары после изменения в админке."""
+    try:
+        cache.incr(CATALOG_VERSION_KEY)
+    except ValueError:
+        # Ключа версии нет в кэше — начинаем с новой, заведомо не использованной версии
+        cache.set(CATALOG_VERSION_KEY, int(time.time()), None)
+
+
+def get_categories():
+    key = f'bot:catalog:{_version()}:categories'
+    categories = cache.get(key)
+    if categories is None:
+        categories = list(Category.objects.order_by('id').values('id', 'title_ru', 'title_uz'))
+        cache.set(key, categories, _timeout())
+    return categories
+
+
+def get_products(category_id):
+    key = f'bot:catalog:{_version()}:products:{category_id}'
+    products = cache.get(key)
+    if products is None:
+        products = list(
+            Product.objects.filter(category_id=category_id).order_by('id').values('id', 'title_ru', 'title_uz')
+        )
+        cache.set(key, products, _timeout())
+    return products
+
+
+async def aget_categories():
+    """Асинхронный вариант get_categories с тем же ключом кэша."""
+    key = f"bot:catalog:{await cache.aget_or_set(CATALOG_VERSION_KEY, 1, None)}:categories"
+    categories = await cache.aget(key)
+    if categories is None:
+        categories = [row async for row in Category.objects.order_by('id').values('id', 'title_ru', 'title_uz')]
+        await cache.aset(key, categories, _timeout())
+    return categories
+
+
+async def aget_products(category_id):
+    key = f"bot:catalog:{await cache.aget_or_set(CATALOG_VERSION_KEY, 1, None)}:products:{category_id}"
+    products = await cache.aget(key)
+    if products is None:
+        products = [
+            row async for row in
+            Product.objects.filter(category_id=category_id).order_by('id').values('id', 'title_ru', 'title_uz')
+        ]
+        await cache.aset(key, products, _timeout())
+    return products
+
+
+def _product_photo_key(product):
+    # Имя файла входит в ключ: после замены картинки в админке file_id станет другим
+    return f'bot:product_photo:{product.id}:{product.image.name}'
+
+
+def get_product_photo_id(product):
+    return cache.get(_product_photo_key(product))
+
+
+def remember_product_photo_id(product, message):
+    """Сохраняет file_id фото, которое Telegram вернул после загрузки."""
+    if getattr(message, 'photo', None):
+        cache.set(_product_photo_key(product), message.photo[-1].file_id, None)
@@ -0,0 +1,123 @@
+import argparse
+import csv
+import json
+from datetime import datetime, time, timedelta
+from zoneinfo import ZoneInfo
+
+from django.conf import settings
+from django.utils.dateparse import parse_date
+
+from apps.bot.models import Order
+
+ORDER_COLUMNS = (
+    'order_id', 'created_at', 'status', 'total_price', 'delivery_cost', 'delivery_address',
+    'telegram_payment_charge_id', 'client_telegram_id', 'client_name', 'client_username', 'client_phone',
+)
+LINE_COLUMNS = (
+    'line_number', 'product_id', 'product_title_ru', 'product_title_uz', 'quantity', 'price', 'line_total',
+    'is_small', 'is_big', 'is_hot', 'is_cold',
+)
+COLUMNS = ORDER_COLUMNS + LINE_COLUMNS
+
+EXPORT_FORMATS = ('csv', 'jsonl')
+
+
+def date_argument(value):
+    """Тип аргумента --since/--until для команд."""
+    parsed = parse_date(value)
+    if parsed is None:
+        raise argparse.ArgumentTypeError(f"неверная дата {value!r}: ожидается ГГГГ-ММ-ДД")
+    return parsed
+
+
+def filter_orders(queryset, since=None, until=None, statuses=None):
+    """since и until — даты (включительно) по часовому поясу отчётов, как в агрегатах продаж."""
+    zone = ZoneInfo(settings.BOT_SALES_TIME_ZONE)
+    if since:
+        queryset = queryset.filter(created_at__gte=datetime.combine(since, time.min, zone))
+    if until:
+        queryset = queryset.filter(created_at__lt=datetime.combine(until + timedelta(days=1), time.min, zone))
+    if statuses:
+        queryset = queryset.filter(status__in=statuses)
+    return queryset
+
+
+def iter_orders(queryset, chunk_size=2000):
+    """
+    Заказы с клиентами пачками по первичному ключу. В отличие от iterator(), не зависит от
+    серверных курсоров: за PgBouncer они отключены, и iterator() прочитал бы весь результат сразу.
+    """
+    # defer(None): списки админки откладывают cart_data_json, а выгрузке он нужен
+    queryset = queryset.select_related('client').defer(None).order_by('id')
+    last_id = 0
+    while True:
+        chunk = list(queryset.filter(id__gt=last_id)[:chunk_size])
+        if not chunk:
+            return
+        yield from chunk
+        last_id = chunk[-1].id
+
+
+def iter_order_rows(queryset, chunk_size=2000):
+    """Плоские строки: одна на позицию из cart_data_json, заказ без позиций — одна строка без них."""
+    for order in iter_orders(queryset, chunk_size):
+        client = order.client
+        order_row = {
+            'order_id': order.id,
+            'created_at': order.created_at.isoformat(),
+            'status': order.status,
+            'total_price': order.total_price,
+            'delivery_cost': order.delivery_cost,
+            'delivery_address': order.delivery_address,
+            'telegram_payment_charge_id': order.telegram_payment_charge_id,
+            'client_telegram_id': client.telegram_id if client else None,
+            'client_name': client.name if client else None,
+            'client_username': client.telegram_username if client else None,
+            'client_phone': client.phone_number if client else None,
+        }
+        lines = order.cart_data_json or []
+        if not lines:
+            yield order_row
+            continue
+        for number, line in enumerate(lines, 1):
+            quantity = line.get('quantity', 0)
+            price = line.get('price')
+            yield {
+                **order_row,
+                'line_number': number,
+                'product_id': line.get('product_id'),
+                'product_title_ru': line.get('product_title_ru'),
+                'product_title_uz': line.get('product_title_uz'),
+                'quantity': quantity,
+                'price': price,
+                'line_total': price * quantity if price is not None else None,
+                'is_small': line.get('is_small', False),
+                'is_big': line.get('is_big', False),
+                'is_hot': line.get('is_hot', False),
+                'is_cold': line.get('is_cold', False),
+            }
+
+
+class _Line:
+    """Файлоподобный объект для csv.writer: возвращает записанную строку, а не копит её."""
+
+    def write(self, value):
+        return value
+
+
+def iter_csv(rows):
+    writer = csv.DictWriter(_Line(), fieldnames=COLUMNS, extrasaction='ignore')
+    yield writer.writeheader()
+    for row in rows:
+        yield writer.writerow(row)
+
+
+def iter_jsonl(rows):
+    for row in rows:
+        yield json.dumps(row, ensure_ascii=False) + '\n'
+
+
+def iter_export(queryset, export_format, chunk_size=2000):
+    """Текст выгрузки кусками по строке — для файла и для StreamingHttpResponse."""
+    rows = iter_order_rows(queryset, chunk_size)
+    return iter_csv(rows) if export_format == 'csv' else iter_jsonl(rows)
@@ -0,0 +1,153 @@
+import logging
+
+from django.conf import settings
+from django.core.cache import cache
+from telebot.apihelper import ApiTelegramException
+from telebot.types import InlineKeyboardMarkup
+
+logger = logging.getLogger(__name__)
+
+# Клавиатура старше суток почти наверняка сменилась, дальше держать её в кэше незачем
+REPLY_KEYBOARD_TIMEOUT = 24 * 60 * 60
+
+
+def is_unchanged(message, text, reply_markup, parse_mode):
+    """
+    Совпадает ли экран с сообщением из callback. Сообщение присылает сам Telegram, поэтому
+    сравнение верно в любом процессе, в отличие от кэша в памяти воркера. С parse_mode
+    message.text приходит без разметки и сравнить его нельзя — тогда просто редактируем.
+    """
+    if parse_mode is not None or message.text != text:
+        return False
+    current_markup = message.reply_markup.to_json() if message.reply_markup else None
+    return current_markup == (reply_markup.to_json() if reply_markup else None)
+
+
+def remember_screen(message, text, reply_markup):
+    # Тот же объект может прийти в show ещё раз в этом же обработчике
+    message.text = text
+    message.reply_markup = reply_markup
+
+
+class ScreenNavigator:
+    """
+    Показывает экраны меню. Если экран открыт из inline-кнопки, текущее сообщение
+    редактируется на месте; новое сообщение отправляется только когда редактирование
+    невозможно (например, фото нельзя превратить в текст).
+    """
+
+    def __init__(self, bot):
+        self.bot = bot
+
+    @staticmethod
+    def _reply_keyboard_key(chat_id):
+        return f'bot:reply_keyboard:{chat_id}'
+
+    @staticmethod
+    def _reply_keyboard_shown(cached_keyboard, keyboard_json):
+        # LocMem у каждого процесса свой: клавиатуру мог сменить другой воркер, и тогда
+        # её нужно отправить заново, а не редактировать текст
+        return settings.BOT_NAVIGATION_CACHE_SHARED and cached_keyboard == keyboard_json
+
+    def show(self, chat_id, text, reply_markup=None, parse_mode=None, message=None):
+        can_edit = (
+            message is not None
+            and getattr(message, 'content_type', None) == 'text'
+            and (reply_markup is None or isinstance(reply_markup, InlineKeyboardMarkup))
+        )
+        if can_edit:
+            # Экран не изменился — запрос к Telegram не нужен
+            if is_unchanged(message, text, reply_markup, parse_mode):
+                return message
+            try:
+                self.bot.edit_message_text(
+                    chat_id=chat_id,
+                    message_id=message.message_id,
+                    text=text,
+                    reply_markup=reply_markup,
+                    parse_mode=parse_mode
+                )
+                remember_screen(message, text, reply_markup)
+                return message
+            except ApiTelegramException as e:
+                if 'message is not modified' in str(e.description):
+                    return message
+                logger.warning(f"Не удалось отредактировать сообщение {message.message_id}: {e}")
+
+        return self.bot.send_message(
+            chat_id=chat_id,
+            text=text,
+            reply_markup=reply_markup,
+            parse_mode=parse_mode
+        )
+
+    def show_menu(self, chat_id, text, reply_keyboard, message=None):
+        """
+        Reply-клавиатуру нельзя установить редактированием. Если у пользователя уже
+        открыта та же самая клавиатура, достаточно отредактировать текущее сообщение.
+        """
+        keyboard_json = reply_keyboard.to_json()
+        key = self._reply_keyboard_key(chat_id)
+
+        if message is not None and self._reply_keyboard_shown(cache.get(key), keyboard_json):
+            return self.show(chat_id, text, message=message)
+
+        sent_message = self.bot.send_message(chat_id=chat_id, text=text, reply_markup=reply_keyboard)
+        cache.set(key, keyboard_json, REPLY_KEYBOARD_TIMEOUT)
+        return sent_message
+
+    def reset_reply_keyboard(self, chat_id):
+        """Вызывается, когда пользователю отправлена другая reply-клавиатура."""
+        cache.delete(self._reply_keyboard_key(chat_id))
+
+
+class AsyncScreenNavigator(ScreenNavigator):
+    """То же самое для AsyncTeleBot: методы бота и кэша вызываются через await."""
+
+    async def show(self, chat_id, text, reply_markup=None, parse_mode=None, message=None):
+        # asyncio_helper тянет aiohttp — импортируем только в асинхронном режиме
+        from telebot import asyncio_helper
+
+        can_edit = (
+            message is not None
+            and getattr(message, 'content_type', None) == 'text'
+            and (reply_markup is None or isinstance(reply_markup, InlineKeyboardMarkup))
+        )
+        if can_edit:
+            if is_unchanged(message, text, reply_markup, parse_mode):
+                return message
+            try:
+                await self.bot.edit_message_text(
+                    chat_id=chat_id,
+                    message_id=message.message_id,
+                    text=text,
+                    reply_markup=reply_markup,
+                    parse_mode=parse_mode
+                )
+                remember_screen(message, text, reply_markup)
+                return message
+            except asyncio_helper.ApiTelegramException as e:
+                if 'message is not modified' in str(e.description):
+                    return message
+                logger.warning(f"Не удалось отредактировать сообщение {message.message_id}: {e}")
+
+        return await self.bot.send_message(
+            chat_id=chat_id,
+            text=text,
+            reply_markup=reply_markup,
+            parse_mode=parse_mode
+        )
+
+    async def show_menu(self, chat_id, text, reply_keyboard, message=None):
+        keyboard_json = reply_keyboard.to_json()
+        key = self._reply_keyboard_key(chat_id)
+
+        if message is not None and self._reply_keyboard_shown(await cache.aget(key), keyboard_json):
+            return await self.show(chat_id, text, message=message)
+
+        sent_message = await self.bot.send_message(chat_id=chat_id, text=text, reply_markup=reply_keyboard)
+        await cache.aset(key, keyboard_json, REPLY_KEYBOARD_TIMEOUT)
+        return sent_message
+
+    async def reset_reply_keyboard(self, chat_id):
+        await cache.adelete(self._reply_keyboard_key(chat_id))
@@ -0,0 +1,252 @@
+from collections import defaultdict
+
+from django.core.cache import cache
+from django.db import connection, transaction
+
+from apps.bot.models import Cart, Order, OrderItem, Product
+from apps.bot.services.write_queue import run_write
+
+CART_VARIANT_FIELDS = ('is_small', 'is_big', 'is_hot', 'is_cold')
+
+# Снимок удаляется при оплате или удалении заказа, таймаут — только страховка
+ORDER_SNAPSHOT_TIMEOUT = 24 * 60 * 60
+
+
+def restore_cart_lines(orders):
+    """
+    Возвращает позиции из cart_data_json заказов обратно в корзины клиентов; вызывается
+    внутри transaction.atomic(). orders — итерируемое из (client_id, cart_data_json).
+    Возвращает число восстановленных строк.
+    """
+    quantities = defaultdict(int)
+    lines_without_id = []
+
+    for client_id, cart_data in orders:
+        if not client_id or not cart_data:
+            continue
+        for line in cart_data:
+            if line.get('quantity', 0) <= 0:
+                continue
+            if line.get('product_id'):
+                quantities[_cart_key(client_id, line['product_id'], line)] += line['quantity']
+            else:
+                lines_without_id.append((client_id, line))
+
+    # Старые заказы хранят только названия товаров — сопоставляем одним запросом
+    if lines_without_id:
+        titles = {line['product_title_ru'] for _, line in lines_without_id if line.get('product_title_ru')}
+        product_ids = dict(Product.objects.filter(title_ru__in=titles).values_list('title_ru', 'id'))
+        for client_id, line in lines_without_id:
+            product_id = product_ids.get(line.get('product_title_ru'))
+            if product_id:
+                quantities[_cart_key(client_id, product_id, line)] += line['quantity']
+
+    if not quantities:
+        return 0
+
+    # Тот же вариант клиент мог добавить в корзину, пока шла пачка (upsert_cart_line): сначала
+    # создаём недостающие строки без конфликта по unique_together, затем прибавляем количество
+    # к заблокированным строкам — IntegrityError не откатит удаление заказов
+    Cart.objects.bulk_create(
+        [
+            Cart(client_id=key[0], product_id=key[1], quantity=0, **dict(zip(CART_VARIANT_FIELDS, key[2:])))
+            for key in quantities
+        ],
+        ignore_conflicts=True
+    )
+
+    client_ids = {key[0] for key in quantities}
+    product_ids = {key[1] for key in quantities}
+    items_to_update = []
+    for item in Cart.objects.select_for_update().filter(client_id__in=client_ids, product_id__in=product_ids):
+        key = (item.client_id, item.product_id) + tuple(getattr(item, field) for field in CART_VARIANT_FIELDS)
+        if key in quantities:
+            item.quantity += quantities[key]
+            items_to_update.append(item)
+
+    Cart.objects.bulk_update(items_to_update, ['quantity'])
+    return len(items_to_update)
+
+
+def build_order_items(order, cart_data, product_ids_by_title=None):
+    """
+    Позиции OrderItem из снимка cart_data_json (без сохранения). Старые снимки без
+    product_id сопоставляются с товаром по названию через product_ids_by_title.
+    """
+    items = []
+    for line in cart_data or []:
+        if line.get('quantity', 0) <= 0:
+            continue
+        product_id = line.get('product_id')
+        if not product_id and product_ids_by_title:
+            product_id = product_ids_by_title.get(line.get('product_title_ru'))
+        items.append(OrderItem(
+            order_id=order.id,
+            product_id=product_id,
+            quantity=line['quantity'],
+            unit_price=int(line.get('price') or 0),
+            created_at=order.created_at,
+            **{field: bool(line.get(field)) for field in CART_VARIANT_FIELDS}
+        ))
+    return items
+
+
+def _cart_key(client_id, product_id, line):
+    return (client_id, product_id) + tuple(bool(line.get(field)) for field in CART_VARIANT_FIELDS)
+
+
+def upsert_cart_line(client, product, is_small=False, is_big=False, is_hot=False, is_cold=False):
+    """
+    Строка корзины для товара в выбранном варианте: новая с количеством 0 или уже существующая.
+    INSERT ... ON CONFLICT DO NOTHING по unique_together не падает, если строку
+    одновременно создал другой поток или клиент выбрал тот же вариант повторно.
+    """
+    variant = {'is_small': bool(is_small), 'is_big': bool(is_big), 'is_hot': bool(is_hot), 'is_cold': bool(is_cold)}
+    run_write(Cart.objects.bulk_create, [Cart(client=client, product=product, quantity=0, **variant)], ignore_conflicts=True)
+    return Cart.objects.get(client=client, product=product, **variant)
+
+
+def apply_default_variants(cart_items):
+    """
+    Назначает позициям корзины размер и температуру по умолчанию, если они не выбраны.
+    Нужен select_related('product'). Возвращает изменённые позиции для bulk_update.
+    """
+    changed_items = []
+    for item in cart_items:
+        variant = tuple(getattr(item, field) for field in CART_VARIANT_FIELDS)
+
+        if not item.is_small and not item.is_big:
+            if item.product.is_small:
+                item.is_small = True
+            elif item.product.is_big:
+                item.is_big = True
+
+        if not item.is_hot and not item.is_cold:
+            if item.product.is_hot:
+                item.is_hot = True
+            elif item.product.is_cold:
+                item.is_cold = True
+
+        if variant != tuple(getattr(item, field) for field in CART_VARIANT_FIELDS):
+            changed_items.append(item)
+    return changed_items
+
+
+def parse_invoice_payload(payload):
+    """Возвращает ID заказа из payload счёта вида order_<id> или None."""
+    prefix, _, order_id = (payload or '').partition('_')
+    if prefix != 'order' or not order_id.isdigit():
+        return None
+    return int(order_id)
+
+
+def invoice_amount(order):
+    """Сумма счёта в минимальных единицах валюты — так же, как она выставлена в send_invoice."""
+    products_cost = order.total_price - order.delivery_cost
+    return int(products_cost * 100) + int(order.delivery_cost * 100)
+
+
+def _order_snapshot_key(order_id):
+    return f'bot:order_snapshot:{order_id}'
+
+
+def cache_order_snapshot(order, chat_id, language_code):
+    """Запоминает данные для проверки pre_checkout_query без обращения к БД."""
+    cache.set(
+        _order_snapshot_key(order.id),
+        {
+            'status': order.status,
+            'amount': invoice_amount(order),
+            'chat_id': int(chat_id),
+            'language_code': language_code,
+        },
+        ORDER_SNAPSHOT_TIMEOUT
+    )
+
+
+def forget_order_snapshots(order_ids):
+    cache.delete_many([_order_snapshot_key(order_id) for order_id in order_ids])
+
+
+def get_order_snapshot(order_id):
+    snapshot = cache.get(_order_snapshot_key(order_id))
+    if snapshot is not None:
+        return snapshot
+
+    # Снимка нет (перезапуск, вытеснение) — один запрос по первичному ключу
+    order = Order.objects.filter(id=order_id).select_related('client').first()
+    if order is None:
+        return None
+    return {
+        'status': order.status,
+        'amount': invoice_amount(order),
+        'chat_id': int(order.client.telegram_id) if order.client and order.client.telegram_id else None,
+        'language_code': order.client.preferred_language if order.client else None,
+    }
+
+
+def validate_pre_checkout(pre_checkout_query):
+    """Возвращает текст ошибки для пользователя или None, если оплату можно принять."""
+    order_id = parse_invoice_payload(pre_checkout_query.invoice_payload)
+    snapshot = get_order_snapshot(order_id) if order_id else None
+
+    if snapshot is None:
+        return "Заказ не найден. Пожалуйста, оформите заказ заново."
+
+    language_code = snapshot.get('language_code')
+    if snapshot['chat_id'] != pre_checkout_query.from_user.id:
+        return "Заказ не найден." if language_code != 'uz' else "Buyurtma topilmadi."
+    if snapshot['status'] != 'pending':
+        return "Этот заказ уже оплачен или отменён." if language_code != 'uz' else "Bu buyurtma allaqachon to'langan yoki bekor qilingan."
+    if pre_checkout_query.currency != 'UZS' or pre_checkout_query.total_amount != snapshot['amount']:
+        return "Сумма заказа изменилась. Пожалуйста, оформите заказ заново." if language_code != 'uz' else "Buyurtma summasi o'zgardi. Iltimos, buyurtmani qaytadan rasmiylashtiring."
+    return None
+
+
+def finalize_payment(order_id, client, telegram_payment_charge_id):
+    """
+    Переводит заказ из pending в in_progress одним условным UPDATE и записывает
+    telegram_payment_charge_id. Возвращает False, если платёж уже был обработан.
+    """
+    updated = Order.objects.filter(id=order_id, client=client, status='pending').update(
+        status='in_progress',
+        telegram_payment_charge_id=telegram_payment_charge_id
+    )
+    if updated:
+        forget_order_snapshots([order_id])
+    return bool(updated)
+
+
+def transition_order(order_id, from_statuses, to_status, **fields):
+    """
+    Переводит заказ из одного из from_statuses в to_status, записывая fields.
+    Возвращает (order, результат): 'ok', 'wrong_status', 'not_found' или 'locked'.
+
+    На PostgreSQL строка берётся через select_for_update(skip_locked=True): если тот же
+    заказ сейчас переводит другой администратор, второй сразу получает 'locked', а не ждёт.
+    SQLite блокировок строк не знает — там тот же результат даёт условный UPDATE.
+    """
+    if connection.features.has_select_for_update_skip_locked:
+        with transaction.atomic():
+            order = Order.objects.select_for_update(skip_locked=True, of=('self',)).select_related('client').filter(
+                id=order_id
+            ).first()
+            if order is None:
+                return None, 'locked' if Order.objects.filter(id=order_id).exists() else 'not_found'
+            if order.status not in from_statuses:
+                return order, 'wrong_status'
+            order.status = to_status
+            for field, value in fields.items():
+                setattr(order, field, value)
+            order.save(update_fields=['status', *fields])
+        return order, 'ok'
+
+    updated = run_write(
+        Order.objects.filter(id=order_id, status__in=from_statuses).update, status=to_status, **fields
+    )
+    order = Order.objects.select_related('client').filter(id=order_id).first()
+    if order is None:
+        return None, 'not_found'
+    if updated:
+        forget_order_snapshots([order_id])
+    return order, 'ok' if updated else 'wrong_status'
@@ -0,0 +1,135 @@
+import re
+
+from django.db import connections, transaction
+from django.db.models.expressions import RawSQL
+
+# Выражения должны совпадать с индексами из миграции 0008_search_index, иначе PostgreSQL их не использует
+PG_CLIENT_DOCUMENT = (
+    r"to_tsvector('simple', coalesce(name, '') || ' ' || coalesce(telegram_username, '') || ' ' || "
+    r"regexp_replace(coalesce(phone_number, ''), '\D', '', 'g') || ' ' || "
+    r"right(regexp_replace(coalesce(phone_number, ''), '\D', '', 'g'), 9))"
+)
+PG_ORDER_DOCUMENT = (
+    r"to_tsvector('simple', coalesce(courier_name, '') || ' ' || upper(replace(coalesce(car_number, ''), ' ', '')))"
+)
+PG_ORDER_INDEXED = "(courier_name IS NOT NULL OR car_number IS NOT NULL)"
+
+# Строки FTS5 на SQLite — те же, что при заполнении индекса в миграции 0008:
+# (таблица, колонки индекса, выражения по строке таблицы, условие попадания в индекс)
+_SQLITE_DIGITS = (
+    "replace(replace(replace(replace(replace(coalesce(phone_number, ''), '+', ''), ' ', ''), '-', ''), '(', ''), ')', '')"
+)
+SQLITE_INDEXES = (
+    (
+        'bot_client', 'rowid, name, username, phone',
+        f"id, name, telegram_username, {_SQLITE_DIGITS} || ' ' || substr({_SQLITE_DIGITS}, -9)", '1',
+    ),
+    (
+        'bot_order', 'rowid, courier_name, car_number',
+        "id, courier_name, upper(replace(car_number, ' ', ''))", PG_ORDER_INDEXED,
+    ),
+)
+
+PHONE_RE = re.compile(r'\+?[\d\s()-]+')
+
+_fts_tables = {}
+
+
+def available(using='default'):
+    """Индекс есть на PostgreSQL всегда, на SQLite — если при миграции была доступна FTS5."""
+    connection = connections[using]
+    if connection.vendor == 'postgresql':
+        return True
+    if connection.vendor != 'sqlite':
+        return False
+    if using not in _fts_tables:
+        _fts_tables[using] = 'bot_client_search' in connection.introspection.table_names()
+    return _fts_tables[using]
+
+
+def reindex(using='default'):
+    """
+    Переносит в FTS5 изменения, которые триггеры поставили в bot_search_queue. Запись в
+    индекс идёт здесь, а не в транзакции запроса бота. На PostgreSQL индекс по выражению
+    обновляется сам. Возвращает число обработанных записей очереди.
+    """
+    connection = connections[using]
+    if connection.vendor != 'sqlite' or not available(using):
+        return 0
+    with connection.cursor() as cursor:
+        cursor.execute("SELECT max(id), count(*) FROM bot_search_queue")
+        last_id, pending = cursor.fetchone()
+    if not last_id:
+        return 0
+
+    with transaction.atomic(using=using), connection.cursor() as cursor:
+        for table, fts_columns, values, indexed in SQLITE_INDEXES:
+            queued = f"SELECT row_id FROM bot_search_queue WHERE table_name = '{table}' AND id <= %s"
+            # Первой идёт запись: транзакция сразу берёт блокировку на запись и ждёт её по timeout
+            cursor.execute(f"DELETE FROM {table}_search WHERE rowid IN ({queued})", [last_id])
+            cursor.execute(
+                f"INSERT INTO {table}_search({fts_columns}) "
+                f"SELECT {values} FROM {table} WHERE id IN ({queued}) AND {indexed}",
+                [last_id]
+            )
+        cursor.execute("DELETE FROM bot_search_queue WHERE id <= %s", [last_id])
+    return pending
+
+
+def search_terms(term):
+    """
+    Слова запроса так, как они лежат в индексе: телефон в любом написании — одна строка цифр
+    (в индексе есть и полный номер 998..., и местный из 9 цифр), у username отбрасывается @.
+    """
+    term = term.strip().lstrip('@')
+    if PHONE_RE.fullmatch(term):
+        digits = re.sub(r'\D', '', term)
+        if len(digits) >= 3:
+            return [digits]
+    return re.findall(r'\w+', term)
+
+
+def _sqlite_query(terms):
+    # Каждое слово — префикс в кавычках: спецсимволы FTS5 из ввода не интерпретируются
+    return ' '.join(f'"{term}"*' for term in terms)
+
+
+def _pg_query(terms):
+    return ' & '.join(f"'{term}':*" for term in terms)
+
+
+def client_ids(term, using='default'):
+    """Подзапрос id клиентов по имени, username и телефону или None, если индекса нет."""
+    if not available(using):
+        return None
+    terms = search_terms(term)
+    if not terms:
+        return []
+    if connections[using].vendor == 'sqlite':
+        return RawSQL("SELECT rowid FROM bot_client_search WHERE bot_client_search MATCH %s", [_sqlite_query(terms)])
+    return RawSQL(
+        f"SELECT id FROM bot_client WHERE {PG_CLIENT_DOCUMENT} @@ to_tsquery('simple', %s)", [_pg_query(terms)]
+    )
+
+
+def order_ids(term, using='default'):
+    """Подзапрос id заказов по имени курьера и номеру машины или None, если индекса нет."""
+    if not available(using):
+        return None
+    terms = search_terms(term)
+    if not terms:
+        return []
+    # Номер машины в индексе слитно: «01 A 123» ищется ещё и как 01A123
+    car_number = ''.join(terms).upper()
+    if connections[using].vendor == 'sqlite':
+        query = _sqlite_query(terms)
+        if len(terms) > 1:
+            query = f'({query}) OR {_sqlite_query([car_number])}'
+        return RawSQL("SELECT rowid FROM bot_order_search WHERE bot_order_search MATCH %s", [query])
+    query = _pg_query(terms)
+    if len(terms) > 1:
+        query = f'({query}) | {_pg_query([car_number])}'
+    return RawSQL(
+        f"SELECT id FROM bot_order WHERE {PG_ORDER_INDEXED} AND {PG_ORDER_DOCUMENT} @@ to_tsquery('simple', %s)",
+        [query]
+    )
@@ -0,0 +1,117 @@
+import gzip
+import logging
+import os
+import shutil
+import sqlite3
+from pathlib import Path
+
+from django.conf import settings
+from django.db import connections
+from django.utils import timezone
+
+logger = logging.getLogger(__name__)
+
+SNAPSHOT_PREFIX = 'db-'
+SNAPSHOT_SUFFIX = '.sqlite3.gz'
+
+
+class SnapshotError(Exception):
+    pass
+
+
+class _RestartLimit(Exception):
+    pass
+
+
+class _Progress:
+    """
+    Считает перезапуски копирования: запись в базу с другого соединения заставляет SQLite
+    начать копирование заново, и при постоянной нагрузке шаги могут никогда не закончиться.
+    """
+
+    def __init__(self, max_restarts):
+        self.max_restarts = max_restarts
+        self.restarts = 0
+        self.steps = 0
+        self._remaining = None
+
+    def __call__(self, status, remaining, total):
+        self.steps += 1
+        if self._remaining is not None and remaining > self._remaining:
+            self.restarts += 1
+            if self.restarts > self.max_restarts:
+                raise _RestartLimit()
+        self._remaining = remaining
+
+
+def snapshot_database(directory=None, pages=None, sleep=None, keep=None, max_restarts=None, using='default'):
+    """
+    Снимок базы SQLite через online backup API: страницы копируются шагами по pages с паузой
+    sleep между ними, так что запись бота ждёт не дольше одного шага. Копия проверяется
+    integrity_check, сжимается gzip и появляется в directory только целиком. Старые снимки
+    сверх keep удаляются. Возвращает путь к снимку.
+    """
+    directory = Path(directory or settings.BOT_DB_SNAPSHOT_DIR)
+    pages = pages or settings.BOT_DB_SNAPSHOT_PAGES
+    sleep = settings.BOT_DB_SNAPSHOT_STEP_SLEEP if sleep is None else sleep
+    keep = settings.BOT_DB_SNAPSHOT_KEEP if keep is None else keep
+    max_restarts = settings.BOT_DB_SNAPSHOT_MAX_RESTARTS if max_restarts is None else max_restarts
+
+    connection = connections[using]
+    if connection.vendor != 'sqlite':
+        raise SnapshotError("Снимок через backup API возможен только для SQLite; для PostgreSQL используйте pg_dump.")
+
+    directory.mkdir(parents=True, exist_ok=True)
+    name = f"{SNAPSHOT_PREFIX}{timezone.now():%Y%m%d-%H%M%S}"
+    copy_path = directory / f".{name}.sqlite3"
+    temporary_path = directory / f".{name}{SNAPSHOT_SUFFIX}"
+    snapshot_path = directory / f"{name}{SNAPSHOT_SUFFIX}"
+
+    try:
+        progress = _copy(connection.settings_dict['NAME'], copy_path, pages, sleep, max_restarts)
+        with open(copy_path, 'rb') as copy, gzip.open(temporary_path, 'wb') as compressed:
+            shutil.copyfileobj(copy, compressed, length=1024 * 1024)
+        os.replace(temporary_path, snapshot_path)
+    finally:
+        copy_path.unlink(missing_ok=True)
+        temporary_path.unlink(missing_ok=True)
+
+    removed = apply_retention(directory, keep)
+    logger.info(
+        f"Снимок базы {snapshot_path.name}: {snapshot_path.stat().st_size} байт, шагов {progress.steps}, "
+        f"перезапусков {progress.restarts}, удалено старых {len(removed)}"
+    )
+    return snapshot_path
+
+
+def _copy(database, copy_path, pages, sleep, max_restarts):
+    # Отдельное соединение: соединение Django могло бы держать открытую транзакцию
+    source = sqlite3.connect(database)
+    target = sqlite3.connect(copy_path)
+    try:
+        progress = _Progress(max_restarts)
+        try:
+            source.backup(target, pages=pages, progress=progress, sleep=sleep)
+        except _RestartLimit:
+            # В режиме WAL чтение не мешает записи, так что копирование одним шагом никого не блокирует
+            logger.warning(
+                f"Копирование перезапускалось {progress.restarts} раз из-за записи, копируем одним шагом"
+            )
+            source.backup(target)
+
+        result = target.execute('PRAGMA integrity_check').fetchone()[0]
+        if result != 'ok':
+            raise SnapshotError(f"Копия базы не прошла integrity_check: {result}")
+    finally:
+        target.close()
+        source.close()
+    return progress
+
+
+def apply_retention(directory, keep):
+    """Оставляет keep последних снимков; имена сортируются по времени создания."""
+    snapshots = sorted(Path(directory).glob(f"{SNAPSHOT_PREFIX}*{SNAPSHOT_SUFFIX}"))
+    removed = snapshots[:-keep] if keep else []
+    for path in removed:
+        path.unlink()
+    return removed
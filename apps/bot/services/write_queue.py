@@ -0,0 +1,97 @@
+import logging
+import queue
+import threading
+import time
+from concurrent.futures import Future
+
+from django.conf import settings
+from django.db import close_old_connections, transaction
+
+logger = logging.getLogger(__name__)
+
+
+class WriteQueue:
+    """
+    Единственный поток-писатель для SQLite. Мелкие записи из разных обработчиков
+    собираются в пачку и выполняются в одной транзакции: вместо очереди потоков на
+    блокировке записи — одна фиксация на пачку. Если пачка не прошла, записи
+    повторяются по одной, поэтому ошибка в одной не отменяет остальные; ставить
+    в очередь стоит только повторяемые записи (save, update).
+    """
+
+    def __init__(self, batch_size=None, max_delay=None):
+        self.batch_size = batch_size or settings.BOT_SQLITE_WRITE_BATCH_SIZE
+        self.max_delay = settings.BOT_SQLITE_WRITE_MAX_DELAY if max_delay is None else max_delay
+        self._queue = queue.Queue()
+        self._thread = threading.Thread(target=self._run, name='sqlite-writer', daemon=True)
+        self._thread.start()
+
+    def submit(self, function, *args, **kwargs):
+        """Ставит запись в очередь; Future завершается после фиксации транзакции."""
+        future = Future()
+        self._queue.put((future, function, args, kwargs))
+        return future
+
+    def is_writer_thread(self):
+        return threading.current_thread() is self._thread
+
+    def _run(self):
+        while True:
+            batch = [self._queue.get()]
+            deadline = time.monotonic() + self.max_delay
+            while len(batch) < self.batch_size:
+                timeout = deadline - time.monotonic()
+                try:
+                    batch.append(self._queue.get(timeout=timeout) if timeout > 0 else self._queue.get_nowait())
+                except queue.Empty:
+                    break
+            close_old_connections()
+            self._execute(batch)
+
+    def _execute(self, batch):
+        try:
+            with transaction.atomic():
+                results = [function(*args, **kwargs) for _, function, args, kwargs in batch]
+        except Exception:
+            # Пачка откатилась целиком — повторяем записи по одной, чтобы ошибка досталась только своей
+            for future, function, args, kwargs in batch:
+                try:
+                    with transaction.atomic():
+                        future.set_result(function(*args, **kwargs))
+                except Exception as e:
+                    future.set_exception(e)
+            return
+
+        # Результаты отдаём только после фиксации: ожидающий поток сразу увидит свои данные
+        for (future, *_), result in zip(batch, results):
+            future.set_result(result)
+
+
+_write_queue = None
+_write_queue_lock = threading.Lock()
+
+
+def get_write_queue():
+    global _write_queue
+    if _write_queue is None:
+        with _write_queue_lock:
+            if _write_queue is None:
+                _write_queue = WriteQueue()
+    return _write_queue
+
+
+def run_write(function, *args, **kwargs):
+    """
+    Выполняет запись через поток-писатель, если он включён (BOT_SQLITE_WRITE_QUEUE)
+    и база — SQLite, и ждёт её фиксации. Внутри открытой транзакции запись выполняется сразу: эта
+    транзакция может уже держать блокировку, которую ждал бы писатель.
+    """
+    connection = transaction.get_connection()
+    if (
+        not settings.BOT_SQLITE_WRITE_QUEUE
+        or connection.vendor != 'sqlite'
+        or connection.in_atomic_block
+        or get_write_queue().is_writer_thread()
+    ):
+        return function(*args, **kwargs)
+    return get_write_queue().submit(function, *args, **kwargs).result()
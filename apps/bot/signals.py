@@ -0,0 +1,30 @@
+from django.conf import settings
+from django.db.backends.signals import connection_created
+from django.db.models.signals import post_delete, post_save
+from django.dispatch import receiver
+
+from apps.bot.models import Category, Order, Product
+from apps.bot.services.catalog import invalidate_catalog
+from apps.bot.services.order_service import forget_order_snapshots
+
+
+@receiver([post_save, post_delete], sender=Category)
+@receiver([post_save, post_delete], sender=Product)
+def catalog_changed(sender, **kwargs):
+    invalidate_catalog()
+
+
+@receiver(post_save, sender=Order)
+def order_saved(sender, instance, **kwargs):
+    # Заказ изменили вне оплаты (например, отменили в админке) — снимок для pre_checkout больше не верен
+    if instance.status != 'pending':
+        forget_order_snapshots([instance.id])
+
+
+@receiver(connection_created)
+def configure_sqlite(sender, connection, **kwargs):
+    if connection.vendor != 'sqlite':
+        return
+    # Напрямую через sqlite3, чтобы PRAGMA не попадали в счётчики запросов обработчиков
+    for name, value in settings.BOT_SQLITE_PRAGMAS.items():
+        connection.connection.execute(f'PRAGMA {name} = {value}')
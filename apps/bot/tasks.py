@@ -0,0 +1,207 @@
+import logging
+import os
+import time
+from datetime import timedelta
+
+from celery import Task, shared_task
+from django.conf import settings
+from django.db import connection, transaction
+from django.utils import timezone
+from requests.exceptions import RequestException
+
+from apps.bot.bot_initializer import get_bot
+from apps.bot.models import Client, Order
+from apps.bot.services import analytics, archive, search, snapshot
+from apps.bot.services.order_service import forget_order_snapshots, restore_cart_lines
+from apps.bot.utils.formatting import build_invoice, format_order_text
+from apps.bot.utils.tracing import current_context, query_span, span
+# Задачи должны быть привязаны к приложению проекта: dragontea/__init__ его больше не импортирует
+from dragontea.celery import app  # noqa: F401
+
+logger = logging.getLogger(__name__)
+
+
+class TracedTask(Task):
+    """Продолжает трассу обновления, из обработчика которого задача была поставлена в очередь."""
+
+    def __call__(self, *args, **kwargs):
+        context = self.request.get('trace_context') or (self.request.headers or {}).get('trace_context')
+        with span(f'celery.{self.name}', context=context), connection.execute_wrapper(query_span):
+            return super().__call__(*args, **kwargs)
+
+
+TELEGRAM_TASK_OPTIONS = {
+    'base': TracedTask,
+    'ignore_result': True,
+    'autoretry_for': (RequestException,),
+    'retry_backoff': True,
+    'max_retries': 3,
+}
+
+
+def enqueue(task, *args):
+    """Ставит задачу в очередь; если брокер недоступен, выполняет её в текущем процессе."""
+    headers = {'trace_context': current_context()}
+    try:
+        task.apply_async(args=args, headers=headers)
+    except Exception as e:
+        logger.warning(f"Не удалось поставить задачу {task.name} в очередь, выполняем сразу: {e}")
+        task.apply(args=args, headers=headers)
+
+
+@shared_task(**TELEGRAM_TASK_OPTIONS)
+def send_payment_invoice(order_id):
+    bot = get_bot()
+    order = Order.objects.select_related('client').get(id=order_id)
+    language_code = order.client.preferred_language
+    title, description, prices = build_invoice(order, language_code, order.cart_data_json or [])
+
+    bot.send_invoice(
+        chat_id=order.client.telegram_id,
+        title=title,
+        description=description,
+        provider_token=os.getenv('PAYMENT_PROVIDER_TOKEN'),
+        currency='UZS',
+        prices=prices,
+        start_parameter='payment',
+        invoice_payload=f"order_{order.id}"
+    )
+
+
+@shared_task(**TELEGRAM_TASK_OPTIONS)
+def send_order_to_group(order_id):
+    bot = get_bot()
+    order = Order.objects.select_related('client').get(id=order_id)
+    language_code = order.client.preferred_language or 'ru'
+    order_text, order_keyboard = format_order_text(order, language_code, order.cart_data_json or [], is_admin=True)
+
+    bot.send_message(
+        chat_id=int(os.getenv('GROUP_CHAT_ID')),
+        text=order_text,
+        reply_markup=order_keyboard,
+        parse_mode='HTML'
+    )
+
+
+@shared_task(**TELEGRAM_TASK_OPTIONS)
+def send_unmatched_payment_to_group(order_id, client_id, charge_id, total_amount, currency):
+    """Платёж прошёл, но заказ уже не ждал оплаты: администраторы восстанавливают заказ или возвращают деньги."""
+    bot = get_bot()
+    client = Client.objects.get(id=client_id)
+    status = Order.objects.filter(id=order_id).values_list('status', flat=True).first() if order_id else None
+
+    bot.send_message(
+        chat_id=int(os.getenv('GROUP_CHAT_ID')),
+        text=(
+            "⚠️ Оплата без заказа, ожидающего оплаты\n"
+            f"Заказ: №{order_id or '?'} ({status or 'не найден — возможно, удалён как неоплаченный'})\n"
+            f"Клиент: {client.name} (Telegram ID {client.telegram_id}, телефон {client.phone_number or '—'})\n"
+            # Telegram передаёт сумму в минимальных единицах валюты
+            f"Сумма: {total_amount / 100:,.0f} {currency}\n"
+            f"telegram_payment_charge_id: {charge_id}\n"
+            "Восстановите заказ или оформите возврат платежа."
+        )
+    )
+
+
+@shared_task(**TELEGRAM_TASK_OPTIONS)
+def send_order_update_to_client(order_id):
+    bot = get_bot()
+    order = Order.objects.select_related('client').get(id=order_id)
+    language_code = order.client.preferred_language or 'ru'
+
+    status_text = "Ваш заказ передан курьеру и доставляется!" if language_code == 'ru' else "Buyurtmangiz kuryerga berildi va yetkazilmoqda!"
+    bot.send_message(order.client.telegram_id, text=status_text)
+
+
+@shared_task(base=TracedTask)
+def delete_unpaid_orders(max_age_minutes=None, batch_size=None, restore_cart=None):
+    """Удаляет неоплаченные заказы старше заданного возраста пачками."""
+    if max_age_minutes is None:
+        max_age_minutes = settings.BOT_UNPAID_ORDER_MAX_AGE_MINUTES
+    if batch_size is None:
+        batch_size = settings.BOT_UNPAID_ORDER_BATCH_SIZE
+    if restore_cart is None:
+        restore_cart = settings.BOT_UNPAID_ORDER_RESTORE_CART
+
+    started_at = time.monotonic()
+    cutoff = timezone.now() - timedelta(minutes=max_age_minutes)
+    deleted = restored = batches = 0
+
+    while True:
+        with transaction.atomic():
+            # Диапазонный проход по индексу (status, created_at)
+            batch = list(
+                Order.objects
+                .filter(status='pending', created_at__lt=cutoff)
+                .order_by('created_at')
+                .values_list('id', 'client_id', 'cart_data_json')[:batch_size]
+            )
+            if not batch:
+                break
+
+            # Повторная проверка статуса: заказ мог быть оплачен, пока формировалась пачка.
+            # На PostgreSQL строки блокируются до конца транзакции и оплата ждёт удаления; на SQLite
+            # оплата, записанная после чтения пачки, не даст этой транзакции начать запись
+            order_ids = [order_id for order_id, _, _ in batch]
+            pending_ids = set(
+                Order.objects.select_for_update()
+                .filter(id__in=order_ids, status='pending')
+                .values_list('id', flat=True)
+            )
+            _, deleted_by_model = Order.objects.filter(id__in=pending_ids, status='pending').delete()
+            forget_order_snapshots(order_ids)
+
+            # Корзина возвращается только по действительно удалённым заказам
+            if restore_cart:
+                restored += restore_cart_lines(
+                    (client_id, cart_data) for order_id, client_id, cart_data in batch if order_id in pending_ids
+                )
+            deleted += deleted_by_model.get(Order._meta.label, 0)
+            batches += 1
+
+        if len(batch) < batch_size:
+            break
+
+    duration = time.monotonic() - started_at
+    logger.info(
+        f"Удалено неоплаченных заказов: {deleted}, восстановлено строк корзины: {restored}, "
+        f"пачек: {batches}, время: {duration:.3f} с"
+    )
+    return {'deleted': deleted, 'restored_cart_lines': restored, 'batches': batches, 'duration': duration}
+
+
+@shared_task(base=TracedTask, ignore_result=True)
+def roll_up_sales(batch_size=None):
+    """Дописывает в агрегаты продаж заказы, оформленные после прошлого запуска."""
+    started_at = time.monotonic()
+    processed = analytics.roll_up_sales(batch_size)
+    logger.info(f"Агрегаты продаж: учтено заказов {processed}, время: {time.monotonic() - started_at:.3f} с")
+    return processed
+
+
+@shared_task(base=TracedTask, ignore_result=True)
+def archive_orders(older_than_days=None, batch_size=None):
+    """Переносит старые завершённые заказы в архив."""
+    started_at = time.monotonic()
+    archived = archive.archive_orders(older_than_days, batch_size)
+    logger.info(f"Перенесено в архив заказов: {archived}, время: {time.monotonic() - started_at:.3f} с")
+    return archived
+
+
+@shared_task(base=TracedTask, ignore_result=True)
+def reindex_search():
+    """Переносит изменения клиентов и заказов из очереди в поисковый индекс SQLite."""
+    processed = search.reindex()
+    if processed:
+        logger.info(f"Поисковый индекс: обработано изменений {processed}")
+    return processed
+
+
+@shared_task(base=TracedTask, ignore_result=True)
+def snapshot_db():
+    """Снимок SQLite по расписанию; на PostgreSQL ничего не делает."""
+    if connection.vendor != 'sqlite':
+        logger.info("Снимки snapshot_db делаются только для SQLite, пропускаем")
+        return None
+    return str(snapshot.snapshot_database())
@@ -1,7 +1,13 @@
+from django.conf import settings
 from django.urls import path
-from apps.bot.webhook import webhook_conf
+from apps.bot.webhook import webhook_conf, metrics
 app_name = 'bot'
 
 urlpatterns = [
-    path('webhook/', webhook_conf.webhook, name='webhook'),
+    path(
+        'webhook/',
+        webhook_conf.async_webhook if settings.BOT_ASYNC_MODE else webhook_conf.webhook,
+        name='webhook'
+    ),
+    path('metrics/', metrics.metrics, name='metrics'),
 ]
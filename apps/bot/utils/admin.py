@@ -0,0 +1,131 @@
+import hashlib
+import re
+from collections import defaultdict
+
+from django.conf import settings
+from django.core.cache import cache
+from django.core.exceptions import EmptyResultSet
+from django.core.paginator import Paginator
+from django.db import connections
+from django.db.models import Q
+from django.utils.functional import cached_property
+
+# Наибольший id (BigAutoField): большее число драйвер БД не передаст в запрос — OverflowError
+MAX_ID = 2 ** 63 - 1
+
+
+class CachedCountPaginator(Paginator):
+    """
+    Пагинатор списков админки для больших таблиц. Без фильтров на PostgreSQL берёт оценку
+    числа строк из статистики (pg_class.reltuples), если она больше BOT_ADMIN_EXACT_COUNT_LIMIT;
+    остальные COUNT(*) кэшируются на BOT_ADMIN_COUNT_CACHE_TIMEOUT секунд по тексту запроса.
+    """
+
+    @cached_property
+    def count(self):
+        query = getattr(self.object_list, 'query', None)
+        if query is None:
+            return super().count
+
+        connection = connections[self.object_list.db]
+        if connection.vendor == 'postgresql' and not query.where:
+            estimate = _estimated_count(connection, self.object_list.model)
+            if estimate is not None and estimate > settings.BOT_ADMIN_EXACT_COUNT_LIMIT:
+                return estimate
+
+        try:
+            key = 'admin-count:' + hashlib.md5(str(query).encode()).hexdigest()
+        except EmptyResultSet:
+            # Заведомо пустой поиск (queryset.none()): Django посчитает ноль без запроса
+            return super().count
+        count = cache.get(key)
+        if count is None:
+            count = super().count
+            cache.set(key, count, settings.BOT_ADMIN_COUNT_CACHE_TIMEOUT)
+        return count
+
+
+def _estimated_count(connection, model):
+    with connection.cursor() as cursor:
+        cursor.execute("SELECT reltuples::bigint FROM pg_class WHERE oid = %s::regclass", [model._meta.db_table])
+        row = cursor.fetchone()
+    # До первого ANALYZE reltuples равен -1 (или 0 в старых версиях)
+    return row[0] if row and row[0] > 0 else None
+
+
+def phone_variants(term):
+    """Номер в том виде, в каком его хранит бот (+998...), из ввода с пробелами, скобками и без кода."""
+    digits = re.sub(r'\D', '', term)
+    if not digits:
+        return []
+    if len(digits) <= 9 and not digits.startswith('998'):
+        digits = '998' + digits
+    return [f'+{digits}', digits]
+
+
+def username_variants(term):
+    return [term.lstrip('@')]
+
+
+def name_variants(term):
+    return list(dict.fromkeys([term, term[:1].upper() + term[1:]]))
+
+
+def _prefix_range(field, prefix):
+    # field >= 'abc' AND field < 'abd' — тот же префиксный поиск, но по обычному B-tree индексу:
+    # LIKE 'abc%' без учёта регистра индекс не использует ни в SQLite, ни в PostgreSQL
+    upper = prefix[:-1] + chr(ord(prefix[-1]) + 1)
+    return Q(**{f'{field}__gte': prefix, f'{field}__lt': upper})
+
+
+class IndexedSearchMixin:
+    """
+    Поиск в админке только по индексам. В search_fields поля с '=' ищутся точным
+    совпадением, остальные — по префиксу; search_variants задаёт для поля нормализацию
+    ввода (телефон, @username). Поля связанной модели ('client__phone_number') ищутся
+    подзапросом client_id IN (...) — так условие через OR по двум таблицам не
+    превращается в полный просмотр соединения.
+    """
+    search_variants = {}
+
+    def get_search_results(self, request, queryset, search_term):
+        term = search_term.strip()
+        if not term:
+            return queryset, False
+
+        condition = Q()
+        related = defaultdict(Q)
+        for field in self.search_fields:
+            exact = field.startswith('=')
+            name = field.lstrip('=')
+            relation, _, related_name = name.rpartition('__')
+            values = self.search_variants.get(name, lambda value: [value])(term)
+            lookup = related_name if relation else name
+            model = self.model._meta.get_field(relation).related_model if relation else self.model
+
+            field_condition = Q()
+            for value in values:
+                if exact:
+                    try:
+                        value = model._meta.get_field(lookup).to_python(value)
+                    except Exception:
+                        continue
+                    if isinstance(value, int) and abs(value) > MAX_ID:
+                        continue
+                    field_condition |= Q(**{lookup: value})
+                elif value:
+                    field_condition |= _prefix_range(lookup, value)
+
+            if relation:
+                related[relation] |= field_condition
+            else:
+                condition |= field_condition
+
+        for relation, related_condition in related.items():
+            if related_condition:
+                model = self.model._meta.get_field(relation).related_model
+                condition |= Q(**{f'{relation}__in': model._default_manager.filter(related_condition).values('pk')})
+
+        if not condition:
+            return queryset.none(), False
+        return queryset.filter(condition), False
@@ -0,0 +1,199 @@
+from telebot.types import InlineKeyboardButton, InlineKeyboardMarkup, LabeledPrice
+
+
+def format_order_text(order, language_code, cart_data=None, is_admin=False):
+    status_display = {
+        'ru': {
+            'pending': 'Ожидание оплаты',
+            'in_progress': 'В процессе',
+            'delivering': 'Доставляется',
+            'completed': 'Завершён',
+            'canceled': 'Отменён',
+            'closed': 'Закрыт',
+        },
+        'uz': {
+            'pending': "To'lov kutilyapti",
+            'in_progress': 'Jarayonda',
+            'delivering': 'Yetkazilmoqda',
+            'completed': 'Yakunlangan',
+            'canceled': 'Bekor qilingan',
+            'closed': 'Yopilgan',
+        },
+    }
+
+    order_status = status_display.get(language_code, status_display['ru']).get(order.status, order.status)
+
+    if language_code == 'ru':
+        order_text = f"🧾 <b>Заказ №{order.id}</b>\n"
+        order_text += f"👤 <b>Клиент:</b> @{order.client.telegram_username or order.client.name}\n"
+        order_text += f"📞 <b>Телефон:</b> {order.client.phone_number}\n"
+        order_text += f"📦 <b>Статус:</b> #{order_status}\n"
+        order_text += f"""📍 <b>Адрес доставки:</b> GOOGLE MAPS: https://www.google.com/maps?q={order.delivery_address.replace(' ', '')}\n\n"""
+    else:
+        order_text = f"🧾 <b>Buyurtma №{order.id}</b>\n"
+        order_text += f"👤 <b>Mijoz:</b> @{order.client.telegram_username or order.client.name}\n"
+        order_text += f"📞 <b>Telefon:</b> {order.client.phone_number}\n"
+        order_text += f"📦 <b>Holati:</b> #{order_status}\n"
+        order_text += f"""📍 <b>Yetkazib berish manzili:</b> GOOGLE MAPS: https://www.google.com/maps?q={order.delivery_address.replace(' ', '')}\n\n"""
+
+    if cart_data:
+        order_text += "🛒 <b>Товары:</b>\n" if language_code == 'ru' else "🛒 <b>Mahsulotlar:</b>\n"
+
+        for item in cart_data:
+            product_title = item['product_title_ru'] if language_code == 'ru' else item['product_title_uz']
+            quantity = item['quantity']
+            unit_price = item['price']
+            total_price = quantity * unit_price
+
+            size_text = ""
+            if item.get('is_small'):
+                small_volume = item.get('small_volume') or ''
+                size_text = f"Маленький {small_volume} ml" if language_code == 'ru' else f"Kichik {small_volume} ml"
+            elif item.get('is_big'):
+                big_volume = item.get('big_volume') or ''
+                size_text = f"Большой {big_volume} ml" if language_code == 'ru' else f"Katta {big_volume} ml"
+
+            temp_text = ""
+            if item.get('is_hot'):
+                temp_text = "🔥 Горячий" if language_code == 'ru' else "🔥 Issiq"
+            elif item.get('is_cold'):
+                temp_text = "❄️ Холодный" if language_code == 'ru' else "❄️ Sovuq"
+
+            if language_code == 'ru':
+                order_text += f"• <b>{product_title}</b> ({size_text}, {temp_text})\n  {quantity}️⃣ ✖️ {unit_price:,.0f} = {total_price:,.0f} сум\n"
+            else:
+                order_text += f"• <b>{product_title}</b> ({size_text}, {temp_text})\n  {quantity}️⃣ ✖️ {unit_price:,.0f} = {total_price:,.0f} so‘m\n"
+
+    if language_code == 'ru':
+        order_text += f"\n📦 <b>Сумма товаров:</b>    {order.total_price - order.delivery_cost:,.0f} сум\n"
+        order_text += f"🚚 <b>Доставка:</b>    {order.delivery_cost:,.0f} сум\n"
+        order_text += f"💰 <b>Итого:</b>    {order.total_price:,.0f} сум"
+    else:
+        order_text += f"\n📦 <b>Mahsulotlar summasi:</b>    {order.total_price - order.delivery_cost:,.0f} so‘m\n"
+        order_text += f"🚚 <b>Yetkazib berish:</b>    {order.delivery_cost:,.0f} so‘m\n"
+        order_text += f"💰 <b>Jami:</b>    {order.total_price:,.0f} so‘m"
+
+    if is_admin:
+        order_keyboard = InlineKeyboardMarkup(row_width=2)
+        if order.status in ['pending', 'in_progress', 'delivering']:
+            assign_courier_button = InlineKeyboardButton(
+                "Передать курьеру" if language_code == 'ru' else "Kuryerga berish",
+                callback_data=f"assign_courier_{order.id}"
+            )
+            close_order_button = InlineKeyboardButton(
+                "Закрыть заказ" if language_code == 'ru' else "Buyurtmani yopish",
+                callback_data=f"close_order_{order.id}"
+            )
+            order_keyboard.add(assign_courier_button, close_order_button)
+        elif order.status == 'completed':
+            close_order_button = InlineKeyboardButton(
+                "Закрыть заказ" if language_code == 'ru' else "Buyurtmani yopish",
+                callback_data=f"close_order_{order.id}"
+            )
+            order_keyboard.add(close_order_button)
+        else:
+            order_keyboard = None
+
+        return order_text, order_keyboard
+    else:
+        return order_text, None
+
+
+def size_text(product, is_small, is_big, language_code):
+    if is_small:
+        return f"Маленький {product.small_volume}" if language_code == 'ru' else f"Kichik {product.small_volume}"
+    if is_big:
+        return f"Большой {product.big_volume}" if language_code == 'ru' else f"Katta {product.big_volume}"
+    return ""
+
+
+def temp_text(is_hot, is_cold, language_code):
+    if is_hot:
+        return "🔥 Горячий" if language_code == 'ru' else "🔥 Issiq"
+    if is_cold:
+        return "❄️ Холодный" if language_code == 'ru' else "❄️ Sovuq"
+    return ""
+
+
+def cart_item_price(item):
+    """Цена за единицу позиции корзины с учётом выбранного размера."""
+    if item.is_small:
+        return item.product.small_price or item.product.price
+    if item.is_big:
+        return item.product.big_price or item.product.price
+    return item.product.price or 0
+
+
+def format_cart_text(cart_items, language_code):
+    currency = 'сум' if language_code == 'ru' else 'so‘m'
+    lines = ["🛒 Ваша корзина:" if language_code == 'ru' else "🛒 Savatingiz:"]
+    total_price = 0
+
+    for item in cart_items:
+        price = cart_item_price(item) * item.quantity
+        total_price += price
+        product = item.product
+        product_title = product.title_ru if language_code == 'ru' else product.title_uz
+        lines.append(
+            f"{product_title} ({size_text(product, item.is_small, item.is_big, language_code)}, "
+            f"{temp_text(item.is_hot, item.is_cold, language_code)}) x {item.quantity} = {price:,} {currency}"
+        )
+
+    total_text = "Итого" if language_code == 'ru' else "Jami"
+    return '\n'.join(lines) + f"\n\n{total_text}: {total_price:,} {currency}"
+
+
+def format_product_caption(product, language_code, quantity, is_small, is_big, is_hot, is_cold):
+    size = size_text(product, is_small, is_big, language_code)
+    temperature = temp_text(is_hot, is_cold, language_code)
+    currency = 'сум' if language_code == 'ru' else 'so‘m'
+
+    unit_price = product.get_price(is_small=is_small, is_big=is_big) or product.price
+    total_price = unit_price * quantity
+
+    return (
+        f"🛍️ <b>{product.title_ru if language_code == 'ru' else product.title_uz}</b>\n"
+        f"💵 <b>{'Цена за единицу' if language_code == 'ru' else 'Bir dona narxi'}:</b> {unit_price:,} {currency}\n"
+        + (f"<b>Размер:</b> {size}\n" if size else "")
+        + (f"<b>Температура:</b> {temperature}\n" if temperature else "")
+        + f"📦 <b>{'Количество' if language_code == 'ru' else 'Miqdori'}:</b> {quantity}\n"
+        f"💰 <b>{'Общая стоимость' if language_code == 'ru' else 'Umumiy narxi'}:</b> {total_price:,} {currency}"
+    )
+
+
+def build_invoice(order, language_code, cart_data):
+    """Заголовок, описание и цены счёта для send_invoice."""
+    delivery_cost = order.delivery_cost
+    products_cost = order.total_price - delivery_cost
+
+    product_lines = []
+    for item in cart_data:
+        product_title = item['product_title_ru'] if language_code == 'ru' else item['product_title_uz']
+        line = f"{product_title} x {item['quantity']} - {item['price'] * item['quantity']} {'сум' if language_code == 'ru' else 'so‘m'}"
+        product_lines.append(line)
+    products_details = '\n'.join(product_lines)
+
+    if language_code == 'uz':
+        title = "Buyurtma uchun to'lov"
+        description = (
+            f"Sizning buyurtmangiz summasi {order.total_price} so'm\n"
+            f"Mahsulotlar:\n{products_details}\n"
+            f"Yetkazib berish: {delivery_cost} so'm"
+        )
+        price_label_products = 'Mahsulotlar'
+        price_label_delivery = 'Yetkazib berish'
+    else:
+        title = "Оплата заказа"
+        description = (
+            f"Ваш заказ на сумму {order.total_price} сум\n"
+            f"Товары:\n{products_details}\n"
+            f"Доставка: {delivery_cost} сум"
+        )
+        price_label_products = 'Товары'
+        price_label_delivery = 'Доставка'
+
+    prices = [
+        LabeledPrice(label=price_label_products, amount=int(products_cost * 100)),
+        LabeledPrice(label=price_label_delivery, amount=int(delivery_cost * 100))
+    ]
+    return title, description, prices
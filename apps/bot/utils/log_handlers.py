@@ -0,0 +1,95 @@
+import atexit
+import copy
+import itertools
+import json
+import logging
+import logging.handlers
+import queue
+import sys
+from datetime import datetime, timezone
+
+from apps.bot.utils.metrics import counter
+
+CONTEXT_FIELDS = ('update_id', 'chat_id', 'handler', 'trace_id')
+
+records_dropped = counter('bot_log_records_dropped_total', 'Записи журнала, отброшенные из-за переполнения очереди')
+
+
+class JsonFormatter(logging.Formatter):
+    """Одна запись — одна строка JSON с контекстом обновления."""
+
+    def format(self, record):
+        data = {
+            'time': datetime.fromtimestamp(record.created, timezone.utc).isoformat(timespec='milliseconds'),
+            'level': record.levelname,
+            'logger': record.name,
+            'message': record.getMessage(),
+            'module': f'{record.filename}:{record.lineno}',
+            'thread': record.threadName,
+        }
+        for field in CONTEXT_FIELDS:
+            value = getattr(record, field, None)
+            if value is not None:
+                data[field] = value
+        if record.exc_info:
+            data['exception'] = self.formatException(record.exc_info)
+        elif record.exc_text:
+            data['exception'] = record.exc_text
+        return json.dumps(data, ensure_ascii=False, default=str)
+
+
+class SamplingFilter(logging.Filter):
+    """Пропускает только каждую N-ю INFO-запись (и ниже) от перечисленных логгеров."""
+
+    def __init__(self, rate=10, loggers=()):
+        super().__init__()
+        self.rate = max(1, rate)
+        self.loggers = tuple(loggers)
+        self._counter = itertools.count()
+
+    def filter(self, record):
+        if record.levelno > logging.INFO or not record.name.startswith(self.loggers):
+            return True
+        return next(self._counter) % self.rate == 0
+
+
+class NonBlockingHandler(logging.handlers.QueueHandler):
+    """
+    Кладёт записи в очередь, а пишет их в файл и в консоль отдельный поток
+    QueueListener. Поток обработки обновления не ждёт диска; при переполнении
+    очереди запись отбрасывается.
+    """
+
+    def __init__(self, filename, maxBytes=10 * 1024 * 1024, backupCount=5, console=True, queue_size=10000):
+        super().__init__(queue.Queue(maxsize=queue_size))
+        file_handler = logging.handlers.RotatingFileHandler(
+            filename, maxBytes=maxBytes, backupCount=backupCount, encoding='utf-8'
+        )
+        file_handler.setFormatter(JsonFormatter())
+        handlers = [file_handler]
+        if console:
+            console_handler = logging.StreamHandler(sys.stderr)
+            console_handler.setFormatter(logging.Formatter('%(asctime)s [%(levelname)s] %(name)s: %(message)s'))
+            handlers.append(console_handler)
+
+        self.listener = logging.handlers.QueueListener(self.queue, *handlers, respect_handler_level=True)
+        self.listener.start()
+        atexit.register(self.listener.stop)
+
+    def prepare(self, record):
+        # Форматирование JSON выполняется в потоке слушателя; здесь только
+        # фиксируем текст сообщения и исключения, пока аргументы ещё актуальны
+        record = copy.copy(record)
+        record.message = record.getMessage()
+        record.msg = record.message
+        record.args = None
+        if record.exc_info:
+            record.exc_text = logging.Formatter().formatException(record.exc_info)
+            record.exc_info = None
+        return record
+
+    def enqueue(self, record):
+        try:
+            self.queue.put_nowait(record)
+        except queue.Full:
+            records_dropped.inc()
@@ -0,0 +1,114 @@
+import bisect
+import threading
+from collections import defaultdict
+
+_lock = threading.Lock()
+_metrics = {}
+
+DEFAULT_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+COUNT_BUCKETS = (0, 1, 2, 3, 5, 8, 13, 21, 34, 55)
+
+
+def _label_key(labelnames, labels):
+    return tuple(str(labels.get(name, '')) for name in labelnames)
+
+
+def _escape(value):
+    return str(value).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+
+
+def _format_labels(labelnames, key, extra=()):
+    pairs = list(zip(labelnames, key)) + list(extra)
+    if not pairs:
+        return ''
+    return '{' + ','.join(f'{name}="{_escape(value)}"' for name, value in pairs) + '}'
+
+
+class Counter:
+    type_name = 'counter'
+
+    def __init__(self, name, documentation, labelnames=()):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self._values = defaultdict(float)
+
+    @property
+    def value(self):
+        with _lock:
+            return sum(self._values.values())
+
+    def inc(self, amount=1, **labels):
+        key = _label_key(self.labelnames, labels)
+        with _lock:
+            self._values[key] += amount
+
+    def samples(self):
+        for key, value in sorted(self._values.items()):
+            yield f'{self.name}{_format_labels(self.labelnames, key)} {value:g}'
+
+
+class Histogram:
+    type_name = 'histogram'
+
+    def __init__(self, name, documentation, labelnames=(), buckets=DEFAULT_BUCKETS):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self.buckets = tuple(buckets)
+        # Для каждого набора меток: счётчики по корзинам (+Inf последней), сумма и количество
+        self._values = {}
+
+    def observe(self, value, **labels):
+        key = _label_key(self.labelnames, labels)
+        index = bisect.bisect_left(self.buckets, value)
+        with _lock:
+            state = self._values.get(key)
+            if state is None:
+                state = self._values[key] = [[0] * (len(self.buckets) + 1), 0.0, 0]
+            state[0][index] += 1
+            state[1] += value
+            state[2] += 1
+
+    def samples(self):
+        for key, (bucket_counts, total, count) in sorted(self._values.items()):
+            cumulative = 0
+            for bound, bucket_count in zip(self.buckets + ('+Inf',), bucket_counts):
+                cumulative += bucket_count
+                labels = _format_labels(self.labelnames, key, [('le', bound if bound == '+Inf' else f'{bound:g}')])
+                yield f'{self.name}_bucket{labels} {cumulative}'
+            yield f'{self.name}_sum{_format_labels(self.labelnames, key)} {total:g}'
+            yield f'{self.name}_count{_format_labels(self.labelnames, key)} {count}'
+
+
+def _get_or_create(metric_class, name, *args, **kwargs):
+    with _lock:
+        if name not in _metrics:
+            _metrics[name] = metric_class(name, *args, **kwargs)
+        return _metrics[name]
+
+
+def counter(name, documentation='', labelnames=()):
+    """Возвращает счётчик процесса с указанным именем, создавая его при первом обращении."""
+    return _get_or_create(Counter, name, documentation, labelnames)
+
+
+def histogram(name, documentation='', labelnames=(), buckets=DEFAULT_BUCKETS):
+    return _get_or_create(Histogram, name, documentation, labelnames, buckets)
+
+
+def snapshot():
+    with _lock:
+        metrics = list(_metrics.values())
+    return {metric.name: metric.value for metric in metrics if isinstance(metric, Counter)}
+
+
+def render():
+    """Текст метрик в формате Prometheus."""
+    lines = []
+    with _lock:
+        for name, metric in sorted(_metrics.items()):
+            lines.append(f'# HELP {name} {metric.documentation}')
+            lines.append(f'# TYPE {name} {metric.type_name}')
+            lines.extend(metric.samples())
+    return '\n'.join(lines) + '\n'
@@ -0,0 +1,238 @@
+import atexit
+import functools
+import json
+import logging
+import queue
+import random
+import secrets
+import threading
+import time
+from contextlib import contextmanager
+from pathlib import Path
+
+from django.conf import settings
+from django.db import connection
+
+logger = logging.getLogger(__name__)
+
+_local = threading.local()
+
+
+class Span:
+    __slots__ = ('trace_id', 'span_id', 'parent_span_id', 'name', 'start_time', 'end_time', 'attributes', 'status')
+
+    def __init__(self, name, trace_id, parent_span_id=None, attributes=None):
+        self.trace_id = trace_id
+        self.span_id = secrets.token_hex(8)
+        self.parent_span_id = parent_span_id
+        self.name = name
+        self.start_time = time.time_ns()
+        self.end_time = None
+        self.attributes = attributes or {}
+        self.status = 'ok'
+
+    def context(self):
+        return {'trace_id': self.trace_id, 'parent_span_id': self.span_id}
+
+    def as_dict(self):
+        return {
+            'trace_id': self.trace_id,
+            'span_id': self.span_id,
+            'parent_span_id': self.parent_span_id,
+            'name': self.name,
+            'start_time': self.start_time,
+            'end_time': self.end_time,
+            'duration_ms': (self.end_time - self.start_time) / 1_000_000,
+            'attributes': self.attributes,
+            'status': self.status,
+        }
+
+
+class SpanExporter:
+    """
+    Отправляет завершённые спаны из фонового потока, чтобы запись не задерживала
+    обработку обновлений. Поддерживает JSONL-файл и OTLP/HTTP (JSON) коллектор.
+    """
+
+    def __init__(self, jsonl_path=None, otlp_endpoint=None, batch_size=100, flush_interval=1.0):
+        self.jsonl_path = Path(jsonl_path) if jsonl_path else None
+        self.otlp_endpoint = otlp_endpoint
+        self.batch_size = batch_size
+        self.flush_interval = flush_interval
+        self._queue = queue.Queue(maxsize=10000)
+        self._thread = threading.Thread(target=self._run, name='span-exporter', daemon=True)
+        self._thread.start()
+        atexit.register(self.flush)
+
+    def export(self, span):
+        try:
+            self._queue.put_nowait(span)
+        except queue.Full:
+            # Лучше потерять спан, чем блокировать обработку
+            pass
+
+    def _run(self):
+        while True:
+            batch = [self._queue.get()]
+            deadline = time.monotonic() + self.flush_interval
+            while len(batch) < self.batch_size:
+                timeout = deadline - time.monotonic()
+                if timeout <= 0:
+                    break
+                try:
+                    batch.append(self._queue.get(timeout=timeout))
+                except queue.Empty:
+                    break
+            self._write(batch)
+
+    def flush(self):
+        batch = []
+        while True:
+            try:
+                batch.append(self._queue.get_nowait())
+            except queue.Empty:
+                break
+        if batch:
+            self._write(batch)
+
+    def _write(self, batch):
+        try:
+            if self.jsonl_path:
+                self.jsonl_path.parent.mkdir(parents=True, exist_ok=True)
+                with self.jsonl_path.open('a', encoding='utf-8') as f:
+                    for span in batch:
+                        f.write(json.dumps(span.as_dict(), ensure_ascii=False, default=str) + '\n')
+            if self.otlp_endpoint:
+                import requests
+
+                requests.post(self.otlp_endpoint, json=_otlp_payload(batch), timeout=5)
+        except Exception as e:
+            logger.error(f"Не удалось экспортировать {len(batch)} спанов: {e}")
+
+
+def _otlp_payload(batch):
+    def attribute(key, value):
+        if isinstance(value, bool):
+            return {'key': key, 'value': {'boolValue': value}}
+        if isinstance(value, int):
+            return {'key': key, 'value': {'intValue': str(value)}}
+        if isinstance(value, float):
+            return {'key': key, 'value': {'doubleValue': value}}
+        return {'key': key, 'value': {'stringValue': str(value)}}
+
+    return {
+        'resourceSpans': [{
+            'resource': {'attributes': [attribute('service.name', 'dragontea-bot')]},
+            'scopeSpans': [{
+                'scope': {'name': 'apps.bot.utils.tracing'},
+                'spans': [
+                    {
+                        'traceId': span.trace_id,
+                        'spanId': span.span_id,
+                        'parentSpanId': span.parent_span_id or '',
+                        'name': span.name,
+                        'kind': 1,
+                        'startTimeUnixNano': str(span.start_time),
+                        'endTimeUnixNano': str(span.end_time),
+                        'attributes': [attribute(key, value) for key, value in span.attributes.items()],
+                        'status': {'code': 1 if span.status == 'ok' else 2},
+                    }
+                    for span in batch
+                ],
+            }],
+        }],
+    }
+
+
+_exporter = None
+_exporter_lock = threading.Lock()
+
+
+def get_exporter():
+    global _exporter
+    if _exporter is None:
+        with _exporter_lock:
+            if _exporter is None:
+                _exporter = SpanExporter(
+                    jsonl_path=settings.BOT_TRACING_JSONL_PATH,
+                    otlp_endpoint=settings.BOT_TRACING_OTLP_ENDPOINT
+                )
+    return _exporter
+
+
+def is_enabled():
+    return settings.BOT_TRACING_ENABLED
+
+
+def current_span():
+    return getattr(_local, 'span', None)
+
+
+def current_context():
+    """Контекст текущего спана для передачи в другой поток или задачу Celery."""
+    span = current_span()
+    return span.context() if span is not None else None
+
+
+def new_trace_context():
+    if not is_enabled() or random.random() >= settings.BOT_TRACING_SAMPLE_RATE:
+        return None
+    return {'trace_id': secrets.token_hex(16), 'parent_span_id': None}
+
+
+@contextmanager
+def span(name, context=None, **attributes):
+    """
+    Открывает спан — дочерний для текущего спана потока или для переданного контекста.
+    Если трассировка не ведётся, ничего не делает.
+    """
+    parent = current_span()
+    if context is None and parent is not None:
+        context = parent.context()
+    if context is None:
+        yield None
+        return
+
+    new_span = Span(name, context['trace_id'], context.get('parent_span_id'), attributes)
+    _local.span = new_span
+    try:
+        yield new_span
+    except Exception as e:
+        new_span.status = 'error'
+        new_span.attributes['error'] = repr(e)
+        raise
+    finally:
+        new_span.end_time = time.time_ns()
+        _local.span = parent
+        get_exporter().export(new_span)
+
+
+def attach_context(obj, context):
+    """Прикрепляет контекст трассировки к объекту обновления, который попадёт в обработчик."""
+    if obj is not None and context is not None:
+        obj._trace_context = context
+
+
+def query_span(execute, sql, params, many, context):
+    """execute_wrapper соединения Django: каждый запрос — отдельный спан."""
+    parent = current_span()
+    # Вложенные обёртки (задача Celery, выполненная внутри обработчика) не должны дублировать спан
+    if parent is None or parent.name == 'db.query':
+        return execute(sql, params, many, context)
+    with span('db.query', **{'db.statement': sql}):
+        return execute(sql, params, many, context)
+
+
+def trace_handler(function):
+    """Спан обработчика с дочерними спанами запросов к БД; контекст берётся из обновления."""
+    name = function.__name__
+
+    @functools.wraps(function)
+    def wrapper(*args, **kwargs):
+        context = getattr(args[0], '_trace_context', None) if args else None
+        if context is None:
+            return function(*args, **kwargs)
+        with span(f'handler.{name}', context=context), connection.execute_wrapper(query_span):
+            return function(*args, **kwargs)
+
+    return wrapper
@@ -1,33 +1,55 @@
-import os
-import json
 import logging
-import requests
-import pytz
-from datetime import datetime, time, timedelta
-from geopy.distance import geodesic
-from telebot.types import LabeledPrice, ReplyKeyboardRemove
-from telebot import TeleBot, types
-from dotenv import load_dotenv
+from datetime import datetime, time
+from zoneinfo import ZoneInfo
+from telebot import types
+from django.db import transaction
 from telebot.types import (
     InlineKeyboardMarkup,
     InlineKeyboardButton,
     ReplyKeyboardMarkup,
     KeyboardButton
 )
-from apps.bot.models import Client, Category, Product, Cart, Order
+from apps.bot.bot_initializer import get_bot
+from apps.bot.keyboards import inline as inline_keyboards
+from apps.bot.keyboards.reply import main_menu_keyboard
+from apps.bot.middlewares.instrumentation import instrument_bot
+from apps.bot.models import ArchivedOrder, Client, Product, Cart, Order, OrderItem
+from apps.bot.services.catalog import (
+    get_categories,
+    get_product_photo_id,
+    get_products,
+    remember_product_photo_id,
+)
+from apps.bot.services.navigation import ScreenNavigator
+from apps.bot.services.order_service import (
+    CART_VARIANT_FIELDS,
+    apply_default_variants,
+    build_order_items,
+    cache_order_snapshot,
+    finalize_payment,
+    parse_invoice_payload,
+    transition_order,
+    upsert_cart_line,
+    validate_pre_checkout,
+)
+from apps.bot.services.write_queue import run_write
+from apps.bot.utils.formatting import format_cart_text, format_order_text, format_product_caption
 
 logger = logging.getLogger(__name__)
-logging.basicConfig(level=logging.INFO)
 
-load_dotenv()
+MY_ORDERS_LIMIT = 4
 
 class TelegramBot:
     def __init__(self):
-        self.bot = TeleBot(os.getenv('TELEGRAM_BOT_TOKEN'))
-        self.bot.remove_webhook()
+        self.bot = get_bot()
+        # Обработчик выполняется в потоке вызывающего (запрос вебхука, поток runbot):
+        # во внутреннем пуле telebot его исключение не дошло бы до process_update
+        self.bot.threaded = False
+        self.navigator = ScreenNavigator(self.bot)
         self.user_data = {}
         self.admin_data = {}
         self.register_handlers()
+        instrument_bot(self.bot)
 
     def register_handlers(self):
         @self.bot.message_handler(commands=['start'])
@@ -83,6 +105,7 @@ class TelegramBot:
                 client = Client.objects.get(telegram_id=chat_id)
                 client.phone_number = message.contact.phone_number
                 client.save()
+                self.navigator.reset_reply_keyboard(chat_id)
                 self.bot.send_message(
                     chat_id=chat_id,
                     text="Telefon raqamingiz muvaffaqiyatli saqlandi. Rahmat!" if client.preferred_language == 'uz' else "Ваш номер телефона успешно сохранён. Спасибо!",
@@ -106,7 +129,7 @@ class TelegramBot:
             chat_id = call.message.chat.id
             client = Client.objects.get(telegram_id=chat_id)
             category_id = call.data.split("_")[1]
-            self.send_products(chat_id, category_id, client.preferred_language)
+            self.send_products(chat_id, category_id, client.preferred_language, message=call.message)
             self.bot.answer_callback_query(call.id)
 
         @self.bot.callback_query_handler(func=lambda call: call.data.startswith("product_"))
@@ -134,15 +157,7 @@ class TelegramBot:
 
                 # CHANGED: Если нет параметров, сразу создаём новую запись в корзине.
                 if not size_options and not temp_options:
-                    cart_item = Cart.objects.create(  # CHANGED
-                        client=client,
-                        product=product,
-                        is_small=False,
-                        is_big=False,
-                        is_hot=False,
-                        is_cold=False,
-                        quantity=0
-                    )
+                    cart_item = upsert_cart_line(client, product)
                     self.send_product_details(
                         chat_id, client, product, cart_item.quantity,
                         is_small=False, is_big=False, is_hot=False, is_cold=False,
@@ -230,14 +245,10 @@ class TelegramBot:
                     )
                 else:
                     # Если температуры выбирать не нужно, сразу создаём товар в корзине
-                    cart_item = Cart.objects.create( # CHANGED
-                        client=client,
-                        product=product,
+                    cart_item = upsert_cart_line(
+                        client, product,
                         is_small=self.user_data[chat_id]['is_small'],
-                        is_big=self.user_data[chat_id]['is_big'],
-                        is_hot=False,
-                        is_cold=False,
-                        quantity=0
+                        is_big=self.user_data[chat_id]['is_big']
                     )
 
                     self.send_product_details(
@@ -276,14 +287,12 @@ class TelegramBot:
                 self.user_data[chat_id]['is_cold'] = is_cold
 
                 # Создаём товар в корзине
-                cart_item = Cart.objects.create( # CHANGED
-                    client=client,
-                    product=product,
+                cart_item = upsert_cart_line(
+                    client, product,
                     is_small=self.user_data[chat_id]['is_small'],
                     is_big=self.user_data[chat_id]['is_big'],
                     is_hot=self.user_data[chat_id]['is_hot'],
-                    is_cold=self.user_data[chat_id]['is_cold'],
-                    quantity=0
+                    is_cold=self.user_data[chat_id]['is_cold']
                 )
 
                 # Показываем детали продукта
@@ -316,14 +325,14 @@ class TelegramBot:
                 action = data[0]
                 cart_item_id = int(data[1])
 
-                cart_item = Cart.objects.get(id=cart_item_id, client=client)
+                cart_item = Cart.objects.select_related('product').get(id=cart_item_id, client=client)
 
                 if action == "increase":
                     cart_item.quantity += 1
                 elif action == "decrease":
                     cart_item.quantity = max(0, cart_item.quantity - 1)
 
-                cart_item.save()
+                run_write(cart_item.save, update_fields=['quantity'])
 
                 quantity = cart_item.quantity
 
@@ -366,23 +375,7 @@ class TelegramBot:
                 )
                 return
 
-            self.show_cart(chat_id, client)
-            self.bot.answer_callback_query(call.id)
-
-        @self.bot.callback_query_handler(func=lambda call: call.data == "view_cart")
-        def view_cart(call):
-            chat_id = call.message.chat.id
-            try:
-                client = Client.objects.get(telegram_id=chat_id)
-            except Client.DoesNotExist:
-                self.bot.answer_callback_query(
-                    call.id,
-                    text="Клиент не найден",
-                    show_alert=True
-                )
-                return
-
-            self.show_cart(chat_id, client)
+            self.show_cart(chat_id, client, message=call.message)
             self.bot.answer_callback_query(call.id)
 
         @self.bot.callback_query_handler(func=lambda call: call.data == "checkout")
@@ -398,7 +391,7 @@ class TelegramBot:
                 )
                 return
 
-            uzbekistan_tz = pytz.timezone('Asia/Tashkent')
+            uzbekistan_tz = ZoneInfo('Asia/Tashkent')
             current_time = datetime.now(uzbekistan_tz).time()
             start_time = time(6, 0, 0)
             end_time = time(1, 0, 0)
@@ -412,6 +405,7 @@ class TelegramBot:
                 return
             self.bot.answer_callback_query(call.id)
 
+            self.navigator.reset_reply_keyboard(chat_id)
             location_keyboard = ReplyKeyboardMarkup(resize_keyboard=True, one_time_keyboard=True)
             location_button = KeyboardButton(
                 text="📍 Отправить местоположение" if client.preferred_language == 'ru' else "📍 Joylashuvni yuborish",
@@ -433,7 +427,7 @@ class TelegramBot:
                 self.bot.send_message(chat_id=chat_id, text="Пожалуйста, начните с команды /start.")
                 return
 
-            cart_items = Cart.objects.filter(client=client, quantity__gt=0)
+            cart_items = Cart.objects.filter(client=client, quantity__gt=0).select_related('product')
             if not cart_items.exists():
                 self.bot.send_message(
                     chat_id=chat_id,
@@ -452,6 +446,7 @@ class TelegramBot:
                 price = unit_price * item.quantity
                 total_price += price
                 cart_data.append({
+                    'product_id': item.product_id,
                     'product_title_ru': item.product.title_ru,
                     'product_title_uz': item.product.title_uz,
                     'quantity': item.quantity,
@@ -464,14 +459,16 @@ class TelegramBot:
                     'big_volume': item.product.big_volume,
                 })
 
-            order = Order.objects.create(
-                client=client,
-                total_price=total_price,
-                status='pending',
-                cart_data_json=cart_data
-            )
-
-            cart_items.delete()
+            # Заказ, его позиции и очистка корзины — одна транзакция
+            with transaction.atomic():
+                order = Order.objects.create(
+                    client=client,
+                    total_price=total_price,
+                    status='pending',
+                    cart_data_json=cart_data
+                )
+                OrderItem.objects.bulk_create(build_order_items(order, cart_data))
+                cart_items.delete()
 
             order.latitude = user_latitude
             order.longitude = user_longitude
@@ -481,6 +478,9 @@ class TelegramBot:
 
             client_location = (user_latitude, user_longitude)
             cafe_location = (cafe_latitude, cafe_longitude)
+            # geopy (и aiohttp, который он подтягивает) нужен только при оформлении заказа
+            from geopy.distance import geodesic
+
             distance_km = geodesic(client_location, cafe_location).km
 
             delivery_rate_per_km = 3800
@@ -520,27 +520,45 @@ class TelegramBot:
             chat_id = message.chat.id
             try:
                 client = Client.objects.get(telegram_id=chat_id)
-                orders = Order.objects.filter(client=client).order_by('-id')[:4]
+                orders = list(Order.objects.filter(client=client).select_related('client').order_by('-id')[:MY_ORDERS_LIMIT])
 
-                if not orders.exists():
+                # Сами архивные заказы читаются только по кнопке, здесь — лишь проверка по индексу
+                has_archive = ArchivedOrder.objects.filter(client=client).exists()
+                if not orders and not has_archive:
                     self.bot.send_message(
                         chat_id=chat_id,
                         text="У вас нет заказов." if client.preferred_language == 'ru' else "Sizda buyurtmalar yo'q."
                     )
                     return
-                for order in orders:
-                    cart_data = order.cart_data_json if order.cart_data_json else None
-
-                    order_text, order_keyboard = self.format_order_text(order, client.preferred_language, cart_data)
+                self.send_orders(chat_id, client, orders)
+                if has_archive:
                     self.bot.send_message(
                         chat_id=chat_id,
-                        text=order_text,
-                        reply_markup=order_keyboard,
-                        parse_mode='HTML'
+                        text="Более ранние заказы — в архиве." if client.preferred_language == 'ru' else "Oldingi buyurtmalar arxivda.",
+                        reply_markup=inline_keyboards.archived_orders_keyboard(client.preferred_language)
                     )
             except Client.DoesNotExist:
                 self.bot.send_message(chat_id=chat_id, text="Пожалуйста, начните с команды /start.")
 
+        @self.bot.callback_query_handler(func=lambda call: call.data == "archived_orders")
+        def handle_archived_orders(call):
+            chat_id = call.message.chat.id
+            try:
+                client = Client.objects.get(telegram_id=chat_id)
+            except Client.DoesNotExist:
+                self.bot.answer_callback_query(call.id)
+                self.bot.send_message(chat_id=chat_id, text="Пожалуйста, начните с команды /start.")
+                return
+
+            self.bot.answer_callback_query(call.id)
+            archived_orders = ArchivedOrder.objects.filter(client=client).order_by('-created_at')[:MY_ORDERS_LIMIT]
+            orders = []
+            for archived in archived_orders:
+                order = archived.to_order()
+                order.client = client
+                orders.append(order)
+            self.send_orders(chat_id, client, orders)
+
         @self.bot.callback_query_handler(func=lambda call: call.data == "clear_cart")
         def clear_cart(call):
             chat_id = call.message.chat.id
@@ -582,7 +600,7 @@ class TelegramBot:
                 client = Client.objects.get(telegram_id=chat_id)
                 language_code = client.preferred_language or 'ru'
 
-                self.send_products(chat_id, category_id, language_code)
+                self.send_products(chat_id, category_id, language_code, message=call.message)
                 self.bot.answer_callback_query(call.id)
 
             except Client.DoesNotExist:
@@ -603,14 +621,14 @@ class TelegramBot:
         def handle_back_to_categories(call):
             chat_id = call.message.chat.id
             client = Client.objects.get(telegram_id=chat_id)
-            self.send_categories(chat_id, client.preferred_language)
+            self.send_categories(chat_id, client.preferred_language, message=call.message)
             self.bot.answer_callback_query(call.id)
 
         @self.bot.callback_query_handler(func=lambda call: call.data == "back_to_main")
         def handle_back_to_main(call):
             chat_id = call.message.chat.id
             client = Client.objects.get(telegram_id=chat_id)
-            self.send_main_menu(chat_id, client.preferred_language)
+            self.send_main_menu(chat_id, client.preferred_language, message=call.message)
             self.bot.answer_callback_query(call.id)
 
         @self.bot.message_handler(func=lambda message: message.text.startswith("🚚 Ваш заказ") or message.text.startswith("🚚 Buyurtma"))
@@ -628,7 +646,7 @@ class TelegramBot:
                     return
 
                 cart_data = order.cart_data_json if order.cart_data_json else []
-                order_text, _ = self.format_order_text(order, client.preferred_language, cart_data)
+                order_text, _ = format_order_text(order, client.preferred_language, cart_data)
 
                 if order.courier_name and order.car_number and order.car_model:
                     courier_info = (
@@ -655,7 +673,12 @@ class TelegramBot:
 
         @self.bot.pre_checkout_query_handler(func=lambda query: True)
         def checkout_handler(pre_checkout_query):
-            self.bot.answer_pre_checkout_query(pre_checkout_query.id, ok=True)
+            # Telegram ждёт ответ не дольше 10 секунд — проверяем по снимку заказа из кэша
+            error_message = validate_pre_checkout(pre_checkout_query)
+            if error_message:
+                self.bot.answer_pre_checkout_query(pre_checkout_query.id, ok=False, error_message=error_message)
+            else:
+                self.bot.answer_pre_checkout_query(pre_checkout_query.id, ok=True)
 
         @self.bot.callback_query_handler(func=lambda call: call.data.startswith("assign_courier_"))
         def handle_assign_courier(call):
@@ -680,16 +703,24 @@ class TelegramBot:
                 self.bot.send_message(chat_id=chat_id, text="Пожалуйста, начните с команды /start.")
                 return
 
-            order_payload = message.successful_payment.invoice_payload
-            try:
-                order_id = int(order_payload.split('_')[1])
-                order = Order.objects.get(id=order_id, client=client)
-            except (IndexError, ValueError, Order.DoesNotExist):
-                self.bot.send_message(chat_id=chat_id, text="Произошла ошибка при обработке вашего заказа.")
+            payment = message.successful_payment
+            order_id = parse_invoice_payload(payment.invoice_payload)
+            if order_id is None:
+                logger.error(f"Получена оплата {payment.telegram_payment_charge_id} с неизвестным payload {payment.invoice_payload!r}.")
+                self.report_unmatched_payment(client, order_id, payment)
                 return
 
-            order.status = 'in_progress'
-            order.save()
+            # Условный переход pending -> in_progress: повторное сообщение об оплате ничего не делает
+            charge_id = payment.telegram_payment_charge_id
+            if not finalize_payment(order_id, client, charge_id):
+                if Order.objects.filter(id=order_id, telegram_payment_charge_id=charge_id).exists():
+                    logger.info(f"Оплата заказа {order_id} уже обработана, повтор пропущен.")
+                else:
+                    logger.error(f"Получена оплата {charge_id} для заказа {order_id}, который не ожидает оплаты.")
+                    self.report_unmatched_payment(client, order_id, payment)
+                return
+
+            order = Order.objects.select_related('client').get(id=order_id)
 
             self.bot.send_message(
                 chat_id=chat_id,
@@ -704,6 +735,7 @@ class TelegramBot:
             client.save()
 
     def greet_and_ask_language(self, chat_id):
+        self.navigator.reset_reply_keyboard(chat_id)
         self.bot.send_message(
             chat_id=chat_id,
             text="""Assalomu alaykum Dragon Tea botiga xush kelibsiz!
@@ -732,227 +764,96 @@ class TelegramBot:
             request_contact=True
         )
         phone_keyboard.add(phone_button)
+        self.navigator.reset_reply_keyboard(chat_id)
         self.bot.send_message(
             chat_id=chat_id,
             text="Telefon raqamingizni yuboring:" if client.preferred_language == 'uz' else "Отправьте ваш номер телефона:",
             reply_markup=phone_keyboard
         )
 
-    def send_main_menu(self, chat_id, language_code):
-        main_menu_keyboard = ReplyKeyboardMarkup(resize_keyboard=True, row_width=2)
-
-        if language_code == 'ru':
-            main_menu_keyboard.add(
-                KeyboardButton("🍽️ Меню"),
-                KeyboardButton("🎁 Мои заказы"),
-                KeyboardButton("🛒 Корзина"),
-                KeyboardButton("⚙️ Настройки")
-            )
-        elif language_code == 'uz':
-            main_menu_keyboard.add(
-                KeyboardButton("🍽️ Menu"),
-                KeyboardButton("🎁 Buyurtmalarim"),
-                KeyboardButton("🛒 Savat"),
-                KeyboardButton("⚙️ Sozlamalar")
-            )
-
-        try:
-            client = Client.objects.get(telegram_id=chat_id)
-            order = Order.objects.filter(client=client).order_by('-id').first()
-
-            if order and order.status in ['in_progress', 'delivering']:
-                if language_code == 'ru':
-                    status_text = {
-                        'in_progress': "В обработке",
-                        'delivering': "Доставляется",
-                    }
-                    button_text = f"🚚 Ваш заказ: {status_text.get(order.status, 'Неизвестно')}"
-                elif language_code == 'uz':
-                    status_text = {
-                        'in_progress': "Qayta ishlanmoqda",
-                        'delivering': "Yetkazilmoqda",
-                    }
-                    button_text = f"🚚 Buyurtma: {status_text.get(order.status, 'Noma’lum')}"
-
-                main_menu_keyboard.add(KeyboardButton(button_text))
-
-        except Client.DoesNotExist:
-            pass
-
-        self.bot.send_message(
-            chat_id=chat_id,
-            text="Asosiy menyu" if language_code == 'uz' else "Главное меню",
-            reply_markup=main_menu_keyboard
+    def send_main_menu(self, chat_id, language_code, message=None):
+        order = Order.objects.filter(client__telegram_id=chat_id).order_by('-id').only('status').first()
+        self.navigator.show_menu(
+            chat_id,
+            "Asosiy menyu" if language_code == 'uz' else "Главное меню",
+            main_menu_keyboard(language_code, order.status if order else None),
+            message=message
         )
 
 
-    def send_categories(self, chat_id, language_code):
+    def send_categories(self, chat_id, language_code, message=None):
 
-        categories = Category.objects.all()
-        if not categories.exists():
-            self.bot.send_message(
-                chat_id=chat_id,
-                text="Menu mavjud emas." if language_code == 'uz' else "Меню отсутствуют."
+        categories = get_categories()
+        if not categories:
+            self.navigator.show(
+                chat_id,
+                "Menu mavjud emas." if language_code == 'uz' else "Меню отсутствуют.",
+                message=message
             )
             return
 
-        content = "<h1>Menu</h1>\n" if language_code == 'uz' else "<h1>Меню</h1>\n"
-        for category in categories:
-            category_title = category.title_uz if language_code == 'uz' else category.title_ru
-            content += f"<p>➡️ <strong>{category_title}</strong></p>\n"
-
-
-
-
         telegraph_url = f"https://telegra.ph/DRAGON-TEA-MENU-12-06"
 
-        category_keyboard = InlineKeyboardMarkup(row_width=2)
-        buttons = []
-        for category in categories:
-            category_title = category.title_uz if language_code == 'uz' else category.title_ru
-            buttons.append(InlineKeyboardButton(
-                text=category_title,
-                callback_data=f"category_{category.id}"
-            ))
-        category_keyboard.add(*buttons)
-        category_keyboard.add(
-            InlineKeyboardButton(
-                "🔙 Orqaga" if language_code == 'uz' else "🔙 Назад",
-                callback_data="back_to_main"
-            )
-        )
+        category_keyboard = inline_keyboards.catalog_keyboard(categories, "category_", "back_to_main", language_code)
 
-        self.bot.send_message(
-            chat_id=chat_id,
-            text=f"📰 <a href='{telegraph_url}'>MENU</a>",
+        self.navigator.show(
+            chat_id,
+            f"📰 <a href='{telegraph_url}'>MENU</a>",
             reply_markup=category_keyboard,
-            parse_mode="HTML"
+            parse_mode="HTML",
+            message=message
         )
 
 
-    def send_products(self, chat_id, category_id, language_code):
-        products = Product.objects.filter(category_id=category_id)
-        if not products.exists():
-            self.bot.send_message(
-                chat_id=chat_id,
-                text="Mahsulotlar mavjud emas." if language_code == 'uz' else "Товары отсутствуют."
+    def send_products(self, chat_id, category_id, language_code, message=None):
+        products = get_products(category_id)
+        if not products:
+            self.navigator.show(
+                chat_id,
+                "Mahsulotlar mavjud emas." if language_code == 'uz' else "Товары отсутствуют.",
+                message=message
             )
             return
 
-        product_keyboard = InlineKeyboardMarkup(row_width=2)
-        buttons = []
-        for product in products:
-            product_title = product.title_uz if language_code == 'uz' else product.title_ru
-            buttons.append(InlineKeyboardButton(
-                text=product_title,
-                callback_data=f"product_{product.id}"
-            ))
-        product_keyboard.add(*buttons)
-        product_keyboard.add(
-            InlineKeyboardButton(
-                "🔙 Orqaga" if language_code == 'uz' else "🔙 Назад",
-                callback_data="back_to_categories"
-            )
-        )
-        self.bot.send_message(
-            chat_id=chat_id,
-            text="Mahsulotni tanlang:" if language_code == 'uz' else "Выберите продукт:",
-            reply_markup=product_keyboard
+        product_keyboard = inline_keyboards.catalog_keyboard(products, "product_", "back_to_categories", language_code)
+        self.navigator.show(
+            chat_id,
+            "Mahsulotni tanlang:" if language_code == 'uz' else "Выберите продукт:",
+            reply_markup=product_keyboard,
+            message=message
         )
 
-    def show_cart(self, chat_id, client):
-        cart_items = Cart.objects.filter(client=client, quantity__gt=0)
+    def show_cart(self, chat_id, client, message=None):
+        cart_items = list(Cart.objects.filter(client=client, quantity__gt=0).select_related('product'))
         language_code = client.preferred_language
 
-        if not cart_items.exists():
+        if not cart_items:
             empty_cart_message = "Корзина пуста" if language_code == 'ru' else "Savat bo'sh"
-            self.bot.send_message(chat_id=chat_id, text=empty_cart_message)
+            self.navigator.show(chat_id, empty_cart_message, message=message)
             return
 
-        cart_text = "🛒 Ваша корзина:\n" if language_code == 'ru' else "🛒 Savatingiz:\n"
-        total_price = 0
+        changed_items = apply_default_variants(cart_items)
+        if changed_items:
+            Cart.objects.bulk_update(changed_items, CART_VARIANT_FIELDS)
 
-        for item in cart_items:
-            # Определяем цену на основе размера
-            if item.is_small:
-                unit_price = item.product.small_price or item.product.price
-            elif item.is_big:
-                unit_price = item.product.big_price or item.product.price
-            else:
-                unit_price = item.product.price or 0
-
-            # Если размер не выбран, назначаем по умолчанию маленький или большой размер
-            if not item.is_small and not item.is_big:
-                if item.product.is_small:
-                    item.is_small = True
-                    unit_price = item.product.small_price or item.product.price
-                elif item.product.is_big:
-                    item.is_big = True
-                    unit_price = item.product.big_price or item.product.price
-
-            # Если температура не выбрана, назначаем по умолчанию горячий или холодный
-            if not item.is_hot and not item.is_cold:
-                if item.product.is_hot:
-                    item.is_hot = True
-                elif item.product.is_cold:
-                    item.is_cold = True
-
-            item.save()
-
-            # Рассчитываем стоимость
-            price = unit_price * item.quantity
-            total_price += price
-
-            # Название продукта
-            product_title = item.product.title_ru if language_code == 'ru' else item.product.title_uz
-
-            # Описание размера
-            size_text = ""
-            if item.is_small:
-                size_text = f"Маленький {item.product.small_volume}" if language_code == 'ru' else f"Kichik {item.product.small_volume}"
-            elif item.is_big:
-                size_text = f"Большой {item.product.big_volume}" if language_code == 'ru' else f"Katta {item.product.big_volume}"
-
-            # Описание температуры
-            temp_text = ""
-            if item.is_hot:
-                temp_text = "🔥 Горячий" if language_code == 'ru' else "🔥 Issiq"
-            elif item.is_cold:
-                temp_text = "❄️ Холодный" if language_code == 'ru' else "❄️ Sovuq"
-
-            # Формируем строку для текущего товара
-            cart_text += (
-                f"{product_title} ({size_text}, {temp_text}) x {item.quantity} = {price:,} {'сум' if language_code == 'ru' else 'so‘m'}\n"
-            )
+        cart_text = format_cart_text(cart_items, language_code)
+        cart_keyboard = inline_keyboards.cart_keyboard(language_code)
 
-        # Добавляем итоговую сумму
-        total_text = "Итого" if language_code == 'ru' else "Jami"
-        cart_text += f"\n{total_text}: {total_price:,} {'сум' if language_code == 'ru' else 'so‘m'}"
+        # Показываем корзину
+        self.navigator.show(chat_id, cart_text, reply_markup=cart_keyboard, message=message)
 
-        # Формируем клавиатуру
-        cart_keyboard = InlineKeyboardMarkup(row_width=2)
-        cart_keyboard.add(
-            InlineKeyboardButton(
-                "✅ Оформить заказ" if language_code == 'ru' else "✅ Buyurtma berish",
-                callback_data="checkout"
-            ),
-            InlineKeyboardButton(
-                "🗑️ Очистить корзину" if language_code == 'ru' else "🗑️ Savatni tozalash",
-                callback_data="clear_cart"
-            )
-        )
-        cart_keyboard.add(
-            InlineKeyboardButton(
-                "🔙 Назад" if language_code == 'ru' else "🔙 Orqaga",
-                callback_data="back_to_main"
-            )
-        )
-
-        # Отправляем сообщение с корзиной
-        self.bot.send_message(chat_id, cart_text, reply_markup=cart_keyboard)
 
+    def send_orders(self, chat_id, client, orders):
+        for order in orders:
+            order_text, order_keyboard = format_order_text(order, client.preferred_language, order.cart_data_json or None)
+            self.bot.send_message(
+                chat_id=chat_id,
+                text=order_text,
+                reply_markup=order_keyboard,
+                parse_mode='HTML'
+            )
 
-    def send_settings(self, chat_id, language_code):
+    def send_settings(self, chat_id, language_code, message=None):
         client = Client.objects.get(telegram_id=chat_id)
 
         language_map = {
@@ -996,82 +897,42 @@ class TelegramBot:
             )
         )
 
-        self.bot.send_message(
-            chat_id=chat_id,
-            text=settings_text,
-            reply_markup=settings_keyboard
+        self.navigator.show(
+            chat_id,
+            settings_text,
+            reply_markup=settings_keyboard,
+            message=message
         )
 
     def send_product_details(self, chat_id, client, product, quantity, is_small, is_big, is_hot, is_cold, cart_item_id, message_id=None):
         language_code = client.preferred_language
-
-        # Описание размера
-        size_text = ""
-        if is_small:
-            size_text = f"Маленький {product.small_volume}" if language_code == 'ru' else f"Kichik {product.small_volume}"
-        elif is_big:
-            size_text = f"Большой {product.big_volume}" if language_code == 'ru' else f"Katta {product.big_volume}"
-
-        # Описание температуры
-        temp_text = ""
-        if is_hot:
-            temp_text = "🔥 Горячий" if language_code == 'ru' else "🔥 Issiq"
-        elif is_cold:
-            temp_text = "❄️ Холодный" if language_code == 'ru' else "❄️ Sovuq"
-
-        # Цена за единицу и общая стоимость
-        unit_price = product.get_price(is_small=is_small, is_big=is_big) or product.price
-        total_price = unit_price * quantity
-
-        # Формирование текста с подробностями
-        details = (
-            f"🛍️ <b>{product.title_ru if language_code == 'ru' else product.title_uz}</b>\n"
-            f"💵 <b>{'Цена за единицу' if language_code == 'ru' else 'Bir dona narxi'}:</b> {unit_price:,} {'сум' if language_code == 'ru' else 'so‘m'}\n"
-            f"{'<b>Размер:</b> ' + size_text + '\n' if size_text else ''}"
-            f"{'<b>Температура:</b> ' + temp_text + '\n' if temp_text else ''}"
-            f"📦 <b>{'Количество' if language_code == 'ru' else 'Miqdori'}:</b> {quantity}\n"
-            f"💰 <b>{'Общая стоимость' if language_code == 'ru' else 'Umumiy narxi'}:</b> {total_price:,} {'сум' if language_code == 'ru' else 'so‘m'}"
-        )
-
+        details = format_product_caption(product, language_code, quantity, is_small, is_big, is_hot, is_cold)
 
         # Получение ID категории для кнопки "Назад"
-        category_id = product.category.id if product.category else 0
-
-        # Создание клавиатуры
-        product_keyboard = InlineKeyboardMarkup(row_width=3)
-        product_keyboard.add(
-            InlineKeyboardButton("➖", callback_data=f"decrease_{cart_item_id}"),
-            InlineKeyboardButton(f"{quantity}", callback_data="quantity_do_nothing"),
-            InlineKeyboardButton("➕", callback_data=f"increase_{cart_item_id}")
-        )
-        product_keyboard.add(
-            InlineKeyboardButton(
-                "🛒 Корзина" if language_code == 'ru' else "🛒 Savat",
-                callback_data="view_cart"
-            ),
-            InlineKeyboardButton(
-                "🔙 Назад" if language_code == 'ru' else "🔙 Orqaga",
-                callback_data=f"back_to_products_{category_id}"
-            )
-        )
+        category_id = product.category_id or 0
+        product_keyboard = inline_keyboards.product_details_keyboard(cart_item_id, quantity, category_id, language_code)
 
-        # Если есть изображение продукта, отправляем его
+        # Если есть изображение продукта, отправляем его. Уже загруженное фото
+        # переиспользуем по file_id, чтобы не отправлять файл в Telegram повторно
+        photo = None
+        photo_file_id = None
         if product.image:
-            photo = open(product.image.path, 'rb')
-        else:
-            photo = None
+            photo_file_id = get_product_photo_id(product)
+            photo = photo_file_id or open(product.image.path, 'rb')
 
         # Обновляем сообщение или отправляем новое
         if message_id:
             if photo:
                 media = types.InputMediaPhoto(media=photo, caption=details, parse_mode='HTML')
-                self.bot.edit_message_media(
+                sent_message = self.bot.edit_message_media(
                     media=media,
                     chat_id=chat_id,
                     message_id=message_id,
                     reply_markup=product_keyboard
                 )
-                photo.close()
+                if not photo_file_id:
+                    photo.close()
+                    remember_product_photo_id(product, sent_message)
             else:
                 self.bot.edit_message_caption(
                     chat_id=chat_id,
@@ -1082,14 +943,16 @@ class TelegramBot:
                 )
         else:
             if photo:
-                self.bot.send_photo(
+                sent_message = self.bot.send_photo(
                     chat_id=chat_id,
                     photo=photo,
                     caption=details,
                     reply_markup=product_keyboard,
                     parse_mode='HTML'
                 )
-                photo.close()
+                if not photo_file_id:
+                    photo.close()
+                    remember_product_photo_id(product, sent_message)
             else:
                 self.bot.send_message(
                     chat_id=chat_id,
@@ -1098,177 +961,32 @@ class TelegramBot:
                     parse_mode='HTML'
                 )
 
-    def format_order_text(self, order, language_code, cart_data=None, is_admin=False):
-        status_display = {
-            'ru': {
-                'pending': 'Ожидание оплаты',
-                'in_progress': 'В процессе',
-                'delivering': 'Доставляется',
-                'completed': 'Завершён',
-                'canceled': 'Отменён',
-                'closed': 'Закрыт',
-            },
-            'uz': {
-                'pending': "To'lov kutilyapti",
-                'in_progress': 'Jarayonda',
-                'delivering': 'Yetkazilmoqda',
-                'completed': 'Yakunlangan',
-                'canceled': 'Bekor qilingan',
-                'closed': 'Yopilgan',
-            },
-        }
-
-        order_status = status_display.get(language_code, status_display['ru']).get(order.status, order.status)
-
-        if language_code == 'ru':
-            order_text = f"🧾 <b>Заказ №{order.id}</b>\n"
-            order_text += f"👤 <b>Клиент:</b> @{order.client.telegram_username or order.client.name}\n"
-            order_text += f"📞 <b>Телефон:</b> {order.client.phone_number}\n"
-            order_text += f"📦 <b>Статус:</b> #{order_status}\n"
-            order_text += f"""📍 <b>Адрес доставки:</b> GOOGLE MAPS: https://www.google.com/maps?q={order.delivery_address.replace(' ', '')}\n\n"""
-        else:
-            order_text = f"🧾 <b>Buyurtma №{order.id}</b>\n"
-            order_text += f"👤 <b>Mijoz:</b> @{order.client.telegram_username or order.client.name}\n"
-            order_text += f"📞 <b>Telefon:</b> {order.client.phone_number}\n"
-            order_text += f"📦 <b>Holati:</b> #{order_status}\n"
-            order_text += f"""📍 <b>Yetkazib berish manzili:</b> GOOGLE MAPS: https://www.google.com/maps?q={order.delivery_address.replace(' ', '')}\n\n"""
-
-        if cart_data:
-            order_text += "🛒 <b>Товары:</b>\n" if language_code == 'ru' else "🛒 <b>Mahsulotlar:</b>\n"
-
-            for item in cart_data:
-                product_title = item['product_title_ru'] if language_code == 'ru' else item['product_title_uz']
-                quantity = item['quantity']
-                unit_price = item['price']
-                total_price = quantity * unit_price
-
-                size_text = ""
-                if item.get('is_small'):
-                    small_volume = item.get('small_volume') or ''
-                    size_text = f"Маленький {small_volume} ml" if language_code == 'ru' else f"Kichik {small_volume} ml"
-                elif item.get('is_big'):
-                    big_volume = item.get('big_volume') or ''
-                    size_text = f"Большой {big_volume} ml" if language_code == 'ru' else f"Katta {big_volume} ml"
-
-                temp_text = ""
-                if item.get('is_hot'):
-                    temp_text = "🔥 Горячий" if language_code == 'ru' else "🔥 Issiq"
-                elif item.get('is_cold'):
-                    temp_text = "❄️ Холодный" if language_code == 'ru' else "❄️ Sovuq"
-
-                if language_code == 'ru':
-                    order_text += f"• <b>{product_title}</b> ({size_text}, {temp_text})\n  {quantity}️⃣ ✖️ {unit_price:,.0f} = {total_price:,.0f} сум\n"
-                else:
-                    order_text += f"• <b>{product_title}</b> ({size_text}, {temp_text})\n  {quantity}️⃣ ✖️ {unit_price:,.0f} = {total_price:,.0f} so‘m\n"
-
-        if language_code == 'ru':
-            order_text += f"\n📦 <b>Сумма товаров:</b>    {order.total_price - order.delivery_cost:,.0f} сум\n"
-            order_text += f"🚚 <b>Доставка:</b>    {order.delivery_cost:,.0f} сум\n"
-            order_text += f"💰 <b>Итого:</b>    {order.total_price:,.0f} сум"
-        else:
-            order_text += f"\n📦 <b>Mahsulotlar summasi:</b>    {order.total_price - order.delivery_cost:,.0f} so‘m\n"
-            order_text += f"🚚 <b>Yetkazib berish:</b>    {order.delivery_cost:,.0f} so‘m\n"
-            order_text += f"💰 <b>Jami:</b>    {order.total_price:,.0f} so‘m"
-
-        if is_admin:
-            order_keyboard = InlineKeyboardMarkup(row_width=2)
-            if order.status in ['pending', 'in_progress', 'delivering']:
-                assign_courier_button = InlineKeyboardButton(
-                    "Передать курьеру" if language_code == 'ru' else "Kuryerga berish",
-                    callback_data=f"assign_courier_{order.id}"
-                )
-                close_order_button = InlineKeyboardButton(
-                    "Закрыть заказ" if language_code == 'ru' else "Buyurtmani yopish",
-                    callback_data=f"close_order_{order.id}"
-                )
-                order_keyboard.add(assign_courier_button, close_order_button)
-            elif order.status == 'completed':
-                close_order_button = InlineKeyboardButton(
-                    "Закрыть заказ" if language_code == 'ru' else "Buyurtmani yopish",
-                    callback_data=f"close_order_{order.id}"
-                )
-                order_keyboard.add(close_order_button)
-            else:
-                order_keyboard = None
-
-            return order_text, order_keyboard
-        else:
-            return order_text, None
-
     def send_payment_invoice(self, chat_id, client, order, cart_data):
-        PAYMENT_PROVIDER_TOKEN = os.getenv('PAYMENT_PROVIDER_TOKEN')
+        cache_order_snapshot(order, chat_id, client.preferred_language)
+        # Celery загружается только на путях, которые ставят задачи
+        from apps.bot import tasks
 
-        language_code = client.preferred_language
-
-        delivery_cost = order.delivery_cost
-        products_cost = order.total_price - delivery_cost
-
-        product_lines = []
-        for item in cart_data:
-            product_title = item['product_title_ru'] if language_code == 'ru' else item['product_title_uz']
-            line = f"{product_title} x {item['quantity']} - {item['price'] * item['quantity']} {'сум' if language_code == 'ru' else 'so‘m'}"
-            product_lines.append(line)
-        products_details = '\n'.join(product_lines)
-
-        if language_code == 'ru':
-            title = "Оплата заказа"
-            description = (
-                f"Ваш заказ на сумму {order.total_price} сум\n"
-                f"Товары:\n{products_details}\n"
-                f"Доставка: {delivery_cost} сум"
-            )
-            price_label_products = 'Товары'
-            price_label_delivery = 'Доставка'
-        elif language_code == 'uz':
-            title = "Buyurtma uchun to'lov"
-            description = (
-                f"Sizning buyurtmangiz summasi {order.total_price} so'm\n"
-                f"Mahsulotlar:\n{products_details}\n"
-                f"Yetkazib berish: {delivery_cost} so'm"
-            )
-            price_label_products = 'Mahsulotlar'
-            price_label_delivery = 'Yetkazib berish'
-        else:
-            title = "Оплата заказа"
-            description = (
-                f"Ваш заказ на сумму {order.total_price} сум\n"
-                f"Товары:\n{products_details}\n"
-                f"Доставка: {delivery_cost} сум"
-            )
-            price_label_products = 'Товары'
-            price_label_delivery = 'Доставка'
-
-        prices = [
-            types.LabeledPrice(label=price_label_products, amount=int(products_cost * 100)),
-            types.LabeledPrice(label=price_label_delivery, amount=int(delivery_cost * 100))
-        ]
-
-        payload = f"order_{order.id}"
-
-        self.bot.send_invoice(
-            chat_id=chat_id,
-            title=title,
-            description=description,
-            provider_token=PAYMENT_PROVIDER_TOKEN,
-            currency='UZS',
-            prices=prices,
-            start_parameter='payment',
-            invoice_payload=payload
-        )
+        tasks.enqueue(tasks.send_payment_invoice, order.id)
 
     def send_order_to_group(self, order, cart_data):
-        GROUP_CHAT_ID = int(os.getenv('GROUP_CHAT_ID'))
-        cart_data = order.cart_data_json if order.cart_data_json else []
+        from apps.bot import tasks
 
-        language_code = order.client.preferred_language or 'ru'
+        tasks.enqueue(tasks.send_order_to_group, order.id)
 
-        order_text, order_keyboard = self.format_order_text(order, language_code, cart_data, is_admin=True)
+    def report_unmatched_payment(self, client, order_id, payment):
+        """
+        Telegram уже списал деньги, а заказа, ждущего оплаты, нет (истёк и удалён или
+        изменён): клиенту отвечаем, что платёж проверяется, группе — данные для возврата.
+        """
+        from apps.bot import tasks
 
         self.bot.send_message(
-            chat_id=GROUP_CHAT_ID,
-            text=order_text,
-            reply_markup=order_keyboard,
-            parse_mode='HTML'
+            chat_id=client.telegram_id,
+            text="Оплата получена, мы проверяем ваш заказ и свяжемся с вами в ближайшее время." if client.preferred_language == 'ru' else "To'lov qabul qilindi, buyurtmangizni tekshirmoqdamiz va tez orada siz bilan bog'lanamiz."
+        )
+        tasks.enqueue(
+            tasks.send_unmatched_payment_to_group,
+            order_id, client.id, payment.telegram_payment_charge_id, payment.total_amount, payment.currency
         )
 
     def is_waiting_for_courier_data(self, message):
@@ -1294,57 +1012,59 @@ class TelegramBot:
             )
             return
 
-        try:
-            order = Order.objects.get(id=order_id)
-            text = message.text.strip()
-
-            parts = [part.strip() for part in text.split(',')]
-            if len(parts) != 3:
-                error_text = (
-                    "⚠️ <b>Ошибка:</b> Данные не соответствуют формату.\n\n"
-                    "💡 <b>Формат:</b>\n"
-                    "Имя курьера, Номер машины, Модель машины\n\n"
-                    "🔍 <b>Пример:</b>\n"
-                    "Иван Иванов, 01A123AA, Toyota Corolla"
-                )
-                self.bot.send_message(
-                    chat_id=message.chat.id,
-                    text=error_text,
-                    parse_mode="HTML",
-                    reply_markup=types.ForceReply(selective=True)
-                )
-                return
-
-            courier_name, car_number, car_model = parts
-
-            order.courier_name = courier_name
-            order.car_model = car_model
-            order.car_number = car_number
-            order.status = 'delivering'
-            order.save()
+        text = message.text.strip()
 
-            success_message = (
-                "✅ <b>Данные курьера успешно добавлены и отправлены клиенту.</b>\n"
-                "Заказ обновлён."
+        parts = [part.strip() for part in text.split(',')]
+        if len(parts) != 3:
+            error_text = (
+                "⚠️ <b>Ошибка:</b> Данные не соответствуют формату.\n\n"
+                "💡 <b>Формат:</b>\n"
+                "Имя курьера, Номер машины, Модель машины\n\n"
+                "🔍 <b>Пример:</b>\n"
+                "Иван Иванов, 01A123AA, Toyota Corolla"
             )
             self.bot.send_message(
                 chat_id=message.chat.id,
-                text=success_message,
-                parse_mode="HTML"
+                text=error_text,
+                parse_mode="HTML",
+                reply_markup=types.ForceReply(selective=True)
             )
+            return
 
-            del self.admin_data[user_id]
-
-            self.send_order_update_to_client(order)
-            self.send_order_update(order)
+        courier_name, car_number, car_model = parts
 
-        except Order.DoesNotExist:
+        order, result = transition_order(
+            order_id, ('pending', 'in_progress'), 'delivering',
+            courier_name=courier_name, car_number=car_number, car_model=car_model
+        )
+        if result == 'locked':
+            self.bot.send_message(
+                chat_id=message.chat.id,
+                text="⚠️ Заказ сейчас обновляет другой администратор. Ответьте на запрос данных ещё раз через несколько секунд."
+            )
+            return
+        if result != 'ok':
             self.bot.send_message(
                 chat_id=message.chat.id,
-                text="⚠️ Заказ не найден. Попробуйте снова."
+                text="⚠️ Заказ не найден. Попробуйте снова." if result == 'not_found' else "⚠️ Нельзя передать курьеру заказ с текущим статусом."
             )
-            if user_id in self.admin_data:
-                del self.admin_data[user_id]
+            self.admin_data.pop(user_id, None)
+            return
+
+        success_message = (
+            "✅ <b>Данные курьера успешно добавлены и отправлены клиенту.</b>\n"
+            "Заказ обновлён."
+        )
+        self.bot.send_message(
+            chat_id=message.chat.id,
+            text=success_message,
+            parse_mode="HTML"
+        )
+
+        del self.admin_data[user_id]
+
+        self.send_order_update_to_client(order)
+        self.send_order_update(order)
 
     def assign_courier(self, order_id, call):
         try:
@@ -1386,46 +1106,28 @@ class TelegramBot:
             )
 
     def close_order(self, order_id, call):
-        try:
-            order = Order.objects.get(id=order_id)
-            language_code = order.client.preferred_language or 'ru'
-
-            if order.status in ['delivering', 'in_progress']:
-                order.status = 'completed'
-                order.save()
+        order, result = transition_order(order_id, ('delivering', 'in_progress'), 'completed')
+        language_code = (order.client.preferred_language if order and order.client else None) or 'ru'
 
-                self.send_order_update_to_client(order)
-                self.send_main_menu(order.client.telegram_id, language_code)
-                self.send_order_update(order)
+        if result == 'ok':
+            self.send_order_update_to_client(order)
+            self.send_main_menu(order.client.telegram_id, language_code)
+            self.send_order_update(order)
 
-                self.bot.answer_callback_query(call.id, "Заказ закрыт." if language_code == 'ru' else "Buyurtma yopildi.")
-            else:
-                self.bot.answer_callback_query(call.id, "Нельзя закрыть заказ с текущим статусом." if language_code == 'ru' else "Buyurtmani joriy holatda yopish mumkin emas.")
-        except Order.DoesNotExist:
+            self.bot.answer_callback_query(call.id, "Заказ закрыт." if language_code == 'ru' else "Buyurtma yopildi.")
+        elif result == 'locked':
+            self.bot.answer_callback_query(call.id, "Заказ сейчас обновляет другой администратор." if language_code == 'ru' else "Buyurtmani hozir boshqa administrator yangilamoqda.")
+        elif result == 'wrong_status':
+            self.bot.answer_callback_query(call.id, "Нельзя закрыть заказ с текущим статусом." if language_code == 'ru' else "Buyurtmani joriy holatda yopish mumkin emas.")
+        else:
             self.bot.answer_callback_query(call.id, "Заказ не найден." if language_code == 'ru' else "Buyurtma topilmadi.")
 
     def send_order_update(self, order):
-        GROUP_CHAT_ID = int(os.getenv('GROUP_CHAT_ID'))
-        cart_data = order.cart_data_json if order.cart_data_json else []
-
-        language_code = order.client.preferred_language or 'ru'
+        from apps.bot import tasks
 
-        order_text, order_keyboard = self.format_order_text(order, language_code, cart_data, is_admin=True)
-
-        self.bot.send_message(
-            chat_id=GROUP_CHAT_ID,
-            text=order_text,
-            reply_markup=order_keyboard,
-            parse_mode='HTML'
-        )
+        tasks.enqueue(tasks.send_order_to_group, order.id)
 
     def send_order_update_to_client(self, order):
-        try:
-            chat_id = order.client.telegram_id
-            language_code = order.client.preferred_language or 'ru'
-
-            status_text = "Ваш заказ передан курьеру и доставляется!" if language_code == 'ru' else "Buyurtmangiz kuryerga berildi va yetkazilmoqda!"
-            self.bot.send_message(chat_id, text=status_text)
+        from apps.bot import tasks
 
-        except Exception as e:
-            logger.error(f"Error in send_order_update_to_client: {e}")
+        tasks.enqueue(tasks.send_order_update_to_client, order.id)
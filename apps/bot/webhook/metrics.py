@@ -0,0 +1,9 @@
+from django.http import HttpResponse
+from django.views.decorators.http import require_GET
+
+from apps.bot.utils.metrics import render
+
+
+@require_GET
+def metrics(request):
+    return HttpResponse(render(), content_type='text/plain; version=0.0.4; charset=utf-8')
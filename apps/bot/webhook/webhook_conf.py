@@ -1,29 +1,57 @@
-import os
 import logging
 from django.views.decorators.csrf import csrf_exempt
 from django.http import JsonResponse
 from telebot.types import Update
-from dotenv import load_dotenv
-from apps.bot.views import TelegramBot
+from apps.bot.bot_initializer import get_async_telegram_bot, get_telegram_bot
+from apps.bot.middlewares.deduplication import UpdateDeduplicator
+from apps.bot.middlewares.instrumentation import get_update_type, record_update
+from apps.bot.middlewares.logger import attach_update_id, log_context
+from apps.bot.utils.tracing import attach_context, current_context, new_trace_context, span
 
-bot = TelegramBot().bot
-load_dotenv()
+deduplicator = UpdateDeduplicator()
 
 logger = logging.getLogger(__name__)
-logging.basicConfig(
-    format='%(asctime)s [%(levelname)s] %(message)s',
-    level=logging.INFO
-)
 
-WEBHOOK_URL = os.getenv('WEBHOOK_URL')
+def process_update(update, body=None, claim=True):
+    """
+    Общий путь обновления для вебхука и runbot: трасса, метрика, отсев повторов, обработчики.
+    body — исходный JSON, если обновление ещё не разобрано; claim — см. UpdateDeduplicator.is_duplicate.
+    Возвращает False для повтора, исключение обработчика пробрасывает.
+    """
+    with span('webhook', context=new_trace_context()) as webhook_span:
+        if update is None:
+            with span('Update.de_json'):
+                update = Update.de_json(body)
+        record_update(update)
+        if webhook_span is not None:
+            webhook_span.attributes['update_id'] = update.update_id
+        with log_context(update_id=update.update_id):
+            if deduplicator.is_duplicate(update.update_id, claim=claim):
+                logger.info("Повторное обновление %s пропущено.", update.update_id)
+                return False
+            try:
+                # Обработчик может выполниться в другом потоке — передаём ему контекст трассы и update_id
+                update_object = getattr(update, get_update_type(update), None)
+                attach_context(update_object, current_context())
+                attach_update_id(update_object, update.update_id)
+                get_telegram_bot().bot.process_new_updates([update])
+            except Exception:
+                # Ответ будет 500 и Telegram пришлёт обновление ещё раз — повтор не должен считаться дублем
+                deduplicator.forget(update.update_id)
+                raise
+            deduplicator.done(update.update_id)
+            logger.info("Успешно обработано обновление от Telegram.")
+    return True
+
 
 @csrf_exempt
 def webhook(request):
     if request.method == 'POST':
         try:
-            update = Update.de_json(request.body.decode('UTF-8'))
-            bot.process_new_updates([update])
-            logger.info("Успешно обработано обновление от Telegram.")
+            if not process_update(None, request.body.decode('UTF-8')):
+                return JsonResponse(
+                    {'status': 'ok', 'message': 'Обновление уже обработано'}
+                )
         except Exception as e:
             logger.exception("Ошибка при обработке обновления: %s", str(e))
             return JsonResponse(
@@ -40,17 +68,43 @@ def webhook(request):
             status=405
         )
 
-def set_webhook():
+
+async def async_webhook(request):
+    """
+    Вебхук для ASGI (BOT_ASYNC_MODE). Трассировка и контекст логов привязаны к потоку,
+    поэтому здесь не используются: задачи одного цикла событий их перемешали бы.
+    """
+    if request.method != 'POST':
+        logger.warning("Получен неподдерживаемый метод HTTP: %s", request.method)
+        return JsonResponse(
+            {'status': 'error', 'message': 'Метод не поддерживается'},
+            status=405
+        )
     try:
-        bot.remove_webhook()
-        if bot.set_webhook(url=WEBHOOK_URL):
-            logger.info("Webhook успешно установлен по адресу: %s", WEBHOOK_URL)
-        else:
-            logger.error("Не удалось установить Webhook: Telegram не подтвердил установку.")
+        update = Update.de_json(request.body.decode('UTF-8'))
+        record_update(update)
+        if await deduplicator.ais_duplicate(update.update_id):
+            logger.info("Повторное обновление %s пропущено.", update.update_id)
+            return JsonResponse(
+                {'status': 'ok', 'message': 'Обновление уже обработано'}
+            )
+        try:
+            await get_async_telegram_bot().process_update(update)
+        except Exception:
+            await deduplicator.aforget(update.update_id)
+            raise
+        await deduplicator.adone(update.update_id)
+        logger.info("Успешно обработано обновление %s от Telegram.", update.update_id)
     except Exception as e:
-        logger.exception("Критическая ошибка при установке Webhook: %s", str(e))
+        logger.exception("Ошибка при обработке обновления: %s", str(e))
+        return JsonResponse(
+            {'status': 'error', 'message': 'Ошибка при обработке обновления'},
+            status=500
+        )
+    return JsonResponse(
+        {'status': 'ok', 'message': 'Обновление успешно обработано'}
+    )
+
 
-try:
-    set_webhook()
-except Exception as e:
-    logger.critical("Критическая ошибка при инициализации Webhook: %s", str(e))
+# csrf_exempt в Django 4.2 оборачивает view синхронной функцией — ставим признак напрямую
+async_webhook.csrf_exempt = True
@@ -1,6 +1,7 @@
 from __future__ import absolute_import, unicode_literals
 import os
 from celery import Celery
+from celery.signals import worker_init
 
 os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'dragontea.settings')
 
@@ -9,3 +10,11 @@ app = Celery('dragontea')
 app.config_from_object('django.conf:settings', namespace='CELERY')
 
 app.autodiscover_tasks()
+
+
+@worker_init.connect
+def instrument_worker(**kwargs):
+    # Задачи отправляют сообщения через Bot API: метрики и спаны telegram.* нужны и в воркере
+    from apps.bot.middlewares.instrumentation import install_request_sender
+
+    install_request_sender()